@@ -1,28 +1,29 @@
 import os
-import re
 import csv
-import requests
-import sys
-from urllib.parse import urlparse
+from CWLAYOUT import page_path
+from CWURL import is_wanted_url, url_slug
+from CWPROFILE import cli_args, profile_stage, timer
+from CWENCODING import ACCEPT_ENCODING, read_requests_body
+from CWBANDWIDTH import METER
+from CWPROXYPOOL import POOL, worker_base
+from CWREPLAY import replay_get
+from CWTRACE import TRACER
 
 # === CONSTANTS ===2
 try:
    # print(sys.argv)
-    file =sys.argv[1]
+    file = cli_args()[0]
 except: file =  "URL_LIST0.csv"
 print(f"Input file: {file}")
 #file =sys.argv[1]
 cwd = os.getcwd()
 URL_LIST = "URL_LIST.csv"
 FILTERED_URL_LIST = "FILTERED_URL_LIST.csv"
-PROXY = "36fda789ac44aa4cc19e:b966e984e5922790@gw.dataimpulse.com:10013"
 DATAFOLDER = os.path.join(cwd, "Companies")
+USE_PROXY = False  # True: fetch through this worker's own gateway port (CWPROXYPOOL)
 
 # === PROXY SETUP ===
-proxy_dict = {
-    'http': f'http://{PROXY}',
-    'https': f'http://{PROXY}'
-}
+WORKER = worker_base(file)  # each input list is its own worker: URL_LIST3.csv -> slot 3
 
 
 # === FETCH FUNCTION ===
@@ -30,30 +31,37 @@ def fetch(url):
     """Fetch HTML content from URL using proxy"""
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        'Accept-Encoding': 'gzip'
+        'Accept-Encoding': ACCEPT_ENCODING
     }
+    proxy = METER.admit(POOL.requests_proxies(WORKER) if USE_PROXY else None)
+    trace = TRACER.begin(url, proxy, sync=True)
+    wire_size = 0
     try:
-        #response = requests.get(url, headers=headers, proxies=proxy_dict, timeout=30)
-
-        response = requests.get(url, headers=headers, timeout=30)
+        response = replay_get(url, headers=headers, proxies=proxy, timeout=30, stream=True)
+        if trace is not None:
+            trace.mark("headers")
+            trace.status = response.status_code
         response.raise_for_status()
-        return response.text
+        body, wire_size = read_requests_body(response)
+        if trace is not None:
+            trace.mark("body_end")
+            trace.wire_bytes = wire_size
+        if USE_PROXY:
+            POOL.report(WORKER, True)
+        return body.decode(response.encoding or "utf-8", errors="replace")
     except Exception as e:
         print(f"Error fetching {url}: {e}")
+        if USE_PROXY:
+            POOL.report(WORKER, False)
         return None
+    finally:
+        METER.record(proxy, wire_size)
 
 
 # === URL PARSING ===
 def parse_url_tree(url):
     """Extract URL tree components from companywall.hu URLs"""
-    parsed = urlparse(url)
-    path_parts = parsed.path.strip('/').split('/')
-    #print(path_parts)
-    if len(path_parts) >= 2 :
-        company_part = path_parts[1]  # e.g., "horizontplast-kft"
-        #print(company_part)
-        return company_part
-    return None
+    return url_slug(url)  # e.g., "horizontplast-kft"
 
 
 def filter_urls():
@@ -62,21 +70,14 @@ def filter_urls():
         print(f"❌ {URL_LIST} not found!")
         return
 
-    filtered = []
     with open(URL_LIST, "r", encoding="utf-8") as f:
         reader = csv.reader(f)
         urls = [row[0].strip() for row in reader if row]
 
     print(f"Level 2: Filtering {len(urls)} URLs...")
 
-    pattern_include = re.compile(r'-kft|-bt|-zrt', re.IGNORECASE)
-    #pattern_include = re.compile(r'horizon', re.IGNORECASE)
-
-    # pattern_exclude = re.compile(r'-v-a|-f-a', re.IGNORECASE)
-    pattern_exclude = re.compile(r'-xxxxxxxxxxxv-a', re.IGNORECASE)
-    for url in urls:
-        if pattern_include.search(url) and not pattern_exclude.search(url):
-            filtered.append(url)
+    # Same company type filter as every engine (CWURL, matched on the slug)
+    filtered = [url for url in urls if is_wanted_url(url)]
 
     # Save to FILTERED_URL_LIST.csv
     with open(FILTERED_URL_LIST, "a", encoding="utf-8", newline="") as f:
@@ -109,14 +110,12 @@ def fetch_content():
         if not url_tree:
             continue
 
-        # Generate filename and folder
-        folder_code = url_tree[:2].upper()
-        filename = f"{url_tree}.html"
-        folder_path = os.path.join(DATAFOLDER, folder_code)
+        # Generate filename and folder (hashed layout, see CWLAYOUT)
+        file_path = page_path(DATAFOLDER, url)
+        filename = os.path.basename(file_path)
 
         # Create folder if needed
-        os.makedirs(folder_path, exist_ok=True)
-        file_path = os.path.join(folder_path, filename)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
         # Skip if already exists
         if os.path.exists(file_path):
@@ -124,12 +123,15 @@ def fetch_content():
             continue
 
         # Fetch and save content
-        html_content = fetch(url)
+        with timer("fetch"):
+            html_content = fetch(url)
         if html_content:
-            with open(file_path, 'w', encoding='utf-8') as f:
+            with timer("save"), TRACER.phase(url, "write"), open(file_path, 'w', encoding='utf-8') as f:
                 f.write(html_content)
+            TRACER.finish(url, "saved")
             print(f"✅ Saved: {filename}")
         else:
+            TRACER.finish(url, "error")
             print(f"❌ Failed: {url_tree}")
 
 
@@ -150,13 +152,13 @@ def main():
 
         if choice == '1':
             print("\n🎯 Running Level 1 - URL Filtering...")
-            filter_urls()
+            profile_stage("cw_filter_urls", filter_urls)
 
         elif choice == '2':
             print("\n🎯 Running Level 2 - Content Fetching...")
             if os.path.exists(FILTERED_URL_LIST):
 
-               fetch_content()
+               profile_stage("cw_fetch_content", fetch_content)
             else:
                 print("❌ Run Level 1 first to create filtered URL list!")
 
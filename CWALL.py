@@ -9,17 +9,24 @@ CW fetcher
 
 import os
 import csv
-import re
-import gzip
 import logging
-from urllib.parse import urlparse, unquote
+import zlib
 import requests
 import sys
+from CWPROFILE import cli_args, profile_stage, timer
+from CWENCODING import ACCEPT_ENCODING, make_decoder, read_requests_body
+from CWSEEN import FETCHED, SeenSet
+from CWBANDWIDTH import METER
+from CWLAYOUT import migrate, page_path
+from CWURL import page_name
+from CWREPLAY import replay_get
+from CWTRACE import TRACER
+from CWVALIDATE import SIZELIMIT, STREAM_CHUNK, HeadCheck, canonical_matches, extract_canonical, extract_title, gzip_equivalent_size
 
 # === CONSTANTS ===
 try:
    # print(sys.argv)
-    N =sys.argv[1]
+    N = cli_args()[0]
 except: N = 0
 
 
@@ -32,18 +39,14 @@ print(f"Input file: {URL_LIST}")
 PROXY = "195.56.65.172:8081"
 DATAFOLDER = os.path.join(cwd, "Companies_" + str(N))
 NOPROXY = True
-SIZELIMIT = 30*1024  # bytes (gzip-compressed)
+STREAMING = True  # validate the head while downloading, abort blocked pages early
 # Logging setup
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
 
-# Simple regex patterns
-_RE_TITLE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
-_RE_CANON = re.compile(r'<link\s+[^>]*rel=["\']canonical["\'][^>]*href=["\']([^"\']+)["\']', re.IGNORECASE)
-
 # Requests settings
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; CWFetcher/1.0)",
-    "Accept-Encoding": "gzip"  # ensure server responds with gzip instead of brotli
+    "Accept-Encoding": ACCEPT_ENCODING  # gzip, plus br/zstd when their decoders are installed
 }
 # Use the single proxy for both http and https (no rotation)
 PROXIES = {
@@ -80,65 +83,70 @@ def parse_filename_from_url(url):
       https://www.companywall.hu/v%C3%A1llalat/horizontplast-kft/MMGJWPVR
     -> horizontplast-kft_MMGJWPVR.html
     """
-    parsed = urlparse(url)
-    # Get path segments, ignore leading/trailing slashes
-    parts = [p for p in parsed.path.split("/") if p]
-    if not parts:
-        # fallback: use netloc + path
-        safe = (parsed.netloc + parsed.path).replace("/", "_")
-        return unquote(safe) + ".html"
-    # usually last two segments are company-name and code
-    if len(parts) >= 2:
-        name = unquote(parts[-2])
-        code = unquote(parts[-1])
-        filename = f"{name}_{code}.html"
-    else:
-        filename = unquote(parts[-1]) + ".html"
-    # sanitize filename a tiny bit
-    filename = filename.replace(" ", "_")
-    return filename
+    return page_name(url)
 
 
 def fetch_url(url):
     """
     Fetch URL using global PROXIES and HEADERS.
-    Returns tuple (status_code, response_bytes, response_headers)
+    Returns tuple (status_code, response_bytes, response_headers, wire_size)
     or raises requests.RequestException
     """
 
-    if NOPROXY:
-        print("NO PROXY")
-        resp = requests.get(url, headers=HEADERS,  timeout=REQUEST_TIMEOUT)
-    else:
-        print(PROXY)
-        resp = requests.get(url, headers=HEADERS, proxies=PROXIES, timeout=REQUEST_TIMEOUT)
-
-    resp.raise_for_status()
-    return resp.status_code, resp.content, resp.headers
-
-
-def compressed_size(data_bytes):
-    """Return gzip-compressed size of bytes."""
-    gz = gzip.compress(data_bytes)
-    return len(gz)
-
-
-def extract_title(html_bytes):
-    try:
-        html = html_bytes.decode("utf-8", errors="ignore")
-    except Exception:
-        html = html_bytes.decode("latin1", errors="ignore")
-    m = _RE_TITLE.search(html)
-    return m.group(1).strip() if m else ""
-
-
-def extract_canonical(html_bytes):
+    proxy = METER.admit(None if NOPROXY else PROXIES)  # single proxy: waits when over budget
+    trace = TRACER.begin(url, proxy, sync=True)
+    wire_size = 0
     try:
-        html = html_bytes.decode("utf-8", errors="ignore")
-    except Exception:
-        html = html_bytes.decode("latin1", errors="ignore")
-    m = _RE_CANON.search(html)
-    return m.group(1).strip() if m else None
+        if NOPROXY:
+            print("NO PROXY")
+            resp = replay_get(url, headers=HEADERS,  timeout=REQUEST_TIMEOUT, stream=True)
+        else:
+            print(PROXY)
+            resp = replay_get(url, headers=HEADERS, proxies=PROXIES, timeout=REQUEST_TIMEOUT, stream=True)
+
+        with resp:
+            if trace is not None:
+                trace.mark("headers")
+                trace.status = resp.status_code
+            resp.raise_for_status()
+            try:
+                if STREAMING:
+                    content, wire_size = read_streaming(url, resp)
+                else:
+                    content, wire_size = read_requests_body(resp)
+            except (ValueError, zlib.error) as e:
+                raise requests.exceptions.ContentDecodingError(e)
+    except requests.RequestException as e:
+        TRACER.finish(url, f"error: {e}")
+        raise
+    finally:
+        if trace is not None:
+            trace.mark("body_end")
+            trace.wire_bytes = wire_size
+        METER.record(proxy, wire_size)
+    return resp.status_code, content, resp.headers, wire_size
+
+
+def read_streaming(url, resp):
+    """
+    Read the body chunk by chunk and check the head as soon as </head> arrives.
+    On a captcha or canonical mismatch the connection is closed right away and
+    only the head is returned; the title/canonical checks then stop the run.
+    """
+    decoder = make_decoder(resp.headers.get("Content-Encoding"))
+    head = HeadCheck(url)
+    parts = []
+    wire_size = 0
+    for chunk in resp.raw.stream(STREAM_CHUNK, decode_content=False):
+        wire_size += len(chunk)
+        data = decoder.decompress(chunk)
+        parts.append(data)
+        if head.feed(data):
+            logging.warning("Head check failed (%s) after %d bytes, closing connection", head.reason, wire_size)
+            resp.close()
+            return b"".join(parts), wire_size
+    parts.append(decoder.flush())
+    return b"".join(parts), wire_size
 
 
 def save_html(folder, filename, html_bytes):
@@ -164,58 +172,63 @@ def fetch_content():
 
     logging.info("Will process %d URLs. Data folder: %s", len(urls), DATAFOLDER)
 
-    for idx, url in enumerate(urls, start=1):
-        logging.info("[%d/%d] Processing: %s", idx, len(urls), url)
-        filename = parse_filename_from_url(url)
-        file_path = os.path.join(DATAFOLDER, filename)
-
-
-        if os.path.isfile(file_path):
-            logging.info("File already exists, skipping fetch: %s", file_path)
-            continue
-
-        # Only attempt network fetch when file does not already exist
-        try:
-            status, content, headers = fetch_url(url)
-        except requests.RequestException as e:
-            logging.error("Fetch error: %s", e)
-            logging.error("Fetch error")
-            sys.exit(1)
-
-        # Check compressed size (gzip)
-        size_gz = compressed_size(content)
-        logging.info("Gzip-compressed size: %d bytes", size_gz)
-        if size_gz > SIZELIMIT:
-            logging.error("Compressed size < 50000: stopping. Fetch error")
-            logging.error("Fetch error")
-            sys.exit(1)
-
-        # Check title
-        title = extract_title(content)
-        logging.info("Title: %s", title)
-        if title == "RegisterOpenUser":
-            logging.error("Capcsa error")
-            sys.exit(1)
-
-        # Check canonical
-        canonical = extract_canonical(content)
-        logging.info("Canonical: %s", canonical)
-        # Compare canonical to original URL exactly (per requirement)
-        if canonical is None:
-            logging.error("No canonical tag found: URL error")
-            logging.error("URL error")
-            sys.exit(1)
-        # Normalize trivial trailing slash differences
-        norm_canonical = canonical.rstrip("/")
-        norm_url = url.rstrip("/")
-        if norm_canonical != norm_url:
-            logging.error("Canonical href != URL: URL error")
-            logging.error("URL error")
-            sys.exit(1)
-
-        # Save file
-        filename = parse_filename_from_url(url)
-        save_html(DATAFOLDER, filename, content)
+    with SeenSet(FETCHED) as fetched:
+        for idx, url in enumerate(urls, start=1):
+            logging.info("[%d/%d] Processing: %s", idx, len(urls), url)
+            filename = parse_filename_from_url(url)
+            file_path = page_path(DATAFOLDER, url)  # DATAFOLDER/ab/cd/<filename>
+
+
+            if os.path.isfile(file_path):
+                logging.info("File already exists, skipping fetch: %s", file_path)
+                continue
+
+            # Only attempt network fetch when file does not already exist
+            try:
+                with timer("fetch"):
+                    status, content, headers, wire_size = fetch_url(url)
+            except requests.RequestException as e:
+                logging.error("Fetch error: %s", e)
+                logging.error("Fetch error")
+                sys.exit(1)
+
+            # Check compressed size (gzip, or derived from the br/zstd wire size)
+            with timer("gzip_size"):
+                size_gz = gzip_equivalent_size(content, wire_size, headers.get("Content-Encoding"))
+            logging.info("Gzip-compressed size: %d bytes (%s, %d on the wire)", size_gz,
+                         headers.get("Content-Encoding", "identity"), wire_size)
+            if size_gz > SIZELIMIT:
+                logging.error("Compressed size < 50000: stopping. Fetch error")
+                logging.error("Fetch error")
+                sys.exit(1)
+
+            # Check title
+            with timer("validate"), TRACER.phase(url, "validate"):
+                title = extract_title(content)
+            logging.info("Title: %s", title)
+            if title == "RegisterOpenUser":
+                logging.error("Capcsa error")
+                sys.exit(1)
+
+            # Check canonical
+            with timer("validate"), TRACER.phase(url, "validate"):
+                canonical = extract_canonical(content)
+            logging.info("Canonical: %s", canonical)
+            # Compare canonical to original URL exactly (per requirement)
+            if canonical is None:
+                logging.error("No canonical tag found: URL error")
+                logging.error("URL error")
+                sys.exit(1)
+            if not canonical_matches(canonical, url):
+                logging.error("Canonical href != URL: URL error")
+                logging.error("URL error")
+                sys.exit(1)
+
+            # Save file
+            with timer("save"), TRACER.phase(url, "write"):
+                save_html(os.path.dirname(file_path), filename, content)
+            TRACER.finish(url, "saved")
+            fetched.add(url)
 
     logging.info("All done.")
 
@@ -249,13 +262,14 @@ if __name__ == "__main__":
 
         elif choice == '3':
             print("\n🎯 Level 2 - Content Fetching...")
-            fetch_content()
+            profile_stage("cwall_fetch_content", fetch_content)
             #filter_urls()
             #if os.path.exists(FILTERED_URL_LIST):
              #   f = 1
                 # fetch_content()
         elif choice == '4':
             print("\n🎯 Order URLs content to NAME FOLDER...")
+            profile_stage("cwall_migrate_layout", migrate, DATAFOLDER)
 
         elif choice == '5':
             print("👋 Exiting...")
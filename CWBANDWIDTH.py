@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+CW proxy bandwidth accounting
+- Every fetch path records wire bytes and request count per proxy (CW,
+  CWSITEMAP, CWALL, CWSITEMAPROXY, CWSITEMAPROXYPARAM, CWSITEMAPPROXY, the
+  aiohttp / HTTP/2 engines and the pipeline's sitemap worker)
+- Totals, per-hour buckets and a short history of runs persist in BANDWIDTH.json;
+  several processes share it: each save adds this process's new bytes to the
+  file under a lock file (read-merge-write) and reloads everyone's totals,
+  so budgets see the other processes' use as of the last save
+- The async engines call record_async(): a due save (lock wait + file write)
+  runs in a worker thread, never on the event loop
+- Optional budgets (bytes per proxy per hour / rolling 24h):
+    throttle - wait until the proxy is back inside its budget
+    reroute  - switch to another proxy that still has budget, throttle if none has
+- Proxies are labelled host:port, credentials are never written to disk
+- With --replay (CWREPLAY) nothing goes over the network: no accounting, no budgets
+
+Usage:
+  python CWBANDWIDTH.py            # print totals per proxy
+"""
+
+import os
+import json
+import time
+import sys
+import atexit
+import asyncio
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# === CONSTANTS ===
+cwd = os.getcwd()
+BANDWIDTH_FILE = os.path.join(cwd, "BANDWIDTH.json")
+BUDGET_HOURLY = None  # bytes per proxy per clock hour, None = unlimited
+BUDGET_DAILY = None  # bytes per proxy over the last 24 hours, None = unlimited
+BUDGET_ACTION = "throttle"  # or "reroute"
+SAVE_EVERY = 200  # requests between saves
+KEEP_HOURS = 48
+KEEP_RUNS = 50
+THROTTLE_STEP = 60  # seconds between budget re-checks while throttled
+LOCK_STALE = 10  # seconds after which a left-over lock file is broken
+DIRECT = "direct"
+OFFLINE = "--replay" in sys.argv  # responses come from the CWREPLAY cache
+
+
+def proxy_label(proxy):
+    """host:port for a proxy given as None, 'user:pw@host:port', a URL or a requests proxies dict"""
+    if not proxy:
+        return DIRECT
+    if isinstance(proxy, dict):
+        proxy = proxy.get("https") or proxy.get("http")
+        if not proxy:
+            return DIRECT
+    proxy = str(proxy)
+    if "://" not in proxy:
+        proxy = "http://" + proxy
+    parts = urlsplit(proxy)
+    return f"{parts.hostname}:{parts.port}" if parts.port else (parts.hostname or DIRECT)
+
+
+def _hour(ts=None):
+    return int((time.time() if ts is None else ts) // 3600)
+
+
+def _fmt(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+@contextmanager
+def _file_lock(path, stale=LOCK_STALE):
+    """Cross-process lock: exclusive creation of path; a lock older than stale seconds is broken"""
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > stale:
+                    os.remove(path)
+                    continue
+            except OSError:
+                continue  # released meanwhile
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _load(path):
+    """(proxies, runs) as saved in path"""
+    if not os.path.exists(path):
+        return {}, []
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    proxies = {}
+    for label, entry in data.get("proxies", {}).items():
+        entry["hours"] = {int(h): b for h, b in entry.get("hours", {}).items()}
+        proxies[label] = entry
+    return proxies, data.get("runs", [])
+
+
+def _add(entries, label, wire_bytes, requests, hour_bytes):
+    entry = entries.get(label)
+    if entry is None:
+        entry = entries[label] = {"bytes": 0, "requests": 0, "hours": {}}
+    entry["bytes"] += wire_bytes
+    entry["requests"] += requests
+    for hour, b in hour_bytes.items():
+        entry["hours"][hour] = entry["hours"].get(hour, 0) + b
+
+
+class BandwidthMeter:
+    """Per-proxy byte/request counters with hourly buckets and budget checks"""
+
+    def __init__(self, path=BANDWIDTH_FILE, hourly=BUDGET_HOURLY, daily=BUDGET_DAILY, action=BUDGET_ACTION):
+        self.path = path
+        self.hourly = hourly
+        self.daily = daily
+        self.action = action
+        self.proxies, self.runs = _load(path)  # label -> {"bytes", "requests", "hours": {hour: bytes}}
+        self.unsaved = {}  # same shape: this process's bytes not in the file yet
+        self.run = {"started": time.strftime("%Y-%m-%d %H:%M:%S"), "proxies": {}}
+        self._pending = 0
+        self._saving = False  # a periodic save is scheduled or running
+        self._lock = threading.Lock()  # counters; never held while waiting for the file lock
+        self._save_lock = threading.Lock()  # one save at a time
+
+    # === ACCOUNTING ===
+    def _account(self, proxy, wire_bytes, requests):
+        """Add to the counters; True when this call should trigger a periodic save"""
+        label = proxy_label(proxy)
+        hour = _hour()
+        with self._lock:
+            _add(self.proxies, label, wire_bytes, requests, {hour: wire_bytes})
+            _add(self.unsaved, label, wire_bytes, requests, {hour: wire_bytes})
+            run = self.run["proxies"].setdefault(label, {"bytes": 0, "requests": 0})
+            run["bytes"] += wire_bytes
+            run["requests"] += requests
+            self._pending += requests
+            due = self._pending >= SAVE_EVERY and not self._saving
+            if due:
+                self._saving = True
+        return due
+
+    def record(self, proxy, wire_bytes, requests=1):
+        """Add one request's wire bytes (body as received, before decoding)"""
+        if not OFFLINE and self._account(proxy, wire_bytes, requests):
+            self.save()
+
+    async def record_async(self, proxy, wire_bytes, requests=1):
+        """record() for the async engines; a due save runs in a worker thread"""
+        if not OFFLINE and self._account(proxy, wire_bytes, requests):
+            await asyncio.to_thread(self.save)
+
+    def used(self, proxy, hours=1):
+        """Bytes through proxy in the current hour (hours=1) or the last `hours` clock hours"""
+        entry = self.proxies.get(proxy_label(proxy))
+        if entry is None:
+            return 0
+        now = _hour()
+        return sum(b for h, b in entry["hours"].items() if h > now - hours)
+
+    def over_budget(self, proxy):
+        """'hourly' / 'daily' when the proxy has used up a budget, else None"""
+        if self.hourly is not None and self.used(proxy, 1) >= self.hourly:
+            return "hourly"
+        if self.daily is not None and self.used(proxy, 24) >= self.daily:
+            return "daily"
+        return None
+
+    # === BUDGET ENFORCEMENT ===
+    def _choose(self, proxy, alternatives):
+        """(proxy to use, None) or (proxy, budget it is over) when nothing has budget left"""
+        over = self.over_budget(proxy)
+        if not over:
+            return proxy, None
+        if self.action == "reroute":
+            for other in alternatives:
+                if not self.over_budget(other):
+                    print(f"🔀 {proxy_label(proxy)} over {over} budget, rerouting via {proxy_label(other)}")
+                    return other, None
+        return proxy, over
+
+    def _throttle_delay(self):
+        return min(THROTTLE_STEP, 3600 - time.time() % 3600 + 1)
+
+    def admit(self, proxy, alternatives=()):
+        """Proxy to use for the next request; sleeps while every option is over budget"""
+        if OFFLINE or (self.hourly is None and self.daily is None):
+            return proxy
+        while True:
+            chosen, over = self._choose(proxy, alternatives)
+            if not over:
+                return chosen
+            delay = self._throttle_delay()
+            print(f"⏳ {proxy_label(proxy)} over {over} budget "
+                  f"({_fmt(self.used(proxy, 1 if over == 'hourly' else 24))}), waiting {delay:.0f}s")
+            time.sleep(delay)
+
+    async def admit_async(self, proxy, alternatives=()):
+        """admit() for the async engines; waits without blocking the loop"""
+        if OFFLINE or (self.hourly is None and self.daily is None):
+            return proxy
+        while True:
+            chosen, over = self._choose(proxy, alternatives)
+            if not over:
+                return chosen
+            await asyncio.sleep(self._throttle_delay())
+
+    # === PERSISTENCE ===
+    def save(self, finish=False):
+        """Add the unsaved bytes to the file (merged with other processes) and reload the totals.
+        Requests recorded meanwhile go on counting: only the deltas taken here are written"""
+        with self._save_lock:
+            with self._lock:
+                unsaved, self.unsaved = self.unsaved, {}
+                self._pending = 0
+                run = None
+                if finish and self.run["proxies"]:
+                    self.run["finished"] = time.strftime("%Y-%m-%d %H:%M:%S")
+                    run, self.run = self.run, {"started": self.run["finished"], "proxies": {}}
+            try:
+                with _file_lock(self.path + ".lock"):
+                    proxies, runs = _load(self.path)
+                    for label, entry in unsaved.items():
+                        _add(proxies, label, entry["bytes"], entry["requests"], entry["hours"])
+                    oldest = _hour() - KEEP_HOURS
+                    for entry in proxies.values():
+                        entry["hours"] = {h: b for h, b in entry["hours"].items() if h > oldest}
+                    if run is not None:
+                        runs = (runs + [run])[-KEEP_RUNS:]
+                    tmp = f"{self.path}.{os.getpid()}.tmp"
+                    with open(tmp, "w", encoding="utf-8") as f:
+                        json.dump({"proxies": proxies, "runs": runs}, f, indent=1)
+                    os.replace(tmp, self.path)
+            except BaseException:
+                with self._lock:  # keep the deltas for the next save
+                    for label, entry in unsaved.items():
+                        _add(self.unsaved, label, entry["bytes"], entry["requests"], entry["hours"])
+                    self._saving = False
+                raise
+            with self._lock:
+                for label, entry in self.unsaved.items():  # recorded while the file was written
+                    _add(proxies, label, entry["bytes"], entry["requests"], entry["hours"])
+                self.proxies, self.runs = proxies, runs
+                self._saving = False
+
+    def close(self):
+        """Save and close the run; atexit does it, worker processes call it themselves"""
+        if self.run["proxies"]:
+            self.save(finish=True)
+
+    def report(self):
+        print(f"📶 Proxy bandwidth ({self.path})")
+        print(f"  {'proxy':<32} {'requests':>10} {'total':>10} {'hour':>10} {'24h':>10} {'avg/req':>10}")
+        for label, entry in sorted(self.proxies.items()):
+            avg = entry["bytes"] / entry["requests"] if entry["requests"] else 0
+            print(f"  {label:<32} {entry['requests']:>10,} {_fmt(entry['bytes']):>10} "
+                  f"{_fmt(self.used(label, 1)):>10} {_fmt(self.used(label, 24)):>10} {_fmt(avg):>10}")
+        if self.runs:
+            last = self.runs[-1]
+            total = sum(p["bytes"] for p in last["proxies"].values())
+            count = sum(p["requests"] for p in last["proxies"].values())
+            print(f"  Last run {last['started']} - {last.get('finished', '?')}: {count:,} requests, {_fmt(total)}")
+
+
+METER = BandwidthMeter()
+atexit.register(METER.close)
+
+
+if __name__ == "__main__":
+    METER.report()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+CW microbenchmarks
+- Times the CPU-bound code that runs on every item, with fixture data built
+  from a fixed seed (so runs are comparable):
+    a sitemap of SITEMAP_URLS <url> entries, company URLs in every spelling
+    the site uses, company pages of ~60-120 KB with a real-looking head,
+    data tables and seat / tax / registration fields, a captcha page
+- Each benchmark reports items per second (URLs, pages, sitemap entries):
+  best of REPEATS runs of at least MIN_TIME seconds each
+- Results are compared with BENCH_BASELINE.json; a benchmark more than
+  REGRESSION slower is flagged and the exit code is 1
+- Benchmarks whose module needs a missing package (aiohttp, requests) are skipped
+
+Usage:
+  python CWBENCH.py                 # run all, compare with the baseline
+  python CWBENCH.py url page        # only benchmarks whose name contains a word
+  python CWBENCH.py --save          # store this run as the new baseline
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+from urllib.parse import quote
+from CWPROFILE import cli_args
+
+# === CONSTANTS ===
+BASELINE = "BENCH_BASELINE.json"
+SAVE = "--save" in sys.argv
+SEED = 20240601
+SITEMAP_URLS = 20_000  # <url> entries in the fixture sitemap
+URL_COUNT = 20_000
+PAGE_COUNT = 50
+MIN_TIME = 0.2  # seconds per timed run
+REPEATS = 5
+REGRESSION = 0.15  # slower than baseline by more than this share is a regression (run-to-run noise is ~10%)
+
+LEGAL_FORMS = ("kft", "bt", "zrt", "nyrt", "ev", "v-a", "f-a", "egyesulet", "alapitvany")
+WORDS = ("horizont", "plast", "építő", "szolgáltató", "kereskedelmi", "duna", "tisza", "agro", "invest",
+         "logisztika", "mérnöki", "iroda", "faipari", "autó", "gépészet", "pannon", "alföld", "média")
+CODE_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+
+# === FIXTURES ===
+def _code(rng):
+    return "MM" + "".join(rng.choice(CODE_ALPHABET) for _ in range(6))
+
+
+def _slug(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(1, 3))]
+    return "-".join(words) + "-" + rng.choice(LEGAL_FORMS)
+
+
+def company_urls(count=URL_COUNT, seed=SEED):
+    """Company URLs as they appear in sitemaps and lists: encoded / plain section, www or not, trailing slash"""
+    rng = random.Random(seed)
+    urls = []
+    for _ in range(count):
+        slug, code = _slug(rng), _code(rng)
+        roll = rng.random()
+        if roll < 0.7:
+            urls.append(f"https://www.companywall.hu/v%C3%A1llalat/{quote(slug)}/{code}")
+        elif roll < 0.85:
+            urls.append(f"https://www.companywall.hu/vállalat/{slug}/{code}/")
+        elif roll < 0.95:
+            urls.append(f"https://companywall.hu/v%C3%A1llalat/{quote(slug)}/{code}?ref=list")
+        else:
+            urls.append(f"https://www.companywall.hu/hirek/{slug}")
+    return urls
+
+
+def sitemap_xml(count=SITEMAP_URLS, seed=SEED):
+    rng = random.Random(seed)
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+    for url in company_urls(count, seed):
+        parts.append(f"<url>\n<loc>{url}</loc>\n<lastmod>2024-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}</lastmod>\n"
+                     f"<changefreq>{rng.choice(('daily', 'weekly', 'monthly'))}</changefreq>\n"
+                     f"<priority>0.{rng.randint(1, 9)}</priority>\n</url>\n")
+    parts.append("</urlset>\n")
+    return "".join(parts)
+
+
+def company_page(rng, url=None):
+    """(url, html bytes) of a company page: scripts and styles in the head, tables in the body"""
+    slug, code = _slug(rng), _code(rng)
+    url = url or f"https://www.companywall.hu/v%C3%A1llalat/{quote(slug)}/{code}"
+    name = slug.replace("-", " ").title()
+    head = (f"<!DOCTYPE html><html lang=\"hu\"><head><meta charset=\"utf-8\">"
+            f"<title>{name} - CompanyWall</title>"
+            f"<meta name=\"description\" content=\"{name} cégadatok, pénzügyi adatok, kapcsolatok\">"
+            + "".join(f"<link rel=\"stylesheet\" href=\"/static/css/site{i}.css?v={rng.randint(1, 999)}\">"
+                      for i in range(6))
+            + "<script>" + "var x=1;" * rng.randint(300, 900) + "</script>"
+            + f"<link rel=\"canonical\" href=\"{url}\"></head>")
+    rows = "".join(f"<tr><td>{rng.randint(2015, 2024)}</td><td>{rng.randint(1, 10 ** 9):,}</td>"
+                   f"<td>{rng.randint(-10 ** 7, 10 ** 8):,}</td><td>{rng.choice(WORDS)}</td></tr>"
+                   for _ in range(rng.randint(300, 700)))
+    body = (f"<body><header><nav>" + "<a href=\"/x\">menü</a>" * 80 + "</nav></header>"
+            f"<main><h1>{name}</h1><dl><dt>Adószám</dt><dd>{rng.randint(10 ** 7, 10 ** 8 - 1)}-2-{rng.randint(1, 44):02d}</dd>"
+            f"<dt>Cégjegyzékszám</dt><dd>{rng.randint(1, 20):02d}-09-{rng.randint(0, 999999):06d}</dd>"
+            f"<dt>Székhely:</dt><dd>{rng.randint(1000, 9999)} Budapest, {rng.choice(WORDS).title()} utca {rng.randint(1, 200)}.</dd></dl>"
+            f"<table>{rows}</table></main><footer>" + "<p>CompanyWall Kft.</p>" * 50 + "</footer></body></html>")
+    return url, (head + body).encode("utf-8")
+
+
+def company_pages(count=PAGE_COUNT, seed=SEED):
+    rng = random.Random(seed)
+    return [company_page(rng) for _ in range(count)]
+
+
+def captcha_page():
+    return b"<html><head><title>RegisterOpenUser</title></head><body>" + b"<div>captcha</div>" * 200 + b"</body></html>"
+
+
+# === BENCHMARKS ===
+def _each(func, items):
+    def run():
+        for item in items:
+            func(item)
+    return run, len(items)
+
+
+def bench_sitemap_entries():
+    from CWSCHEDULE import sitemap_entries
+    xml = sitemap_xml()
+    return (lambda: sitemap_entries(xml)), SITEMAP_URLS
+
+
+def bench_sitemap_loc_regex():
+    from CWSCHEDULE import _RE_LOC
+    xml = sitemap_xml()
+    return (lambda: _RE_LOC.findall(xml)), SITEMAP_URLS
+
+
+def bench_url_filter():
+    from CWURL import is_wanted_url
+    return _each(is_wanted_url, company_urls())
+
+
+def bench_url_slug():
+    from CWURL import url_slug  # parse_url_tree()
+    return _each(url_slug, company_urls())
+
+
+def bench_url_page_name():
+    from CWURL import page_name  # parse_filename_from_url()
+    return _each(page_name, company_urls())
+
+
+def bench_url_company_keys():
+    from CWURL import company_keys
+    urls = company_urls()
+    return (lambda: company_keys(urls)), len(urls)
+
+
+def bench_url_sort_key():
+    from CWSORT import url_key
+    rows = [[url] for url in company_urls()]
+    return _each(url_key, rows)
+
+
+def bench_url_page_path():
+    from CWLAYOUT import page_path
+    return _each(lambda url: page_path("Companies", url), company_urls())
+
+
+def bench_schedule_score():
+    from CWSCHEDULE import Scorer, sitemap_entries
+    rows = sitemap_entries(sitemap_xml())
+    scorer = Scorer(None, {}, now=1.7e9)
+    return _each(scorer.score, rows)
+
+
+def bench_page_compressed_size():
+    from CWVALIDATE import compressed_size
+    return _each(compressed_size, [html for _, html in company_pages()])
+
+
+def bench_page_size_ok():
+    from CWVERIFY import size_ok
+    return _each(size_ok, [html for _, html in company_pages()])
+
+
+def bench_page_extract_title():
+    from CWVALIDATE import extract_title
+    return _each(extract_title, [html for _, html in company_pages()] + [captcha_page()])
+
+
+def bench_page_extract_canonical():
+    from CWVALIDATE import extract_canonical
+    return _each(extract_canonical, [html for _, html in company_pages()])
+
+
+def bench_page_validate():
+    from CWVALIDATE import validate_page
+    pages = company_pages()
+    return _each(lambda page: validate_page(*page), pages)
+
+
+def bench_page_head_check():
+    from CWVALIDATE import STREAM_CHUNK, HeadCheck
+    pages = company_pages()
+
+    def run():
+        for url, html in pages:
+            head = HeadCheck(url)
+            for start in range(0, len(html), STREAM_CHUNK):
+                head.feed(html[start:start + STREAM_CHUNK])
+                if head.done:
+                    break
+    return run, len(pages)
+
+
+def bench_page_extract_record():
+    from CWINDEX import extract_record
+    return _each(extract_record, [html for _, html in company_pages()])
+
+
+BENCHMARKS = {name[len("bench_"):]: func for name, func in sorted(globals().items()) if name.startswith("bench_")}
+
+
+# === RUNNER ===
+def measure(run, items, min_time=MIN_TIME, repeats=REPEATS):
+    """Best items/second over repeats; each timed run loops until min_time has passed"""
+    loops = 1
+    while True:  # calibrate
+        started = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)) + 1)
+    best = elapsed
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            run()
+        best = min(best, time.perf_counter() - started)
+    return items * loops / best
+
+
+def load_baseline(path=BASELINE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+def save_baseline(results, path=BASELINE):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"saved": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+                   "machine": platform.platform(), "results": results}, f, indent=2, sort_keys=True)
+    print(f"💾 Baseline saved -> {path}")
+
+
+def run_all(words=(), baseline=None):
+    """Run the selected benchmarks; returns (results, regressions)"""
+    baseline = load_baseline() if baseline is None else baseline
+    results, regressions = {}, []
+    print(f"🏁 CW microbenchmarks (Python {platform.python_version()}, best of {REPEATS} x {MIN_TIME}s)")
+    print(f"  {'benchmark':<28} {'items/s':>14} {'baseline':>14} {'change':>8}")
+    for name, bench in BENCHMARKS.items():
+        if words and not any(word in name for word in words):
+            continue
+        try:
+            run, items = bench()
+        except ImportError as e:
+            print(f"  {name:<28} {'skipped':>14}  ({e.name or e} not installed)")
+            continue
+        rate = measure(run, items)
+        results[name] = round(rate, 1)
+        base = baseline.get(name)
+        if base:
+            change = rate / base - 1
+            flag = " ⚠️" if change < -REGRESSION else (" 🚀" if change > REGRESSION else "")
+            if change < -REGRESSION:
+                regressions.append(name)
+            print(f"  {name:<28} {rate:>14,.0f} {base:>14,.0f} {change:>+8.1%}{flag}")
+        else:
+            print(f"  {name:<28} {rate:>14,.0f} {'-':>14} {'new':>8}")
+    return results, regressions
+
+
+def main():
+    words = cli_args()
+    results, regressions = run_all(words)
+    if SAVE:
+        baseline = load_baseline()
+        baseline.update(results)
+        save_baseline(baseline)
+    elif regressions:
+        print(f"❌ {len(regressions)} regression(s) over {REGRESSION:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    else:
+        print("✅ No regressions" if load_baseline() else "ℹ️  No baseline yet: python CWBENCH.py --save")
+
+
+if __name__ == "__main__":
+    main()
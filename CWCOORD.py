@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+CW crawl coordinator
+- Coordinator hands out URL shards (URL_LIST{N}.csv) or URL batches to workers
+  under time-limited leases over XML-RPC
+- Expired leases go back to the queue; workers renew them while fetching
+- Completion reports are appended to COORD_REPORT.csv, finished tasks are kept
+  in COORD_STATE.json so a restarted coordinator resumes where it stopped; the
+  state is keyed by a fingerprint of the tasks, so a new input list starts
+  over, and --reset discards it
+- Workers fetch with the CWSITEMAPROXYASYNC engine; a shard task saves into
+  its own Companies_{N} folder, the one its remaining work is counted in
+
+Usage:
+  python CWCOORD.py serve [shards|batches] [--reset]        # coordinator
+  python CWCOORD.py work http://host:8765 [name]            # worker on any machine
+  python CWCOORD.py local [workers] [--dry-run] [--reset]   # coordinator + N local worker processes
+"""
+
+import os
+import csv
+import sys
+import json
+import time
+import uuid
+import hashlib
+import socket
+import threading
+import multiprocessing
+from collections import deque
+from socketserver import ThreadingMixIn
+from xmlrpc.server import SimpleXMLRPCServer
+from xmlrpc.client import ServerProxy
+from CWPROFILE import cli_args
+from CWSHARD import remaining_work, shard_folder
+
+# === CONSTANTS ===
+FILTERED_URL_LIST = "FILTERED_URL_LIST.csv"
+COORD_STATE = "COORD_STATE.json"
+COORD_REPORT = "COORD_REPORT.csv"
+HOST = "0.0.0.0"
+PORT = 8765
+LEASE_SECONDS = 15 * 60
+LEASE_BATCH = 500  # URLs per task in batch mode
+RENEW_EVERY = 60  # worker heartbeat, seconds
+IDLE_WAIT = 10  # worker sleep when every task is leased
+DRY_RUN = "--dry-run" in sys.argv
+RESET = "--reset" in sys.argv  # forget the finished tasks of COORD_STATE
+
+
+def load_urls(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [row[0].strip() for row in csv.reader(f) if row and row[0].strip()]
+
+
+def shard_files():
+    """URL_LIST{N}.csv files in cwd as {N: filename}"""
+    shards = {}
+    for name in os.listdir("."):
+        number = name[len("URL_LIST"):-len(".csv")]
+        if name.startswith("URL_LIST") and name.endswith(".csv") and number.isdigit():
+            shards[int(number)] = name
+    return shards
+
+
+def build_tasks(mode):
+    """task id -> list of URLs; shard ids keep the N of URL_LIST{N}.csv"""
+    if mode == "batches":
+        urls = load_urls(FILTERED_URL_LIST)
+        return {f"batch{i // LEASE_BATCH + 1}": urls[i:i + LEASE_BATCH] for i in range(0, len(urls), LEASE_BATCH)}
+    # Largest remaining work first, so the last leases are the short ones
+    files = shard_files()
+    numbers = sorted(files, key=remaining_work, reverse=True)
+    return {f"shard{number}": load_urls(files[number]) for number in numbers}
+
+
+def task_folder(task):
+    """Folder a task's pages are saved in, relative to the worker's cwd; None = DATAFOLDER"""
+    if task.startswith("shard"):
+        return os.path.basename(shard_folder(int(task[len("shard"):])))
+    return None
+
+
+def tasks_fingerprint(tasks):
+    """Digest of task ids and URLs: state saved for other tasks is not resumed"""
+    digest = hashlib.blake2b(digest_size=16)
+    for task in sorted(tasks):
+        digest.update(task.encode("utf-8") + b"\0")
+        for url in tasks[task]:
+            digest.update(url.encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+# === COORDINATOR ===
+class Coordinator:
+    """Lease bookkeeping; every public method is an XML-RPC call"""
+
+    def __init__(self, tasks, lease_seconds=LEASE_SECONDS, state_path=COORD_STATE, report_path=COORD_REPORT,
+                 reset=RESET):
+        self.tasks = tasks
+        self.fingerprint = tasks_fingerprint(tasks)
+        self.reset = reset
+        self.lease_seconds = lease_seconds
+        self.state_path = state_path
+        self.report_path = report_path
+        self.lock = threading.Lock()
+        self.done = self._load_state()
+        self.pending = deque(t for t in tasks if t not in self.done)
+        self.leases = {}  # lease_id -> [task, worker, expires]
+
+    def _load_state(self):
+        if self.reset or not os.path.exists(self.state_path):
+            return set()
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("fingerprint") != self.fingerprint:
+            print(f"⚠️  {self.state_path} belongs to other tasks, starting over")
+            return set()
+        return set(state.get("done", []))
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "done": sorted(self.done)}, f)
+        os.replace(tmp, self.state_path)
+
+    def _reclaim_expired(self):
+        now = time.time()
+        for lease_id, (task, worker, expires) in list(self.leases.items()):
+            if expires < now:
+                del self.leases[lease_id]
+                if task not in self.done:
+                    print(f"⏰ Lease expired: {task} ({worker}), re-queued")
+                    self.pending.appendleft(task)
+
+    def lease(self, worker):
+        with self.lock:
+            self._reclaim_expired()
+            if not self.pending:
+                if self.leases:
+                    return {"wait": IDLE_WAIT}
+                return {"finished": True}
+            task = self.pending.popleft()
+            lease_id = uuid.uuid4().hex
+            self.leases[lease_id] = [task, worker, time.time() + self.lease_seconds]
+            print(f"📤 {task} -> {worker} ({len(self.pending)} pending, {len(self.leases)} leased)")
+            return {"lease_id": lease_id, "task": task, "urls": self.tasks[task],
+                    "folder": task_folder(task), "lease_seconds": self.lease_seconds}
+
+    def renew(self, lease_id):
+        with self.lock:
+            lease = self.leases.get(lease_id)
+            if lease is None:
+                return False  # expired and possibly re-issued
+            lease[2] = time.time() + self.lease_seconds
+            return True
+
+    def complete(self, lease_id, report):
+        with self.lock:
+            lease = self.leases.pop(lease_id, None)
+            task = lease[0] if lease else report.get("task")
+            if task is None or task in self.done:
+                return False
+            self.done.add(task)
+            if task in self.pending:
+                self.pending.remove(task)
+            for other_id in [lid for lid, other in self.leases.items() if other[0] == task]:
+                del self.leases[other_id]  # re-issued copy of a lease that finished late
+            self._save_state()
+            self._write_report(task, report)
+            print(f"✅ {task} done by {report.get('worker')}: {report.get('saved', 0)} saved, "
+                  f"{report.get('exists', 0)} existed, {report.get('errors', 0)} errors "
+                  f"({len(self.done)}/{len(self.tasks)})")
+            return True
+
+    def _write_report(self, task, report):
+        new_file = not os.path.exists(self.report_path)
+        with open(self.report_path, "a", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(["time", "task", "worker", "urls", "saved", "exists", "errors", "seconds"])
+            writer.writerow([time.strftime("%Y-%m-%d %H:%M:%S"), task, report.get("worker"), report.get("urls"),
+                             report.get("saved"), report.get("exists"), report.get("errors"),
+                             report.get("seconds")])
+
+    def status(self):
+        with self.lock:
+            self._reclaim_expired()
+            return {"tasks": len(self.tasks), "done": len(self.done), "pending": len(self.pending),
+                    "leased": {lid: lease[:2] for lid, lease in self.leases.items()}}
+
+
+class _ThreadedXMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+
+
+def make_server(coordinator, host=HOST, port=PORT):
+    server = _ThreadedXMLRPCServer((host, port), logRequests=False, allow_none=True)
+    server.register_instance(coordinator)
+    return server
+
+
+def serve(mode="shards", host=HOST, port=PORT):
+    tasks = build_tasks(mode)
+    if not tasks:
+        print("❌ No tasks found! Create URL_LIST{N}.csv shards or FILTERED_URL_LIST.csv first.")
+        return
+    coordinator = Coordinator(tasks)
+    print(f"🚀 Coordinator on {host}:{port}: {len(tasks)} tasks ({mode}), {len(coordinator.done)} already done")
+    with make_server(coordinator, host, port) as server:
+        server.serve_forever()
+
+
+# === WORKER ===
+def _heartbeat(coordinator_url, lease_id, stop):
+    proxy = ServerProxy(coordinator_url, allow_none=True)
+    while not stop.wait(RENEW_EVERY):
+        try:
+            if not proxy.renew(lease_id):
+                print(f"⚠️  Lease {lease_id[:8]} lost")
+                return
+        except OSError as e:
+            print(f"⚠️  Renew failed: {e}")
+
+
+def run_task(urls, worker=None, folder=None):
+    """Fetch a task's URLs with the async engine into folder; returns (saved, existed, errors).
+    The worker name picks the proxy lanes, so local workers use different ports"""
+    if DRY_RUN:
+        time.sleep(0.01 * len(urls) ** 0.5)
+        return 0, len(urls), 0
+    import asyncio
+    from CWSITEMAPROXYASYNC import fetch_urls_async
+    from CWBANDWIDTH import METER
+    from CWREPLAY import CACHE
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    try:
+        return asyncio.run(fetch_urls_async(urls, identity=worker or 0, folder=folder))
+    finally:
+        METER.close()  # atexit does not run in multiprocessing children
+        CACHE.close()
+
+
+def work(coordinator_url, worker=None):
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    coordinator = ServerProxy(coordinator_url, allow_none=True)
+    print(f"🔧 Worker {worker} -> {coordinator_url}")
+    while True:
+        lease = coordinator.lease(worker)
+        if lease.get("finished"):
+            print(f"👋 Worker {worker}: no more work")
+            return
+        if "wait" in lease:
+            time.sleep(lease["wait"])
+            continue
+
+        task, urls = lease["task"], lease["urls"]
+        print(f"📥 {worker}: {task} ({len(urls)} URLs)")
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat, args=(coordinator_url, lease["lease_id"], stop), daemon=True)
+        beat.start()
+        started = time.time()
+        try:
+            saved, exists, errors = run_task(urls, worker, lease.get("folder"))
+        finally:
+            stop.set()
+        coordinator.complete(lease["lease_id"], {
+            "task": task, "worker": worker, "urls": len(urls), "saved": saved, "exists": exists,
+            "errors": errors, "seconds": round(time.time() - started, 1)})
+
+
+# === LOCAL MULTI-PROCESS RUN ===
+def run_local(workers=4, mode="shards"):
+    tasks = build_tasks(mode)
+    if not tasks:
+        print("❌ No tasks found! Create URL_LIST{N}.csv shards or FILTERED_URL_LIST.csv first.")
+        return
+    coordinator = Coordinator(tasks)
+    server = make_server(coordinator, "127.0.0.1", 0)
+    coordinator_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🚀 Local coordinator {coordinator_url}: {len(tasks)} tasks, {workers} workers")
+
+    processes = [multiprocessing.Process(target=work, args=(coordinator_url, f"local{i + 1}"))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    server.shutdown()
+
+    status = coordinator.status()
+    print(f"🎉 Local run finished: {status['done']}/{status['tasks']} tasks done")
+
+
+def main():
+    args = cli_args()
+    command = args[0] if args else "local"
+    if command == "serve":
+        serve(args[1] if len(args) > 1 else "shards")
+    elif command == "work":
+        if len(args) < 2:
+            print("❌ Usage: python CWCOORD.py work http://host:8765 [name]")
+            sys.exit(1)
+        work(args[1], args[2] if len(args) > 2 else None)
+    elif command == "local":
+        run_local(int(args[1]) if len(args) > 1 else 4, args[2] if len(args) > 2 else "shards")
+    else:
+        print(f"❌ Unknown command: {command}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
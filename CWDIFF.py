@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+CW sitemap diff
+- Level 1 writes the complete harvest of a run to HARVEST.csv
+  (url, priority, changefreq, lastmod)
+- diff() sorts it by company key with CWSORT and merge-joins it against the
+  sorted snapshot of the previous run, streaming both files:
+    DELTA_ADDED.csv    companies new in this harvest
+    DELTA_REMOVED.csv  companies gone from the sitemaps
+    DELTA_CHANGED.csv  companies whose lastmod changed
+    URL_DELTA.csv      added + changed: the only URLs the daily run filters and fetches
+- The current harvest then becomes HARVEST_SNAPSHOT.csv (already sorted)
+- Level 1 lists sitemaps it could not fetch in HARVEST_FAILED.csv; their URLs
+  are missing from the harvest, so such a run reports nothing as removed and
+  carries the previous snapshot rows forward
+- --filter writes the filtered delta to FILTERED_URL_DELTA.csv (FILTERED_URL_LIST
+  keeps the full list); --fetch also fetches it: added URLs as usual, changed
+  ones again although they are already in the fetched set
+
+Usage:
+  python CWDIFF.py [HARVEST.csv] [--filter] [--fetch]
+"""
+
+import os
+import csv
+import sys
+import asyncio
+from CWPROFILE import cli_args, profile_stage, timer
+from CWSORT import iter_csv, sorted_rows, url_key
+
+# === CONSTANTS ===
+HARVEST = "HARVEST.csv"
+HARVEST_SNAPSHOT = "HARVEST_SNAPSHOT.csv"
+DELTA_ADDED = "DELTA_ADDED.csv"
+DELTA_REMOVED = "DELTA_REMOVED.csv"
+DELTA_CHANGED = "DELTA_CHANGED.csv"
+URL_DELTA = "URL_DELTA.csv"
+FILTERED_URL_DELTA = "FILTERED_URL_DELTA.csv"
+HARVEST_FAILED = "HARVEST_FAILED.csv"  # sitemaps Level 1 could not fetch
+LASTMOD_COLUMN = 3
+FETCH = "--fetch" in sys.argv
+FILTER = "--filter" in sys.argv or FETCH
+
+
+def _lastmod(row):
+    return row[LASTMOD_COLUMN] if len(row) > LASTMOD_COLUMN else ""
+
+
+def _current(path):
+    """(key, row) of the new harvest in key order, duplicates dropped"""
+    last = None
+    for key, row in sorted_rows(iter_csv(path), url_key):
+        if key != last:
+            last = key
+            yield key, row
+
+
+def _previous(path):
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if row:
+                yield row[0], row[1:]
+
+
+def failed_sitemaps(path=HARVEST_FAILED):
+    if not os.path.exists(path):
+        return []
+    return [row[0] for row in iter_csv(path)]
+
+
+def diff(current=HARVEST, snapshot=HARVEST_SNAPSHOT):
+    """Stream-compare the harvest with the previous snapshot; returns (added, removed, changed)"""
+    if not os.path.exists(current):
+        print(f"❌ {current} not found! Run Level 1 first.")
+        return 0, 0, 0
+    first_run = not os.path.exists(snapshot)
+    failed = failed_sitemaps()
+    partial = bool(failed)
+    if partial:
+        print(f"⚠️  {len(failed)} sitemaps failed in Level 1 ({HARVEST_FAILED}): "
+              f"missing URLs are kept, not reported as removed")
+    added = removed = changed = 0
+    files = {name: open(name, "w", encoding="utf-8", newline="")
+             for name in (DELTA_ADDED, DELTA_REMOVED, DELTA_CHANGED, URL_DELTA)}
+    new_snapshot = snapshot + ".tmp"
+    try:
+        out = {name: csv.writer(f) for name, f in files.items()}
+        with timer("diff"), open(new_snapshot, "w", encoding="utf-8", newline="") as snap_f:
+            snap = csv.writer(snap_f)
+            cur_iter, prev_iter = _current(current), _previous(snapshot)
+            cur, prev = next(cur_iter, None), next(prev_iter, None)
+            while cur is not None or prev is not None:
+                if prev is None or (cur is not None and cur[0] < prev[0]):
+                    out[DELTA_ADDED].writerow(cur[1])
+                    out[URL_DELTA].writerow(cur[1])
+                    snap.writerow([cur[0]] + cur[1])
+                    added += 1
+                    cur = next(cur_iter, None)
+                elif cur is None or prev[0] < cur[0]:
+                    if partial:  # may only be missing because its sitemap failed
+                        snap.writerow([prev[0]] + prev[1])
+                    else:
+                        out[DELTA_REMOVED].writerow(prev[1])
+                        removed += 1
+                    prev = next(prev_iter, None)
+                else:
+                    if _lastmod(cur[1]) != _lastmod(prev[1]):
+                        out[DELTA_CHANGED].writerow(cur[1])
+                        out[URL_DELTA].writerow(cur[1])
+                        changed += 1
+                    snap.writerow([cur[0]] + cur[1])
+                    cur, prev = next(cur_iter, None), next(prev_iter, None)
+    finally:
+        for f in files.values():
+            f.close()
+    os.replace(new_snapshot, snapshot)
+
+    if first_run:
+        print(f"📸 First harvest snapshot: {added} URLs (all in {URL_DELTA})")
+    print(f"✅ Sitemap diff: {added} added, {removed} removed, {changed} lastmod changed -> {URL_DELTA}")
+    return added, removed, changed
+
+
+def fetch_delta(filtered=FILTERED_URL_DELTA, changed_path=DELTA_CHANGED):
+    """Fetch the filtered delta: added URLs like any list, changed ones with refetch=True
+    (they are in the fetched set and their old page is replaced)"""
+    from CWSITEMAPROXYASYNC import fetch_urls_async
+    changed_keys = {url_key(row) for row in iter_csv(changed_path)} if os.path.exists(changed_path) else set()
+    added, changed = [], []
+    for row in iter_csv(filtered):
+        (changed if url_key(row) in changed_keys else added).append(row[0])
+    print(f"📥 Delta fetch: {len(added)} added, {len(changed)} changed URLs")
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    totals = [0, 0, 0]
+    for urls, refetch in ((added, False), (changed, True)):
+        if urls:
+            for i, count in enumerate(asyncio.run(fetch_urls_async(urls, refetch=refetch))):
+                totals[i] += count
+    print(f"🎉 Delta fetch: {totals[0]} saved, {totals[1]} existed, {totals[2]} errors")
+    return tuple(totals)
+
+
+def main():
+    args = cli_args()
+    added, _, changed = profile_stage("sitemap_diff", diff, args[0] if args else HARVEST)
+    if FILTER and added + changed:
+        from CWSITEMAPROXYASYNC import filter_urls
+        filter_urls(URL_DELTA, FILTERED_URL_DELTA)
+        if FETCH:
+            profile_stage("delta_fetch", fetch_delta)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+CW content encodings
+- Advertises br / zstd next to gzip when the decoder packages are installed
+  (pip install brotli zstandard); falls back to gzip only
+- Decodes response bodies ourselves, so every fetcher sees the wire bytes
+  (for size checks and bandwidth accounting) and the decoded HTML
+- make_decoder() gives incremental decoders for streaming reads
+"""
+
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# === CONSTANTS ===
+ACCEPT_ENCODING = ", ".join(["gzip", "deflate"] + (["br"] if brotli else []) + (["zstd"] if zstandard else []))
+
+# Wire size of a page in each encoding relative to gzip, used to keep the
+# gzip-based SIZELIMIT meaningful whichever encoding the server chose
+GZIP_SIZE_RATIO = {
+    "gzip": 1.0,
+    "x-gzip": 1.0,
+    "deflate": 1.0,
+    "br": 0.8,
+    "zstd": 0.9,
+}
+
+
+# === DECODERS ===
+class _Identity:
+    def decompress(self, data):
+        return data
+
+    def flush(self):
+        return b""
+
+
+class _Zlib:
+    """gzip / zlib / raw deflate"""
+
+    def __init__(self, gzip_only=False):
+        self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS if gzip_only else 32 + zlib.MAX_WBITS)
+        self._raw_fallback = not gzip_only
+        self._first = True
+
+    def decompress(self, data):
+        if self._first and data:
+            self._first = False
+            try:
+                return self._obj.decompress(data)
+            except zlib.error:
+                if not self._raw_fallback:
+                    raise
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)  # headerless deflate
+        return self._obj.decompress(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._obj = brotli.Decompressor()
+
+    def decompress(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return b""
+
+
+class _Zstd:
+    def __init__(self):
+        self._obj = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data):
+        return self._obj.decompress(data)
+
+    def flush(self):
+        return b""
+
+
+class _Chain:
+    """Several codings, e.g. 'gzip, br': undone in reverse order"""
+
+    def __init__(self, decoders):
+        self._decoders = decoders
+
+    def decompress(self, data):
+        for decoder in self._decoders:
+            data = decoder.decompress(data)
+        return data
+
+    def flush(self):
+        data = b""
+        for decoder in self._decoders:
+            data = decoder.decompress(data) + decoder.flush()
+        return data
+
+
+def codings_of(content_encoding):
+    return [c.strip().lower() for c in (content_encoding or "").split(",") if c.strip()]
+
+
+def _single_decoder(coding):
+    if coding in ("gzip", "x-gzip"):
+        return _Zlib(gzip_only=True)
+    if coding == "deflate":
+        return _Zlib()
+    if coding == "br":
+        if brotli is None:
+            raise ValueError("brotli response but brotli is not installed")
+        return _Brotli()
+    if coding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd response but zstandard is not installed")
+        return _Zstd()
+    if coding == "identity":
+        return _Identity()
+    raise ValueError(f"Unsupported Content-Encoding: {coding}")
+
+
+def make_decoder(content_encoding):
+    """Incremental decoder with decompress(chunk) / flush()"""
+    codings = codings_of(content_encoding)
+    if not codings:
+        return _Identity()
+    if len(codings) == 1:
+        return _single_decoder(codings[0])
+    return _Chain([_single_decoder(c) for c in reversed(codings)])
+
+
+def decode_body(raw, content_encoding):
+    """Decode a complete wire body"""
+    decoder = make_decoder(content_encoding)
+    return decoder.decompress(raw) + decoder.flush()
+
+
+def read_requests_body(response):
+    """(decoded body, wire size) of a requests response fetched with stream=True"""
+    raw = response.raw.read(decode_content=False)
+    return decode_body(raw, response.headers.get("Content-Encoding")), len(raw)
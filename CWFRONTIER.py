@@ -0,0 +1,250 @@
+"""
+CW compact URL frontier
+- Company URLs are split into interned prefix + slug + Hashids code
+  https://www.companywall.hu/v%C3%A1llalat/ | horizontplast-kft | MMGJWPVR
+- Columns live in arrays: prefix id, packed code (int), slug offsets + one
+  UTF-8 slug blob; URLs are rebuilt on demand
+- Membership/dedup by code through an open-addressing hash table in an array
+- save()/load() write the columns as raw arrays, so shards load near-instantly
+- load_frontier() caches URL_LIST{N}.csv as URL_LIST{N}.csv.frontier
+"""
+
+import os
+import csv
+import json
+import array
+from CWURL import normalize_url, split_company
+
+# === CONSTANTS ===
+CODE_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+CODE_MAX_LEN = 9  # 62**9 < 2**56, the top byte keeps the length
+FRONTIER_MAGIC = b"CWFR1\n"
+FRONTIER_SUFFIX = ".frontier"
+_CODE_VALUE = {c: i for i, c in enumerate(CODE_ALPHABET)}
+_EMPTY = 0
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+# === CODE PACKING ===
+def code_to_int(code):
+    """Pack a Hashids code into a non-zero int (length in the top byte); None if not packable"""
+    if not code or len(code) > CODE_MAX_LEN:
+        return None
+    value = 0
+    try:
+        for c in code:
+            value = value * 62 + _CODE_VALUE[c]
+    except KeyError:
+        return None
+    return (len(code) << 56) | value
+
+
+def int_to_code(packed):
+    length = packed >> 56
+    value = packed & ((1 << 56) - 1)
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 62)
+        chars.append(CODE_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def split_url(url):
+    """url -> (prefix, slug, packed code) or None for non-company URLs"""
+    parts = split_company(url)
+    if parts is None:
+        return None
+    if parts[3]:  # trailing slash/query: keep the canonical spelling instead
+        parts = split_company(normalize_url(url))
+    packed = code_to_int(parts[2])
+    if packed is None:
+        return None
+    return parts[0], parts[1], packed
+
+
+# === CODE SET ===
+class CodeSet:
+    """Set of packed codes in a linear-probing array('Q') table"""
+
+    def __init__(self, capacity=1024):
+        size = 1024
+        while size < capacity * 2:
+            size *= 2
+        self._table = array.array("Q", bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _slot(self, packed):
+        table, mask = self._table, self._mask
+        i = ((packed * _GOLDEN) & _MASK64) >> 32 & mask
+        while True:
+            value = table[i]
+            if value == packed or value == _EMPTY:
+                return i
+            i = (i + 1) & mask
+
+    def __contains__(self, packed):
+        return self._table[self._slot(packed)] == packed
+
+    def add(self, packed):
+        """Returns True if packed was new"""
+        i = self._slot(packed)
+        if self._table[i] == packed:
+            return False
+        self._table[i] = packed
+        self._count += 1
+        if self._count * 10 > len(self._table) * 6:
+            self._grow()
+        return True
+
+    def _grow(self):
+        old = self._table
+        self._table = array.array("Q", bytes(8 * len(old) * 2))
+        self._mask = len(self._table) - 1
+        for packed in old:
+            if packed:
+                self._table[self._slot(packed)] = packed
+
+
+# === FRONTIER ===
+class Frontier:
+    """Append-only, deduplicated (by company code) list of company URLs"""
+
+    def __init__(self):
+        self.prefixes = []  # interned prefix table
+        self._prefix_ids = {}
+        self.prefix_col = array.array("H")
+        self.code_col = array.array("Q")
+        self.slug_offsets = array.array("Q", [0])
+        self.slug_blob = bytearray()
+        self.others = []  # URLs that do not fit the company pattern, kept verbatim
+        self._others_set = set()
+        self._codes = None  # CodeSet, built on first membership test
+
+    def __len__(self):
+        return len(self.code_col) + len(self.others)
+
+    def _code_set(self):
+        if self._codes is None:
+            self._codes = CodeSet(len(self.code_col))
+            for packed in self.code_col:
+                self._codes.add(packed)
+        return self._codes
+
+    def add(self, url):
+        """Append url unless its company code is already present; returns True if added"""
+        parts = split_url(url)
+        if parts is None:
+            if url in self._others_set:
+                return False
+            self.others.append(url)
+            self._others_set.add(url)
+            return True
+        prefix, slug, packed = parts
+        if not self._code_set().add(packed):
+            return False
+        prefix_id = self._prefix_ids.get(prefix)
+        if prefix_id is None:
+            prefix_id = self._prefix_ids[prefix] = len(self.prefixes)
+            self.prefixes.append(prefix)
+        self.prefix_col.append(prefix_id)
+        self.code_col.append(packed)
+        self.slug_blob += slug.encode("utf-8")
+        self.slug_offsets.append(len(self.slug_blob))
+        return True
+
+    def extend(self, urls):
+        added = 0
+        for url in urls:
+            added += self.add(url)
+        return added
+
+    def __contains__(self, url):
+        parts = split_url(url)
+        if parts is None:
+            return url in self._others_set
+        return parts[2] in self._code_set()
+
+    def has_code(self, code):
+        packed = code_to_int(code)
+        return packed is not None and packed in self._code_set()
+
+    def url(self, i):
+        if i >= len(self.code_col):
+            return self.others[i - len(self.code_col)]
+        slug = self.slug_blob[self.slug_offsets[i]:self.slug_offsets[i + 1]].decode("utf-8")
+        return f"{self.prefixes[self.prefix_col[i]]}{slug}/{int_to_code(self.code_col[i])}"
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.url(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.url(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.url(i)
+
+    def nbytes(self):
+        """Approximate memory held by the columns"""
+        return (self.prefix_col.itemsize * len(self.prefix_col) + self.code_col.itemsize * len(self.code_col)
+                + self.slug_offsets.itemsize * len(self.slug_offsets) + len(self.slug_blob)
+                + (self._codes._table.itemsize * len(self._codes._table) if self._codes else 0))
+
+    # === PERSISTENCE ===
+    def save(self, path):
+        header = json.dumps({"prefixes": self.prefixes, "others": self.others, "rows": len(self.code_col),
+                             "blob": len(self.slug_blob)}).encode("utf-8")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(FRONTIER_MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            self.prefix_col.tofile(f)
+            self.code_col.tofile(f)
+            self.slug_offsets.tofile(f)
+            f.write(self.slug_blob)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        frontier = cls()
+        with open(path, "rb") as f:
+            if f.read(len(FRONTIER_MAGIC)) != FRONTIER_MAGIC:
+                raise ValueError(f"Not a frontier file: {path}")
+            header = json.loads(f.read(int.from_bytes(f.read(8), "little")))
+            rows = header["rows"]
+            frontier.prefixes = header["prefixes"]
+            frontier._prefix_ids = {p: i for i, p in enumerate(frontier.prefixes)}
+            frontier.others = header["others"]
+            frontier._others_set = set(frontier.others)
+            frontier.prefix_col.fromfile(f, rows)
+            frontier.code_col.fromfile(f, rows)
+            frontier.slug_offsets = array.array("Q")
+            frontier.slug_offsets.fromfile(f, rows + 1)
+            frontier.slug_blob = bytearray(f.read(header["blob"]))
+        return frontier
+
+    @classmethod
+    def from_csv(cls, path):
+        frontier = cls()
+        with open(path, "r", encoding="utf-8") as f:
+            frontier.extend(row[0].strip() for row in csv.reader(f) if row and row[0].strip())
+        return frontier
+
+
+def load_frontier(csv_path):
+    """Frontier for a URL CSV, cached next to it and rebuilt when the CSV is newer"""
+    cache = csv_path + FRONTIER_SUFFIX
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(csv_path):
+        return Frontier.load(cache)
+    frontier = Frontier.from_csv(csv_path)
+    frontier.save(cache)
+    return frontier
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+CW HTTP/2 fetch engine
+- Optional alternative to the aiohttp HTTP/1.1 engine in CWSITEMAPROXYASYNC
+- Multiplexes up to H2_STREAMS in-flight requests over H2_CONNECTIONS
+  connections through the proxy instead of one connection per request
+- Streams each page and resets the stream as soon as the head fails validation
+- Same validation, circuit breaker, save path and (saved, existed, errors)
+  summaries as process_url_batch()
+- Needs httpx with HTTP/2 support: pip install "httpx[http2]"
+  The benchmark stand-in server also needs hypercorn.
+
+Usage:
+  python CWHTTP2.py <N>              # fetch URL_LIST{N}.csv over HTTP/2
+  python CWHTTP2.py bench [URLS]     # HTTP/2 vs HTTP/1.1 against a local stand-in server
+"""
+
+import os
+import csv
+import sys
+import time
+import asyncio
+from typing import List
+from CWPROFILE import cli_args, profile_stage, timer
+from CWVALIDATE import STREAM_CHUNK, HeadCheck, validate_page
+from CWSEEN import FETCHED, SeenSet
+from CWBANDWIDTH import METER
+from CWENCODING import ACCEPT_ENCODING, make_decoder
+from CWREPLAY import replay_client_stream
+from CWSITEMAPROXYASYNC import BLOCK_STATUSES, BREAKER, TIMEOUT, CircuitBreaker, proxy_url, store_result
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# === CONSTANTS ===
+H2_CONNECTIONS = 2  # connections per proxy
+H2_STREAMS = 100  # concurrent requests multiplexed over them
+USE_PROXY = True
+PROCESSING_BATCH_SIZE = 500
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept-Encoding': ACCEPT_ENCODING
+}
+
+
+def make_client(proxy=None, http1=True):
+    """HTTP/2 client; http1=False forces prior-knowledge h2c for plain http (benchmark)"""
+    if httpx is None:
+        raise RuntimeError('httpx is not installed: pip install "httpx[http2]"')
+    limits = httpx.Limits(max_connections=H2_CONNECTIONS, max_keepalive_connections=H2_CONNECTIONS)
+    return httpx.AsyncClient(http2=True, http1=http1, limits=limits, proxy=proxy, headers=HEADERS,
+                             timeout=httpx.Timeout(TIMEOUT, pool=None))
+
+
+# === FETCH ===
+_clients = {}  # proxy -> client, for requests the meter reroutes away from the caller's proxy
+
+
+def client_for(client, proxy, chosen):
+    """client itself when the meter kept its proxy, else a client for the proxy it chose"""
+    if chosen == proxy:
+        return client
+    if chosen not in _clients:
+        _clients[chosen] = make_client(chosen)
+    return _clients[chosen]
+
+
+async def close_clients():
+    while _clients:
+        await _clients.popitem()[1].aclose()
+
+
+async def fetch_single_h2(client, url: str, semaphore: asyncio.Semaphore, breaker: CircuitBreaker = None,
+                          proxy: str = None):
+    """Same contract as fetch_single(): (url, html_content, error); proxy is the client's. When the
+    meter reroutes (CWBANDWIDTH budgets) the request goes through a client for the chosen proxy"""
+    breaker = breaker or BREAKER
+    async with semaphore:
+        probe = await breaker.wait()
+        chosen = await METER.admit_async(proxy)
+        blocked = None
+        wire_size = 0
+        try:
+            with timer("fetch"):
+                async with replay_client_stream(client_for(client, proxy, chosen), "GET", url) as response:
+                    if response.status_code != 200:
+                        blocked = response.status_code in BLOCK_STATUSES
+                        return url, None, f"HTTP {response.status_code}"
+                    encoding = response.headers.get("Content-Encoding")
+                    decoder = make_decoder(encoding)
+                    head = HeadCheck(url)
+                    parts = []
+                    async for chunk in response.aiter_raw(STREAM_CHUNK):
+                        wire_size += len(chunk)
+                        parts.append(decoder.decompress(chunk))
+                        if head.feed(parts[-1]):
+                            break  # leaving the stream resets it, the rest is never sent
+                    else:
+                        parts.append(decoder.flush())
+            if head.reason:
+                blocked = True
+                return url, None, f"Invalid page: {head.reason}"
+
+            body = b"".join(parts)
+            with timer("validate"):
+                reason, _ = validate_page(url, body, wire_size, encoding)
+            blocked = reason is not None
+            if reason:
+                return url, None, f"Invalid page: {reason}"
+            return url, body.decode(response.encoding or "utf-8", errors="replace"), None
+        except httpx.TimeoutException:
+            return url, None, "Timeout"
+        except Exception as e:
+            return url, None, str(e)
+        finally:
+            breaker.record(blocked, probe)
+            await METER.record_async(chosen, wire_size)
+
+
+async def process_url_batch_h2(client, batch: List[str], semaphore: asyncio.Semaphore, batch_num: int,
+                               fetched: SeenSet = None, proxy: str = None):
+    """HTTP/2 counterpart of process_url_batch(); returns (saved, existed, errors)"""
+    todo = [url for url in batch if fetched is None or url not in fetched]
+    exists_count = len(batch) - len(todo)
+    print(f"🔄 Processing batch {batch_num} with {len(todo)} URLs ({exists_count} already fetched, HTTP/2)...")
+    results = await asyncio.gather(*(fetch_single_h2(client, url, semaphore, proxy=proxy) for url in todo),
+                                   return_exceptions=True)
+
+    success_count = error_count = 0
+    for result in results:
+        if isinstance(result, Exception):
+            error_count += 1
+            continue
+        save_result = await store_result(result, fetched)
+        if save_result == "saved":
+            success_count += 1
+        elif save_result == "exists":
+            exists_count += 1
+        else:
+            error_count += 1
+
+    print(f"✅ Batch {batch_num}: {success_count} saved, {exists_count} existed, {error_count} errors")
+    return success_count, exists_count, error_count
+
+
+async def fetch_urls_h2(urls: List[str]):
+    """HTTP/2 counterpart of fetch_urls_async(); returns (saved, existed, errors)"""
+    semaphore = asyncio.Semaphore(H2_STREAMS)
+    totals = [0, 0, 0]
+    proxy = proxy_url if USE_PROXY else None
+    async with make_client(proxy) as client, SeenSet(FETCHED) as fetched:
+        try:
+            for batch_num, i in enumerate(range(0, len(urls), PROCESSING_BATCH_SIZE), 1):
+                batch = urls[i:i + PROCESSING_BATCH_SIZE]
+                counts = await process_url_batch_h2(client, batch, semaphore, batch_num, fetched, proxy)
+                totals = [t + c for t, c in zip(totals, counts)]
+        finally:
+            await close_clients()
+    return tuple(totals)
+
+
+# === BENCHMARK ===
+BENCH_PAGE_KB = 150
+
+
+async def _standin_app(scope, receive, send):
+    """ASGI stand-in for a company page: canonical echoes the requested URL"""
+    if scope["type"] != "http":
+        return
+    host, port = scope["server"]
+    url = f"http://{host}:{port}{scope['raw_path'].decode()}"
+    filler = "<div class=\"row\">Cégadatok adószám cégjegyzékszám</div>\n" * (BENCH_PAGE_KB * 1024 // 52)
+    body = (f'<html><head><title>Company</title><link rel="canonical" href="{url}"></head>'
+            f'<body>{filler}</body></html>').encode("utf-8")
+    await asyncio.sleep(0.02)  # server think time
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"text/html; charset=utf-8")]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _bench_h1(urls, concurrency):
+    import aiohttp
+    from CWSITEMAPROXYASYNC import fetch_single, new_session
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    breaker = CircuitBreaker("bench-h1")
+    async with new_session(connector) as session:
+        results = await asyncio.gather(*(fetch_single(session, u, semaphore, breaker) for u in urls))
+    return sum(1 for _, html, _ in results if html)
+
+
+async def _bench_h2(urls, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    breaker = CircuitBreaker("bench-h2")
+    async with make_client(http1=False) as client:
+        results = await asyncio.gather(*(fetch_single_h2(client, u, semaphore, breaker) for u in urls))
+    return sum(1 for _, html, _ in results if html)
+
+
+async def run_benchmark(total=2000, port=8443):
+    """Both engines validate inline: the h1 engine's CWOFFLOAD pool is switched off for the run,
+    the h2 engine has none, so the numbers compare the transports only"""
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    import CWSITEMAPROXYASYNC
+    from CWSITEMAPROXYASYNC import CONCURRENT_WORKERS
+
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.accesslog = None
+    stop = asyncio.Event()
+    server = asyncio.create_task(serve(_standin_app, config, shutdown_trigger=stop.wait))
+    await asyncio.sleep(1)
+
+    urls = [f"http://127.0.0.1:{port}/v%C3%A1llalat/bench-{i}-kft/BENCH{i:03d}" for i in range(total)]
+    print(f"🏁 Benchmark: {total} pages of ~{BENCH_PAGE_KB} KB from local stand-in server "
+          f"(inline validation in both engines)")
+    offload = CWSITEMAPROXYASYNC.OFFLOAD_CPU
+    CWSITEMAPROXYASYNC.OFFLOAD_CPU = False
+    try:
+        for name, engine, concurrency, connections in (
+                ("HTTP/1.1 aiohttp", _bench_h1, CONCURRENT_WORKERS, CONCURRENT_WORKERS),
+                ("HTTP/2 httpx", _bench_h2, H2_STREAMS, H2_CONNECTIONS)):
+            started = time.perf_counter()
+            ok = await engine(urls, concurrency)
+            elapsed = time.perf_counter() - started
+            print(f"  {name:<18} {concurrency:>4} in flight / {connections:>3} conns: "
+                  f"{ok}/{total} ok in {elapsed:.2f}s = {total / elapsed:,.0f} req/s")
+    finally:
+        CWSITEMAPROXYASYNC.OFFLOAD_CPU = offload
+
+    stop.set()
+    await server
+
+
+def main():
+    args = cli_args()
+    if httpx is None:
+        print('❌ httpx is not installed: pip install "httpx[http2]"')
+        sys.exit(1)
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+
+    if args and args[0] == "bench":
+        asyncio.run(run_benchmark(int(args[1]) if len(args) > 1 else 2000))
+        return
+
+    sublist_filename = f"URL_LIST{args[0] if args else 1}.csv"
+    if not os.path.exists(sublist_filename):
+        print(f"❌ {sublist_filename} not found!")
+        sys.exit(1)
+    with open(sublist_filename, 'r', encoding='utf-8') as f:
+        urls = [row[0] for row in csv.reader(f) if row]
+
+    print(f"📥 HTTP/2 fetch for {sublist_filename} ({len(urls)} URLs, {H2_STREAMS} streams "
+          f"over {H2_CONNECTIONS} connections)...")
+    success, exists, errors = profile_stage("h2_fetch", asyncio.run, fetch_urls_h2(urls))
+    print(f"🎉 {sublist_filename} completed: {success} saved, {exists} existed, {errors} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+CW company index
+- Extracts one record per saved company page (name, tax number, registration
+  number, seat address, Hashids code, URL) and loads it into COMPANIES.db,
+  an embedded SQLite database:
+    companies      one row per company code, B-tree indexes on tax_number,
+                   reg_number and code
+    companies_fts  FTS5 index over name + address (diacritics folded),
+                   kept in step by triggers
+    pages          every indexed page file: path, code, mtime
+- Loads are incremental: a page is only parsed again when its own mtime
+  changed (a company saved in several folders has a pages row per copy),
+  records are upserted by code, pages are parsed in a process pool and
+  written in one transaction per LOAD_BATCH records
+- After a load, rows of page files that no longer exist are deleted; a
+  company keeps its row while another copy of its page is left
+- Lookups by key and name searches are index hits, milliseconds at millions
+  of companies
+
+Usage:
+  python CWINDEX.py load [FOLDER ...]    # default: Companies*
+  python CWINDEX.py search "horizont plast"
+  python CWINDEX.py tax 12345678[-1-12]
+  python CWINDEX.py reg 01-09-123456
+  python CWINDEX.py code MMGJWPVR
+  python CWINDEX.py stats
+"""
+
+import os
+import re
+import sys
+import sqlite3
+from multiprocessing import Pool
+from CWPROFILE import cli_args, profile_stage, timer
+from CWLAYOUT import PAGE_SUFFIX, iter_pages
+from CWURL import company_key, normalize_url
+from CWVALIDATE import CAPTCHA_TITLE
+from CWVERIFY import default_folders
+
+# === CONSTANTS ===
+INDEX_DB = "COMPANIES.db"
+LOAD_BATCH = 5000  # records per transaction
+PARSE_BATCH = 500  # files per worker task
+PROCESSES = os.cpu_count() or 4
+SEARCH_LIMIT = 20
+RECORD_COLUMNS = ("code", "slug", "name", "tax_number", "reg_number", "address", "url", "path", "mtime")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies (
+    id INTEGER PRIMARY KEY,
+    code TEXT NOT NULL UNIQUE,
+    slug TEXT,
+    name TEXT,
+    tax_number TEXT,
+    reg_number TEXT,
+    address TEXT,
+    url TEXT,
+    path TEXT,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS companies_tax ON companies(tax_number);
+CREATE INDEX IF NOT EXISTS companies_reg ON companies(reg_number);
+CREATE INDEX IF NOT EXISTS companies_path ON companies(path);
+CREATE TABLE IF NOT EXISTS pages (
+    path TEXT PRIMARY KEY,
+    code TEXT,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS pages_code ON pages(code);
+CREATE VIRTUAL TABLE IF NOT EXISTS companies_fts USING fts5(
+    name, address, content='companies', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS companies_ai AFTER INSERT ON companies BEGIN
+    INSERT INTO companies_fts(rowid, name, address) VALUES (new.id, new.name, new.address);
+END;
+CREATE TRIGGER IF NOT EXISTS companies_ad AFTER DELETE ON companies BEGIN
+    INSERT INTO companies_fts(companies_fts, rowid, name, address) VALUES ('delete', old.id, old.name, old.address);
+END;
+CREATE TRIGGER IF NOT EXISTS companies_au AFTER UPDATE OF name, address ON companies BEGIN
+    INSERT INTO companies_fts(companies_fts, rowid, name, address) VALUES ('delete', old.id, old.name, old.address);
+    INSERT INTO companies_fts(rowid, name, address) VALUES (new.id, new.name, new.address);
+END;
+"""
+
+_UPSERT = (f"INSERT INTO companies ({', '.join(RECORD_COLUMNS)}) VALUES ({', '.join('?' * len(RECORD_COLUMNS))}) "
+           f"ON CONFLICT(code) DO UPDATE SET "
+           + ", ".join(f"{c} = excluded.{c}" for c in RECORD_COLUMNS[1:]))
+_UPSERT_PAGE = ("INSERT INTO pages (path, code, mtime) VALUES (?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET code = excluded.code, mtime = excluded.mtime")
+
+# Simple regex patterns (labels as the company page shows them)
+_RE_H1 = re.compile(r"<h1[^>]*>(.*?)</h1>", re.IGNORECASE | re.DOTALL)
+_RE_TITLE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_RE_CANON = re.compile(r'<link\s+[^>]*rel=["\']canonical["\'][^>]*href=["\']([^"\']+)["\']', re.IGNORECASE)
+_RE_TAG = re.compile(r"<[^>]+>")
+_RE_SPACE = re.compile(r"\s+")
+_RE_TAX = re.compile(r"\b(\d{8})-?(\d)-?(\d{2})\b")
+_RE_REG = re.compile(r"\b(\d{2})[- ](\d{2})[- ](\d{6})\b")
+_RE_TAX_LABEL = re.compile(r"Adósz[áa]m", re.IGNORECASE)
+_RE_REG_LABEL = re.compile(r"Cégjegyzékszám|Nyilvántartási szám", re.IGNORECASE)
+_RE_ADDRESS = re.compile(r"(?:Székhely|Cím)\s*:?\s*(?:</[^>]+>\s*|<[^>]+>\s*)*([^<]{5,200})<", re.IGNORECASE)
+LABEL_WINDOW = 300  # characters after a label searched for its value
+
+
+# === EXTRACTION ===
+def _text(fragment):
+    return _RE_SPACE.sub(" ", _RE_TAG.sub(" ", fragment)).strip()
+
+
+def _after_label(html, label, pattern):
+    """Value matching pattern just after label; anywhere in the page as a fallback"""
+    m = label.search(html)
+    if m:
+        value = pattern.search(html, m.end(), m.end() + LABEL_WINDOW)
+        if value:
+            return "-".join(value.groups())
+    value = pattern.search(html)
+    return "-".join(value.groups()) if value else ""
+
+
+def extract_record(html_bytes, path=""):
+    """Company record of a saved page as a dict of RECORD_COLUMNS, None for unusable pages"""
+    html = html_bytes.decode("utf-8", errors="ignore")
+    m = _RE_TITLE.search(html)
+    title = _text(m.group(1)) if m else ""
+    if title == CAPTCHA_TITLE:
+        return None
+
+    m = _RE_CANON.search(html)
+    url = m.group(1).strip() if m else ""
+    key = company_key(url) if url else None
+    if key is None:  # fall back to the file name: <slug>_<code>.html
+        stem = os.path.basename(path)[:-len(PAGE_SUFFIX)]
+        if "_" not in stem:
+            return None
+        slug, code = stem.rsplit("_", 1)
+        key = slug.lower(), code
+    m = _RE_H1.search(html)
+    name = _text(m.group(1)) if m else title.split(" - ")[0].split(" | ")[0].strip()
+    m = _RE_ADDRESS.search(html)
+    return {
+        "code": key[1],
+        "slug": key[0],
+        "name": name,
+        "tax_number": _after_label(html, _RE_TAX_LABEL, _RE_TAX),
+        "reg_number": _after_label(html, _RE_REG_LABEL, _RE_REG),
+        "address": _text(m.group(1)) if m else "",
+        "url": normalize_url(url) if url else "",
+        "path": path,
+        "mtime": 0.0,
+    }
+
+
+def _parse_batch(task):
+    """[(path, indexed mtime)] -> (records of new/changed pages, their pages rows, unchanged count);
+    unusable pages get a pages row without a code so they are not parsed again until they change"""
+    records, pages, unchanged = [], [], 0
+    for path, known in task:
+        try:
+            mtime = os.stat(path).st_mtime
+            if known is not None and known == mtime:
+                unchanged += 1
+                continue
+            with open(path, "rb") as f:
+                record = extract_record(f.read(), path)
+        except OSError:
+            continue
+        if record is not None:
+            record["mtime"] = mtime
+            records.append(tuple(record[c] for c in RECORD_COLUMNS))
+        pages.append((path, record["code"] if record else None, mtime))
+    return records, pages, unchanged
+
+
+# === DATABASE ===
+def connect(path=INDEX_DB):
+    """Open (and create) the index database"""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
+    conn.executescript(SCHEMA)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _tasks(db, folders):
+    """Batches of (path, indexed mtime) so workers can skip unchanged pages. Runs in the
+    pool's feeder thread, so it reads through a connection of its own"""
+    conn = sqlite3.connect(db)
+    try:
+        batch = []
+        for folder in folders:
+            for path in iter_pages(folder):
+                batch.append(path)
+                if len(batch) >= PARSE_BATCH:
+                    yield _with_mtimes(conn, batch)
+                    batch = []
+        if batch:
+            yield _with_mtimes(conn, batch)
+    finally:
+        conn.close()
+
+
+def _with_mtimes(conn, paths):
+    known = dict(conn.execute(f"SELECT path, mtime FROM pages WHERE path IN ({', '.join('?' * len(paths))})",
+                              paths).fetchall())
+    return [(path, known.get(path)) for path in paths]
+
+
+def prune(conn):
+    """Delete rows of page files that are gone; a company whose indexed page is gone
+    moves to another saved copy, or is deleted when none is left. Returns deleted companies"""
+    paths = conn.execute("SELECT path FROM pages UNION SELECT path FROM companies").fetchall()
+    gone = [(path,) for path, in paths if path and not os.path.exists(path)]
+    if not gone:
+        return 0
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS gone (path TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM gone")
+    conn.executemany("INSERT OR IGNORE INTO gone (path) VALUES (?)", gone)
+    conn.execute("DELETE FROM pages WHERE path IN (SELECT path FROM gone)")
+    conn.execute("UPDATE companies SET (path, mtime) = "
+                 "(SELECT p.path, p.mtime FROM pages p WHERE p.code = companies.code ORDER BY p.mtime DESC LIMIT 1) "
+                 "WHERE path IN (SELECT path FROM gone) "
+                 "AND EXISTS (SELECT 1 FROM pages p WHERE p.code = companies.code)")
+    deleted = conn.execute("DELETE FROM companies WHERE path IN (SELECT path FROM gone)").rowcount
+    conn.execute("DELETE FROM gone")
+    conn.commit()
+    print(f"🧹 Index: {len(gone)} missing page files dropped, {deleted} companies deleted")
+    return deleted
+
+
+def load(folders=None, db=INDEX_DB, processes=PROCESSES):
+    """Index new and changed pages of folders; returns (upserted, unchanged)"""
+    folders = folders or default_folders()
+    print(f"🗂️  Indexing {', '.join(folders) or 'nothing'} into {db} with {processes} processes...")
+    conn = connect(db)
+    upserted = unchanged = pending = 0
+    try:
+        with timer("index_load"), Pool(processes) as pool:
+            for done, (records, pages, skipped) in enumerate(pool.imap_unordered(_parse_batch, _tasks(db, folders)), 1):
+                unchanged += skipped
+                conn.executemany(_UPSERT_PAGE, pages)
+                if records:
+                    conn.executemany(_UPSERT, records)
+                    upserted += len(records)
+                    pending += len(records)
+                if pending >= LOAD_BATCH:
+                    conn.commit()
+                    pending = 0
+                if done % 100 == 0:
+                    print(f"  ... {upserted} indexed, {unchanged} unchanged")
+        conn.commit()
+        prune(conn)
+        conn.execute("INSERT INTO companies_fts(companies_fts) VALUES ('optimize')")
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"✅ Index: {upserted} companies indexed/updated, {unchanged} unchanged -> {db}")
+    return upserted, unchanged
+
+
+# === LOOKUPS ===
+def normalize_tax(value):
+    """'12345678112' / '12345678-1-12' -> '12345678-1-12'; 8 digits stay a prefix"""
+    digits = re.sub(r"\D", "", value)
+    return f"{digits[:8]}-{digits[8]}-{digits[9:11]}" if len(digits) >= 11 else digits[:8]
+
+
+def normalize_reg(value):
+    digits = re.sub(r"\D", "", value)
+    return f"{digits[:2]}-{digits[2:4]}-{digits[4:10]}" if len(digits) == 10 else value.strip()
+
+
+def by_tax(conn, value):
+    """Companies with this tax number; 8 digits match every VAT/county suffix (index range scan)"""
+    tax = normalize_tax(value)
+    if len(tax) == 8:
+        rows = conn.execute("SELECT * FROM companies WHERE tax_number >= ? AND tax_number < ?",
+                            (tax + "-", tax + "."))
+    else:
+        rows = conn.execute("SELECT * FROM companies WHERE tax_number = ?", (tax,))
+    return [dict(row) for row in rows]
+
+
+def by_reg(conn, value):
+    return [dict(row) for row in conn.execute("SELECT * FROM companies WHERE reg_number = ?",
+                                              (normalize_reg(value),))]
+
+
+def by_code(conn, code):
+    row = conn.execute("SELECT * FROM companies WHERE code = ?", (code.strip(),)).fetchone()
+    return dict(row) if row else None
+
+
+def fts_query(text):
+    """Every word as a quoted prefix term: 'horizont pla' -> '"horizont"* "pla"*'"""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def search(conn, text, limit=SEARCH_LIMIT):
+    """Companies whose name or address matches all words of text, best bm25 rank first"""
+    query = fts_query(text)
+    if not query:
+        return []
+    rows = conn.execute("SELECT c.* FROM companies_fts JOIN companies c ON c.id = companies_fts.rowid "
+                        "WHERE companies_fts MATCH ? ORDER BY bm25(companies_fts, 10.0, 1.0) LIMIT ?",
+                        (query, limit))
+    return [dict(row) for row in rows]
+
+
+def stats(conn):
+    total = conn.execute("SELECT COUNT(*) FROM companies").fetchone()[0]
+    with_tax = conn.execute("SELECT COUNT(*) FROM companies WHERE tax_number != ''").fetchone()[0]
+    with_reg = conn.execute("SELECT COUNT(*) FROM companies WHERE reg_number != ''").fetchone()[0]
+    return {"companies": total, "with_tax_number": with_tax, "with_reg_number": with_reg}
+
+
+def _print_rows(rows):
+    if not rows:
+        print("❌ No match")
+    for row in rows:
+        print(f"  {row['code']:<10} {row['tax_number']:<14} {row['reg_number']:<13} {row['name']}"
+              f"{' — ' + row['address'] if row['address'] else ''}")
+
+
+def main():
+    args = cli_args()
+    if not args or args[0] not in ("load", "search", "tax", "reg", "code", "stats"):
+        print(__doc__)
+        sys.exit(1)
+    command, rest = args[0], args[1:]
+    if command == "load":
+        profile_stage("index_load", load, rest or None)
+        return
+    if not os.path.exists(INDEX_DB):
+        print(f"❌ {INDEX_DB} not found! Run 'python CWINDEX.py load' first.")
+        sys.exit(1)
+    conn = connect()
+    try:
+        if command == "stats":
+            for name, value in stats(conn).items():
+                print(f"  {name:<16} {value}")
+        elif command == "code":
+            row = by_code(conn, " ".join(rest))
+            _print_rows([row] if row else [])
+        else:
+            lookup = {"search": search, "tax": by_tax, "reg": by_reg}[command]
+            _print_rows(lookup(conn, " ".join(rest)))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
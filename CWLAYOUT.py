@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+CW page layout
+- Every saved company page lives at <root>/<ab>/<cd>/<company-name>_<code>.html
+  where ab/cd are the first hex digits of a hash of the company code
+- Fixed fan-out of 256 x 256 folders: even spread whatever the company
+  names look like, ~150 files per folder at 10M pages, and a page's path
+  depends only on its URL (never on list order)
+- migrate() moves pages from the older layouts into it, in parallel processes:
+    <root>/<company-name>_<code>.html           (CWALL, CW shards)
+    <root>/<HO>/<company-name>.html             (CWSITEMAPROXY*, async engine)
+    <root>/<N>.html                             (CWSITEMAP level 3, with --numbered)
+
+Usage:
+  python CWLAYOUT.py migrate <FOLDER> [DEST] [--dry-run] [--numbered]
+  python CWLAYOUT.py stats <FOLDER>
+"""
+
+import os
+import csv
+import sys
+import hashlib
+from multiprocessing import Pool
+from CWPROFILE import cli_args, timer
+from CWURL import page_name, url_code, url_slug
+
+# === CONSTANTS ===
+FANOUT_LEVELS = 2
+FANOUT_WIDTH = 2  # hex digits per level -> 256 folders per level
+PAGE_SUFFIX = ".html"
+URL_SOURCES = ("FILTERED_URL_LIST.csv", "URL_LIST.csv")  # used to resolve name-only pages
+NUMBERED_SOURCE = "FILTERED_URL_LIST.csv"  # list order CWSITEMAP level 3 numbered pages by
+MIGRATE_BATCH = 2000  # files per task
+PROCESSES = os.cpu_count() or 4
+DRY_RUN = "--dry-run" in sys.argv
+NUMBERED = "--numbered" in sys.argv
+
+
+# === PATHS ===
+def bucket(code):
+    """ab/cd fan-out folders for a company code"""
+    digest = hashlib.blake2b(code.encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(*(digest[i * FANOUT_WIDTH:(i + 1) * FANOUT_WIDTH] for i in range(FANOUT_LEVELS)))
+
+
+def page_path(root, url):
+    """Where the page of url is saved under root"""
+    return os.path.join(root, bucket(url_code(url)), page_name(url))
+
+
+def name_path(root, filename):
+    """Path for an existing <company-name>_<code>.html file name"""
+    code = filename[:-len(PAGE_SUFFIX)].rsplit("_", 1)[-1]
+    return os.path.join(root, bucket(code), filename)
+
+
+def iter_pages(root, skip=None):
+    """Every .html file below root (os.scandir, no per-file stat); skip(folder) prunes folders"""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if skip is None or not skip(entry.path):
+                        stack.append(entry.path)
+                elif entry.name.endswith(PAGE_SUFFIX):
+                    yield entry.path
+
+
+# === MIGRATION ===
+_names = {}  # company-name -> page file name, or None when ambiguous
+_made = set()
+
+
+def _load_names(sources):
+    names = {}
+    for source in sources:
+        if not os.path.exists(source):
+            continue
+        with open(source, "r", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if not row or not row[0].strip():
+                    continue
+                url = row[0].strip()
+                name = url_slug(url)
+                if name is None:
+                    continue
+                filename = page_name(url)
+                if name in names and names[name] != filename:
+                    names[name] = None
+                else:
+                    names[name] = filename
+    return names
+
+
+def _load_numbered(source):
+    with open(source, "r", encoding="utf-8") as f:
+        urls = [row[0].strip() for row in csv.reader(f) if row and row[0].strip()]
+    return {f"{idx}{PAGE_SUFFIX}": page_name(url) for idx, url in enumerate(urls, 1)}
+
+
+def _init_worker(names):
+    global _names
+    _names = names
+
+
+def target_name(filename, names=None):
+    """New-layout file name for an old page file name, None if it cannot be resolved"""
+    names = _names if names is None else names
+    stem = filename[:-len(PAGE_SUFFIX)]
+    if filename in names:  # numbered pages
+        return names[filename]
+    if stem in names:  # company-name only
+        return names[stem]
+    if "_" in stem:
+        return filename
+    return None
+
+
+def _is_bucket_name(name):
+    return len(name) == FANOUT_WIDTH and all(c in "0123456789abcdef" for c in name)
+
+
+def _is_bucket(root, folder):
+    """folder is a <root>/<ab>/<cd> folder of the hashed layout"""
+    parts = os.path.relpath(folder, root).split(os.sep)
+    return len(parts) == FANOUT_LEVELS and all(map(_is_bucket_name, parts))
+
+
+def _bucket_folders(root):
+    """<root>/<ab>/<cd> folders that exist"""
+    folders = [root]
+    for _ in range(FANOUT_LEVELS):
+        folders = [entry.path for folder in folders for entry in os.scandir(folder)
+                   if entry.is_dir(follow_symlinks=False) and _is_bucket_name(entry.name)]
+    return folders
+
+
+def _migrate_batch(task):
+    """Move a batch; returns (moved, present, unresolved, folders pages were moved out of)"""
+    paths, dst_root, dry_run = task
+    moved = present = unresolved = 0
+    sources = set()
+    for path in paths:
+        filename = target_name(os.path.basename(path))
+        if filename is None:
+            unresolved += 1
+            continue
+        target = name_path(dst_root, filename)
+        if os.path.exists(target):
+            present += 1  # already migrated; the old copy stays for review
+            continue
+        if not dry_run:
+            folder = os.path.dirname(target)
+            if folder not in _made:
+                os.makedirs(folder, exist_ok=True)
+                _made.add(folder)
+            os.replace(path, target)
+            sources.add(os.path.dirname(path))
+        moved += 1
+    return moved, present, unresolved, sources
+
+
+def _batches(root, dst_root, dry_run, in_place):
+    """Batches of pages still to move; pages already at their layout path are only counted.
+    In place, the bucket folders are counted before anything moves and left out of the scan,
+    so pages moved into them meanwhile are neither counted nor seen again"""
+    batch, skip = [], None
+    if os.path.abspath(dst_root) == os.path.abspath(root):
+        for folder in _bucket_folders(root):
+            for path in iter_pages(folder):
+                if path == name_path(dst_root, os.path.basename(path)):
+                    in_place[0] += 1
+                else:
+                    batch.append(path)  # in the wrong bucket
+
+        def skip(folder):
+            return _is_bucket(root, folder)
+    for path in iter_pages(root, skip):
+        if path == name_path(dst_root, os.path.basename(path)):
+            in_place[0] += 1
+            continue
+        batch.append(path)
+        if len(batch) >= MIGRATE_BATCH:
+            yield batch, dst_root, dry_run
+            batch = []
+    if batch:
+        yield batch, dst_root, dry_run
+
+
+def _remove_emptied_folders(root, folders):
+    """Remove folders the migration moved every page out of, and parents left empty by that"""
+    for folder in sorted(folders, key=len, reverse=True):
+        while folder != root and os.path.isdir(folder) and not os.listdir(folder):
+            os.rmdir(folder)
+            folder = os.path.dirname(folder)
+
+
+def migrate(root, dst_root=None, processes=PROCESSES, dry_run=DRY_RUN, numbered=NUMBERED):
+    """Move every page below root into the hashed layout under dst_root (default: root)"""
+    if not os.path.isdir(root):
+        print(f"❌ {root} not found!")
+        return 0, 0, 0
+    dst_root = dst_root or root
+    names = _load_names(URL_SOURCES)
+    if numbered and os.path.exists(NUMBERED_SOURCE):
+        names.update(_load_numbered(NUMBERED_SOURCE))
+    print(f"📂 Migrating {root} -> {dst_root} with {processes} processes"
+          f"{' (dry run)' if dry_run else ''}; {len(names)} names known")
+
+    moved = present = unresolved = 0
+    in_place = [0]
+    sources = set()
+    with timer("migrate"), Pool(processes, initializer=_init_worker, initargs=(names,)) as pool:
+        for done, (batch_moved, batch_present, batch_unresolved, batch_sources) in enumerate(pool.imap_unordered(
+                _migrate_batch, _batches(root, dst_root, dry_run, in_place)), 1):
+            moved += batch_moved
+            present += batch_present
+            unresolved += batch_unresolved
+            sources.update(batch_sources)
+            if done % 50 == 0:
+                print(f"  ... {moved} moved, {present} already in place, {unresolved} unresolved")
+
+    present += in_place[0]
+    if not dry_run:
+        _remove_emptied_folders(os.path.normpath(root), {os.path.normpath(f) for f in sources})
+    print(f"✅ Layout migration: {moved} moved, {present} already in place, {unresolved} unresolved")
+    return moved, present, unresolved
+
+
+def stats(root):
+    """Pages per leaf folder: spread of the layout"""
+    counts = {}
+    for path in iter_pages(root):
+        folder = os.path.dirname(path)
+        counts[folder] = counts.get(folder, 0) + 1
+    if not counts:
+        print(f"❌ No pages below {root}")
+        return
+    sizes = sorted(counts.values())
+    print(f"📊 {sum(sizes)} pages in {len(sizes)} folders: min {sizes[0]}, "
+          f"median {sizes[len(sizes) // 2]}, max {sizes[-1]}")
+
+
+def main():
+    args = cli_args()
+    if len(args) >= 2 and args[0] == "migrate":
+        migrate(args[1], args[2] if len(args) > 2 else None)
+    elif len(args) >= 2 and args[0] == "stats":
+        stats(args[1])
+    else:
+        print(__doc__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
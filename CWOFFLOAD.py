@@ -0,0 +1,105 @@
+"""
+CW CPU offload
+- Decoding (gzip/br/zstd), gzip size measurement and the regex checks on
+  multi-hundred-KB pages are CPU work; on the event loop they stall every
+  download and cap the async engine at one core
+- OFFLOAD.check() hands the received wire body to a process pool and awaits
+  only the verdict: (reason or None, decoded page text)
+- Record extraction (CWINDEX.extract_record) is not done here: nothing on the
+  fetch path consumes records, and CWINDEX load parses the saved pages in its
+  own pool, incrementally by page mtime
+- Requests are batched (OFFLOAD_BATCH pages or OFFLOAD_WAIT seconds, whichever
+  comes first) so one IPC round trip carries many pages
+- The pool has OFFLOAD_PROCESSES workers; fetch concurrency (proxy lanes) and
+  CPU work scale independently
+"""
+
+import os
+import atexit
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from CWENCODING import decode_body
+from CWVALIDATE import validate_page
+
+# === CONSTANTS ===
+OFFLOAD_PROCESSES = max(1, (os.cpu_count() or 2) - 1)  # leave one core to the event loop
+OFFLOAD_BATCH = 16  # pages per IPC round trip
+OFFLOAD_WAIT = 0.005  # seconds a partial batch waits for more pages
+
+
+def check_page(url, raw, encoding, charset, wire_size):
+    """(reason, None) for an invalid page, (None, text) for a valid one"""
+    try:
+        body = decode_body(raw, encoding)
+    except Exception as e:
+        return f"decode: {e}", None
+    reason, _ = validate_page(url, body, wire_size, encoding)
+    if reason:
+        return reason, None
+    return None, body.decode(charset, errors="replace")
+
+
+def _check_batch(items):
+    return [check_page(*item) for item in items]
+
+
+class CpuOffload:
+    """Batches page checks into a process pool; check() is awaited from the event loop"""
+
+    def __init__(self, processes=OFFLOAD_PROCESSES, batch=OFFLOAD_BATCH, wait=OFFLOAD_WAIT):
+        self.processes = processes
+        self.batch = batch
+        self.wait = wait
+        self.executor = None
+        self.pending = []  # (item, future)
+        self.timer = None
+        self.pages = self.batches = 0
+
+    async def check(self, url, raw, encoding, charset, wire_size):
+        """Verdict for a page body as received on the wire"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append(((url, raw, encoding, charset, wire_size), future))
+        if len(self.pending) >= self.batch:
+            self._flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        entries, self.pending = self.pending, []
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.processes)
+        self.pages += len(entries)
+        self.batches += 1
+        done = asyncio.get_running_loop().run_in_executor(self.executor, _check_batch,
+                                                          [item for item, _ in entries])
+        done.add_done_callback(lambda result: self._resolve(result, entries))
+
+    @staticmethod
+    def _resolve(result, entries):
+        error = result.exception() if not result.cancelled() else asyncio.CancelledError()
+        verdicts = result.result() if error is None else [None] * len(entries)
+        for (_, future), verdict in zip(entries, verdicts):
+            if future.done():  # caller timed out or was cancelled meanwhile
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(verdict)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+            print(f"🧮 CPU offload: {self.pages} pages checked in {self.batches} batches "
+                  f"({self.pages / max(self.batches, 1):.1f} per batch, {self.processes} processes)")
+
+
+OFFLOAD = CpuOffload()
+atexit.register(OFFLOAD.close)
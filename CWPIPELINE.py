@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+CW streaming pipeline
+- Non-interactive: sitemap -> filter -> dedup -> fetch -> save in one process
+- Stages are connected by bounded asyncio queues, so company pages are
+  fetched while later sitemaps are still downloading
+- Reuses the CWSITEMAPROXYASYNC fetch engine and file layout
+
+Usage: python CWPIPELINE.py [SITEMAP_LIST.csv] [--profile]
+"""
+
+import os
+import re
+import csv
+import sys
+import time
+import asyncio
+import aiohttp
+from CWPROFILE import cli_args, profile_stage, timer
+from CWFRONTIER import Frontier
+from CWSEEN import FETCHED, SeenSet
+from CWBANDWIDTH import METER
+from CWENCODING import ACCEPT_ENCODING, decode_body
+from CWREPLAY import replay_session_get
+from CWOFFLOAD import OFFLOAD
+from CWSITEMAPROXYASYNC import (CONCURRENT_WORKERS, OFFLOAD_CPU, PER_PROXY_CONCURRENCY, PROXY_LANES, TIMEOUT,
+                                USE_PROXY_POOL, LanePool, html_path, new_session, parse_url_tree, store_result)
+from CWURL import is_wanted_url
+
+# === CONSTANTS ===
+SITEMAP_LIST = "SITEMAP_LIST.csv"
+SITEMAP_WORKERS = 2
+QUEUE_SIZE = 2000  # max URLs waiting between two stages
+REPORT_EVERY = 500
+_RE_LOC = re.compile(r'<loc>(https?://[^<]+)</loc>', re.IGNORECASE)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept-Encoding': ACCEPT_ENCODING
+}
+
+
+class PipelineStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sitemaps = 0
+        self.harvested = 0
+        self.filtered = 0
+        self.duplicates = 0
+        self.saved = 0
+        self.exists = 0
+        self.errors = 0
+
+    def line(self):
+        elapsed = time.perf_counter() - self.started
+        return (f"{elapsed:7.1f}s | sitemaps {self.sitemaps} | harvested {self.harvested} | "
+                f"filtered {self.filtered} | dup {self.duplicates} | saved {self.saved} | "
+                f"existed {self.exists} | errors {self.errors}")
+
+
+def load_sitemap_urls(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [row[0].strip() for row in csv.reader(f) if row and row[0].strip()]
+
+
+# === STAGE 1 - SITEMAPS ===
+async def sitemap_worker(session, sitemap_q, url_q, stats):
+    """Fetch sitemaps and push every <loc> URL downstream"""
+    while True:
+        sitemap_url = await sitemap_q.get()
+        if sitemap_url is None:
+            return
+        try:
+            async with replay_session_get(session, sitemap_url, headers=HEADERS,
+                                          timeout=aiohttp.ClientTimeout(total=TIMEOUT * 4)) as response:
+                if response.status != 200:
+                    print(f"❌ Sitemap HTTP {response.status}: {sitemap_url}")
+                    continue
+                raw = await response.read()
+                await METER.record_async(None, len(raw))
+                xml = decode_body(raw, response.headers.get("Content-Encoding")).decode("utf-8", errors="replace")
+        except Exception as e:
+            print(f"❌ Sitemap failed: {sitemap_url}: {e}")
+            continue
+
+        stats.sitemaps += 1
+        with timer("extract"):
+            locs = _RE_LOC.findall(xml)
+        del xml
+        print(f"🗺️  {sitemap_url}: {len(locs)} URLs")
+        for url in locs:
+            stats.harvested += 1
+            await url_q.put(url.strip())
+
+
+# === STAGE 2 - FILTER + DEDUP ===
+async def filter_stage(url_q, fetch_q, stats, fetch_workers, fetched):
+    """Apply the company type filter, drop duplicates and already saved pages"""
+    seen = Frontier()
+    while True:
+        url = await url_q.get()
+        if url is None:
+            break
+        if not is_wanted_url(url):
+            continue
+        url_tree = parse_url_tree(url)
+        if not url_tree:
+            continue
+        if not seen.add(url):
+            stats.duplicates += 1
+            continue
+        if url in fetched or os.path.exists(html_path(url)):
+            stats.exists += 1
+            continue
+        stats.filtered += 1
+        await fetch_q.put(url)
+
+    for _ in range(fetch_workers):
+        await fetch_q.put(None)
+
+
+# === STAGE 3 - FETCH + SAVE ===
+async def fetch_worker(lanes, fetch_q, stats, fetched):
+    while True:
+        url = await fetch_q.get()
+        if url is None:
+            return
+        result = await lanes.fetch(url)
+        save_result = await store_result(result, fetched)
+        if save_result == "saved":
+            stats.saved += 1
+        elif save_result == "exists":
+            stats.exists += 1
+        else:
+            stats.errors += 1
+        done = stats.saved + stats.exists + stats.errors
+        if done % REPORT_EVERY == 0:
+            print(f"📈 {stats.line()}")
+
+
+async def run_pipeline(sitemap_urls):
+    stats = PipelineStats()
+    sitemap_q = asyncio.Queue()
+    url_q = asyncio.Queue(maxsize=QUEUE_SIZE)
+    fetch_q = asyncio.Queue(maxsize=QUEUE_SIZE)
+    for sitemap_url in sitemap_urls:
+        sitemap_q.put_nowait(sitemap_url)
+    for _ in range(SITEMAP_WORKERS):
+        sitemap_q.put_nowait(None)
+
+    connector = aiohttp.TCPConnector(limit=SITEMAP_WORKERS)  # sitemaps only; pages go through the lanes
+
+    async with new_session(connector) as session, LanePool() as lanes, SeenSet(FETCHED) as fetched:
+        fetch_workers = lanes.capacity
+        if OFFLOAD_CPU:  # workers waiting on a verdict hold no fetch slot: keep the slots busy meanwhile
+            fetch_workers += OFFLOAD.processes * OFFLOAD.batch
+        sitemap_tasks = [asyncio.create_task(sitemap_worker(session, sitemap_q, url_q, stats))
+                         for _ in range(SITEMAP_WORKERS)]
+        filter_task = asyncio.create_task(filter_stage(url_q, fetch_q, stats, fetch_workers, fetched))
+        fetch_tasks = [asyncio.create_task(fetch_worker(lanes, fetch_q, stats, fetched))
+                       for _ in range(fetch_workers)]
+
+        await asyncio.gather(*sitemap_tasks)
+        await url_q.put(None)
+        await filter_task
+        await asyncio.gather(*fetch_tasks)
+
+    print(f"🎉 Pipeline complete: {stats.line()}")
+    return stats
+
+
+def main():
+    args = cli_args()
+    sitemap_list = args[0] if args else SITEMAP_LIST
+    if not os.path.exists(sitemap_list):
+        print(f"❌ {sitemap_list} not found!")
+        sys.exit(1)
+
+    sitemap_urls = load_sitemap_urls(sitemap_list)
+    print("🚀 CWPIPELINE - Streaming sitemap -> page pipeline")
+    lanes = f"{PROXY_LANES} proxies x {PER_PROXY_CONCURRENCY}" if USE_PROXY_POOL else f"{CONCURRENT_WORKERS} direct"
+    print(f"🗺️  Sitemaps: {len(sitemap_urls)} | ⚡ Fetch lanes: {lanes} | 📦 Queue: {QUEUE_SIZE}")
+
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    profile_stage("pipeline", asyncio.run, run_pipeline(sitemap_urls))
+
+
+if __name__ == "__main__":
+    main()
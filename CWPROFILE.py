@@ -0,0 +1,120 @@
+"""
+CW profiling hooks
+- `--profile` on the command line enables profiling for the run
+- profile_stage() wraps a whole stage in cProfile + tracemalloc
+- timer() measures hot sections (fetch, validate, save); no-op when disabled
+- Results go to Profiles/<stage>.prof, <stage>_alloc.txt, <stage>_timers.txt
+"""
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import tracemalloc
+import contextlib
+
+# === CONSTANTS ===
+cwd = os.getcwd()
+PROFILE = "--profile" in sys.argv
+PROFILE_FOLDER = os.path.join(cwd, "Profiles")
+TOP_ALLOCATIONS = 30
+TOP_FUNCTIONS = 40
+TRACEMALLOC_FRAMES = 5
+
+# section -> [calls, total seconds, max seconds]
+_timings = {}
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def cli_args():
+    """Positional command line arguments without --flags"""
+    return [a for a in sys.argv[1:] if not a.startswith("--")]
+
+
+# === SECTION TIMERS ===
+class _Timer:
+    __slots__ = ("section", "start")
+
+    def __init__(self, section):
+        self.section = section
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        entry = _timings.get(self.section)
+        if entry is None:
+            _timings[self.section] = [1, elapsed, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+            if elapsed > entry[2]:
+                entry[2] = elapsed
+        return False
+
+
+def timer(section):
+    """Context manager timing a hot section; shared no-op when profiling is off"""
+    if not PROFILE:
+        return _NULL_TIMER
+    return _Timer(section)
+
+
+def timings_report():
+    lines = [f"{'section':<20} {'calls':>8} {'total s':>10} {'avg ms':>10} {'max ms':>10}"]
+    for section, (calls, total, worst) in sorted(_timings.items(), key=lambda kv: -kv[1][1]):
+        lines.append(f"{section:<20} {calls:>8} {total:>10.3f} {total / calls * 1000:>10.2f} {worst * 1000:>10.2f}")
+    return "\n".join(lines)
+
+
+# === STAGE PROFILING ===
+def profile_stage(stage, func, *args, **kwargs):
+    """Run func(*args, **kwargs); under --profile dump cProfile, allocations and timers for the stage"""
+    if not PROFILE:
+        return func(*args, **kwargs)
+
+    os.makedirs(PROFILE_FOLDER, exist_ok=True)
+    _timings.clear()
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        wall = time.perf_counter() - started
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        _dump_stage(stage, profiler, snapshot, wall, current, peak)
+
+
+def _dump_stage(stage, profiler, snapshot, wall, current, peak):
+    base = os.path.join(PROFILE_FOLDER, stage)
+
+    profiler.dump_stats(base + ".prof")
+    with open(base + "_stats.txt", "w", encoding="utf-8") as f:
+        stats = pstats.Stats(profiler, stream=f)
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    with open(base + "_alloc.txt", "w", encoding="utf-8") as f:
+        f.write(f"current: {current / 1024:.1f} KiB, peak: {peak / 1024:.1f} KiB\n\n")
+        for stat in snapshot.statistics("traceback")[:TOP_ALLOCATIONS]:
+            f.write(f"{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+            for line in stat.traceback.format():
+                f.write(f"  {line}\n")
+            f.write("\n")
+
+    with open(base + "_timers.txt", "w", encoding="utf-8") as f:
+        f.write(f"wall: {wall:.3f} s\n\n")
+        f.write(timings_report() + "\n")
+
+    print(f"📊 Profile for {stage}: {wall:.2f}s wall, peak {peak / 1024 / 1024:.1f} MiB -> {base}.*")
+    if _timings:
+        print(timings_report())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+CW proxy endpoint pool
+- Session-based gateways give every port its own sticky exit IP
+  (gw.dataimpulse.com:10000-10100); the fetchers used to share one port
+- Each worker (process, thread or async connection slot) is pinned to its own
+  port from PORT_FIRST..PORT_LAST and keeps it while it works
+- A port that fails REPIN_AFTER times in a row is rested for PORT_COOLDOWN
+  seconds and its worker is re-pinned to a free port
+- Pins are per process. Integer worker ids are only distinct inside one
+  process, so each process numbers its workers from worker_base(identity):
+  shard / worker number N (URL_LIST3.csv, local3) starts at N * workers, other
+  names hash to a block. Parallel processes then start on different ports
+  (up to the number of ports; beyond that blocks wrap around and share)
+
+Usage:
+  python CWPROXYPOOL.py [WORKERS] [IDENTITY]   # initial worker -> port pinning of a process
+"""
+
+import re
+import time
+import hashlib
+import threading
+from CWPROFILE import cli_args
+
+# === CONSTANTS ===
+GATEWAY = "36fda789ac44aa4cc19e:b966e984e5922790@gw.dataimpulse.com"
+PORT_FIRST = 10000
+PORT_LAST = 10100
+REPIN_AFTER = 3  # consecutive failures before a worker moves to another port
+PORT_COOLDOWN = 300  # seconds a failing port is left alone
+
+
+def worker_base(identity, workers=1):
+    """First worker id of a process with `workers` slots, from its identity
+    (shard number, CWCOORD worker name, input list)"""
+    if isinstance(identity, int):
+        return identity * workers
+    match = re.search(r"(\d+)\D*$", str(identity))
+    if match:
+        return int(match.group(1)) * workers
+    return _slot(str(identity), (PORT_LAST - PORT_FIRST + 1) // workers) * workers
+
+
+def _slot(worker, size):
+    if isinstance(worker, int):
+        return worker % size
+    return int.from_bytes(hashlib.blake2b(str(worker).encode("utf-8"), digest_size=8).digest(), "big") % size
+
+
+class ProxyPool:
+    """Sticky worker -> gateway port assignment with re-pinning on failure"""
+
+    def __init__(self, gateway=GATEWAY, first=PORT_FIRST, last=PORT_LAST):
+        self.gateway = gateway
+        self.ports = list(range(first, last + 1))
+        self._pins = {}  # worker -> port
+        self._users = {}  # port -> workers pinned to it
+        self._failures = {}  # port -> consecutive failures
+        self._resting = {}  # port -> monotonic time it may be used again
+        self._lock = threading.Lock()
+
+    def _available(self, port, now):
+        return self._resting.get(port, 0) <= now
+
+    def _pick(self, worker, avoid=None):
+        """Free port starting at the worker's own slot; least shared one if all are taken"""
+        now = time.monotonic()
+        start = _slot(worker, len(self.ports))
+        best = None
+        for i in range(len(self.ports)):
+            port = self.ports[(start + i) % len(self.ports)]
+            if port == avoid or not self._available(port, now):
+                continue
+            users = len(self._users.get(port, ()))
+            if users == 0:
+                return port
+            if best is None or users < len(self._users.get(best, ())):
+                best = port
+        return best or avoid or self.ports[start]
+
+    def _pin(self, worker, port):
+        old = self._pins.get(worker)
+        if old is not None:
+            self._users[old].discard(worker)
+        self._pins[worker] = port
+        self._users.setdefault(port, set()).add(worker)
+
+    def port_for(self, worker):
+        with self._lock:
+            port = self._pins.get(worker)
+            if port is None:
+                port = self._pick(worker)
+                self._pin(worker, port)
+            return port
+
+    def for_worker(self, worker):
+        """Proxy URL for aiohttp / httpx"""
+        return f"http://{self.gateway}:{self.port_for(worker)}"
+
+    def requests_proxies(self, worker):
+        """Proxy dict for requests"""
+        proxy = self.for_worker(worker)
+        return {"http": proxy, "https": proxy}
+
+    def report(self, worker, ok):
+        """Feed the outcome of a request; re-pins the worker after repeated failures"""
+        with self._lock:
+            port = self._pins.get(worker)
+            if port is None:
+                return
+            if ok:
+                self._failures[port] = 0
+                return
+            self._failures[port] = self._failures.get(port, 0) + 1
+            if self._failures[port] < REPIN_AFTER:
+                return
+            self._failures[port] = 0
+            self._resting[port] = time.monotonic() + PORT_COOLDOWN
+            for other in list(self._users.get(port, ())):
+                new_port = self._pick(other, avoid=port)
+                self._pin(other, new_port)
+                print(f"🔁 Proxy port {port} failing, worker {other} re-pinned to {new_port}")
+
+    def pinned(self):
+        return dict(self._pins)
+
+
+POOL = ProxyPool()
+
+
+if __name__ == "__main__":
+    args = cli_args()
+    workers = int(args[0]) if args else 10
+    base = worker_base(args[1], workers) if len(args) > 1 else 0
+    for w in range(base, base + workers):
+        print(f"  worker {w:>3} -> port {POOL.port_for(w)}")
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+CW query service
+- Small local HTTP/JSON service over the saved pages and COMPANIES.db (CWINDEX):
+    GET  /company/<code>          one company
+    GET  /tax/<tax number>        companies with this tax number (8 digits: all suffixes)
+    GET  /reg/<reg number>        companies with this registration number
+    GET  /search?q=<words>        name / address search (FTS5)
+    POST /batch                   {"codes": [...], "tax": [...]} -> {"codes": {...}, "tax": {...}}
+    GET  /stats                   cache and request counters
+- Keys resolve through the index to a page path; pages the index does not
+  know yet are found in their code's fan-out folder (CWLAYOUT)
+- A page is parsed on first access only; parsed records stay in a
+  size-bounded LRU (OrderedDict) of CACHE_SIZE entries, and a cached record
+  is dropped and parsed again when its page file changed or disappeared
+  (re-fetch, re-index, migration)
+- One process, a thread per connection, HTTP/1.1 keep-alive, one read-only
+  SQLite connection per thread
+- loadtest hammers a running service with keep-alive clients and reports
+  requests/s and latency percentiles
+
+Usage:
+  python CWQUERY.py serve [port]
+  python CWQUERY.py loadtest [url] [clients] [seconds]   # default http://127.0.0.1:8766 16 10
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import threading
+import http.client
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from CWPROFILE import cli_args
+from CWINDEX import INDEX_DB, RECORD_COLUMNS, by_reg, by_tax, extract_record, search
+from CWLAYOUT import PAGE_SUFFIX, bucket
+from CWVERIFY import default_folders
+
+# === CONSTANTS ===
+HOST = "127.0.0.1"
+PORT = 8766
+CACHE_SIZE = 100_000  # parsed records kept in memory
+BATCH_LIMIT = 1000  # keys per /batch request
+LOADTEST_CLIENTS = 16
+LOADTEST_SECONDS = 10
+LOADTEST_SAMPLE = 2000  # codes the load test picks from
+
+
+# === LRU CACHE ===
+class LRUCache:
+    """Thread-safe size-bounded LRU: most recently used entries at the end"""
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            if len(self.data) > self.size:
+                self.data.popitem(last=False)
+
+    def drop(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"entries": len(self.data), "size": self.size, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0}
+
+
+# === RECORD STORE ===
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class CompanyStore:
+    """Code / tax / registration number -> company record, parsed lazily and cached"""
+
+    def __init__(self, db=INDEX_DB, folders=None, cache_size=CACHE_SIZE):
+        self.db = db
+        self.folders = folders or default_folders()
+        self.cache = LRUCache(cache_size)
+        self.local = threading.local()
+
+    def conn(self):
+        """Read-only SQLite connection of the calling thread (None without an index)"""
+        conn = getattr(self.local, "conn", False)
+        if conn is False:
+            conn = None
+            if os.path.exists(self.db):
+                conn = sqlite3.connect(f"file:{self.db}?mode=ro", uri=True)
+                conn.row_factory = sqlite3.Row
+            self.local.conn = conn
+        return conn
+
+    def find_page(self, code):
+        """Saved page of a code: indexed path, else a look into its fan-out folder"""
+        conn = self.conn()
+        if conn is not None:
+            row = conn.execute("SELECT path FROM companies WHERE code = ?", (code,)).fetchone()
+            if row and os.path.exists(row[0]):
+                return row[0]
+        suffix = f"_{code}{PAGE_SUFFIX}"
+        for folder in self.folders:
+            path = os.path.join(folder, bucket(code))
+            if os.path.isdir(path):
+                for name in os.listdir(path):
+                    if name.endswith(suffix):
+                        return os.path.join(path, name)
+        return None
+
+    def company(self, code):
+        """Parsed record of a company code, None when no page is saved"""
+        cached = self.cache.get(code)
+        if cached is not None:
+            path, mtime, record = cached
+            if _mtime(path) == mtime:
+                return record
+            self.cache.drop(code)  # page re-fetched, moved or deleted since it was parsed
+        path = self.find_page(code)
+        if path is None:
+            return None
+        mtime = _mtime(path)
+        try:
+            with open(path, "rb") as f:
+                record = extract_record(f.read(), path)
+        except OSError:
+            return None
+        if record is not None:
+            record = {c: record[c] for c in RECORD_COLUMNS if c != "mtime"}
+            self.cache.put(code, (path, mtime, record))
+        return record
+
+    def _by_index(self, lookup, value):
+        conn = self.conn()
+        if conn is None:
+            return []
+        records = (self.company(row["code"]) for row in lookup(conn, value))
+        return [r for r in records if r is not None]
+
+    def by_tax(self, value):
+        return self._by_index(by_tax, value)
+
+    def by_reg(self, value):
+        return self._by_index(by_reg, value)
+
+    def search(self, text):
+        conn = self.conn()
+        if conn is None:
+            return []
+        return [{c: row[c] for c in RECORD_COLUMNS if c != "mtime"} for row in search(conn, text)]
+
+    def batch(self, codes=(), tax=()):
+        return {"codes": {code: self.company(code) for code in codes},
+                "tax": {value: self.by_tax(value) for value in tax}}
+
+
+# === HTTP SERVICE ===
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+    store = None  # set by serve()
+    requests_served = 0
+    counter_lock = threading.Lock()  # handler threads share the counter
+
+    def log_message(self, format, *args):
+        pass  # no per-request log lines at thousands of requests per second
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with QueryHandler.counter_lock:
+            QueryHandler.requests_served += 1
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        route, _, key = parts.path.strip("/").partition("/")
+        key = unquote(key)
+        store = self.store
+        if route == "company" and key:
+            record = store.company(key)
+            self._send(200 if record else 404, record or {"error": "not found", "code": key})
+        elif route == "tax" and key:
+            self._send(200, store.by_tax(key))
+        elif route == "reg" and key:
+            self._send(200, store.by_reg(key))
+        elif route == "search":
+            self._send(200, store.search(parse_qs(parts.query).get("q", [""])[0]))
+        elif route == "stats":
+            self._send(200, {"requests": QueryHandler.requests_served, "cache": store.cache.stats(),
+                             "index": os.path.exists(store.db)})
+        else:
+            self._send(404, {"error": "unknown route"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/batch":
+            self._send(404, {"error": "unknown route"})
+            return
+        try:
+            query = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            codes, tax = list(query.get("codes", [])), list(query.get("tax", []))
+        except (ValueError, AttributeError, TypeError):
+            self._send(400, {"error": "body must be {\"codes\": [...], \"tax\": [...]}"})
+            return
+        if len(codes) + len(tax) > BATCH_LIMIT:
+            self._send(413, {"error": f"at most {BATCH_LIMIT} keys per batch"})
+            return
+        self._send(200, self.store.batch(codes, tax))
+
+
+def serve(port=PORT, store=None):
+    QueryHandler.store = store or CompanyStore()
+    server = ThreadingHTTPServer((HOST, port), QueryHandler)
+    server.daemon_threads = True
+    print(f"🔎 Query service on http://{HOST}:{port} "
+          f"({'index ' + QueryHandler.store.db if os.path.exists(QueryHandler.store.db) else 'no index, code lookups only'}, "
+          f"cache {QueryHandler.store.cache.size} records)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Query service stopped")
+    finally:
+        server.server_close()
+
+
+# === LOAD TEST ===
+def _sample_paths(count=LOADTEST_SAMPLE):
+    """Request paths for the load test: company codes from the index or the service's folders"""
+    codes = []
+    if os.path.exists(INDEX_DB):
+        conn = sqlite3.connect(f"file:{INDEX_DB}?mode=ro", uri=True)
+        codes = [row[0] for row in conn.execute("SELECT code FROM companies ORDER BY random() LIMIT ?", (count,))]
+        conn.close()
+    if not codes:
+        print("⚠️  No index: load test requests unknown codes (404s)")
+        codes = [f"TEST{i:04d}" for i in range(count)]
+    return [f"/company/{code}" for code in codes]
+
+
+def _client(host, port, paths, deadline, latencies, errors):
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request("GET", random.choice(paths))
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def loadtest(base=f"http://{HOST}:{PORT}", clients=LOADTEST_CLIENTS, seconds=LOADTEST_SECONDS):
+    """Keep-alive clients in threads for a fixed time; returns requests per second"""
+    parts = urlsplit(base)
+    paths = _sample_paths()
+    latencies, errors = [], []
+    print(f"🚀 Load test: {clients} clients x {seconds}s against {base} ({len(paths)} keys)...")
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=_client, args=(parts.hostname, parts.port or 80, paths, deadline,
+                                                      latencies, errors))
+               for _ in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    rate = len(latencies) / elapsed if elapsed else 0.0
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+    print(f"✅ {len(latencies)} requests in {elapsed:.1f}s = {rate:.0f} req/s, {len(errors)} errors")
+    print(f"   latency p50 {pct(0.50):.2f} ms, p95 {pct(0.95):.2f} ms, p99 {pct(0.99):.2f} ms")
+    return rate
+
+
+def main():
+    args = cli_args()
+    if not args or args[0] not in ("serve", "loadtest"):
+        print(__doc__)
+        sys.exit(1)
+    if args[0] == "serve":
+        serve(int(args[1]) if len(args) > 1 else PORT)
+    else:
+        loadtest(args[1] if len(args) > 1 else f"http://{HOST}:{PORT}",
+                 int(args[2]) if len(args) > 2 else LOADTEST_CLIENTS,
+                 float(args[3]) if len(args) > 3 else LOADTEST_SECONDS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+CW record/replay cache
+- Sits under the fetch functions (CW.fetch, CWALL.fetch_url, CWSITEMAP.fetch,
+  CWSITEMAPROXY / CWSITEMAPROXYPARAM / CWSITEMAPPROXY fetch,
+  CWSITEMAPROXYASYNC.fetch_single, the CWPIPELINE sitemap worker and
+  CWHTTP2.fetch_single_h2); off unless a flag is given:
+    --record  fetch as usual and store every response in REPLAY.db
+    --replay  serve responses from REPLAY.db only, no network at all;
+              URLs missing from the cache fail like a connection error
+- Keyed by the normalized URL (CWURL), so spelling variants share an entry
+- Stores status, the headers the fetchers read and the wire body: bodies that
+  arrived compressed (gzip/br/zstd) are kept as they are, identity bodies are
+  zlib-compressed; replayed responses go through the same decoders
+- Replay reads from SQLite with a large mmap window; REPLAY_LATENCY adds a
+  simulated network delay (0 = memory speed)
+- Every recorded response is its own short transaction (cheap under WAL), so
+  several recording processes never hold the write lock for long; a writer
+  waits up to BUSY_TIMEOUT for it
+
+Usage:
+  python CW.py URL_LIST0.csv --record      # any fetcher: record a run
+  python CW.py URL_LIST0.csv --replay      # repeat it offline
+  python CWREPLAY.py stats
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import atexit
+import random
+import asyncio
+import sqlite3
+import threading
+import requests
+from CWURL import normalize_url
+from CWENCODING import decode_body
+
+# === CONSTANTS ===
+REPLAY_DB = "REPLAY.db"
+RECORD = "--record" in sys.argv
+REPLAY = "--replay" in sys.argv
+REPLAY_LATENCY = 0.0  # seconds of simulated network delay per replayed response
+LATENCY_JITTER = 0.5  # +-50% around REPLAY_LATENCY
+KEEP_HEADERS = ("Content-Type", "Content-Encoding", "Location", "Retry-After")
+BUSY_TIMEOUT = 30  # seconds a recording process waits for another one's write
+MMAP_SIZE = 1 << 30  # bytes of the database mapped into memory
+REPLAY_CHUNK = 16 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    packed INTEGER NOT NULL,
+    recorded REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class ReplayMiss(requests.exceptions.ConnectionError):
+    """URL is not in the replay cache"""
+
+
+class _Headers(dict):
+    """Case-insensitive header lookup, enough for the fetchers (.get / [])"""
+
+    def __init__(self, headers):
+        super().__init__((k.lower(), v) for k, v in headers.items())
+
+    def get(self, key, default=None):
+        return super().get(key.lower(), default)
+
+    def __getitem__(self, key):
+        return super().__getitem__(key.lower())
+
+    def __contains__(self, key):
+        return super().__contains__(key.lower())
+
+
+def _charset(headers):
+    content_type = headers.get("Content-Type") or ""
+    for part in content_type.split(";")[1:]:
+        name, _, value = part.strip().partition("=")
+        if name.lower() == "charset" and value:
+            return value.strip('"\'')
+    return None
+
+
+# === CACHE ===
+class ReplayCache:
+    """url -> (status, headers, wire body) in one SQLite file"""
+
+    def __init__(self, path=REPLAY_DB):
+        self.path = path
+        self.conn = None
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.stored = 0
+
+    def _open(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            self.conn.executescript(SCHEMA)
+        return self.conn
+
+    def store(self, url, status, headers, body):
+        """Keep one response; headers as received, body as it came off the wire"""
+        kept = {name: headers.get(name) for name in KEEP_HEADERS if headers.get(name)}
+        packed = not kept.get("Content-Encoding")
+        blob = zlib.compress(body, 6) if packed else body
+        with self._lock:
+            conn = self._open()
+            with conn:  # commit now: no write lock held across responses
+                conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                             (normalize_url(url), status, json.dumps(kept), blob, int(packed), time.time()))
+            self.stored += 1
+
+    def load(self, url):
+        """(status, headers, wire body) or None"""
+        with self._lock:
+            row = self._open().execute("SELECT status, headers, body, packed FROM responses WHERE url = ?",
+                                       (normalize_url(url),)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        status, headers, body, packed = row
+        return status, _Headers(json.loads(headers)), zlib.decompress(body) if packed else body
+
+    def stats(self):
+        conn = self._open()
+        count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()
+        statuses = dict(conn.execute("SELECT status, COUNT(*) FROM responses GROUP BY status").fetchall())
+        return {"responses": count, "body_bytes": size, "statuses": statuses}
+
+    def close(self):
+        """atexit does it; worker processes call it themselves"""
+        with self._lock:
+            if self.conn is not None:
+                self.conn.commit()
+                self.conn.close()
+                self.conn = None
+        if RECORD or REPLAY:
+            print(f"📼 Replay cache {self.path}: {self.stored} recorded, {self.hits} replayed, {self.misses} missing")
+
+
+CACHE = ReplayCache()
+atexit.register(CACHE.close)
+
+
+def _delay():
+    return REPLAY_LATENCY * random.uniform(1 - LATENCY_JITTER, 1 + LATENCY_JITTER) if REPLAY_LATENCY else 0.0
+
+
+def _cached(url):
+    entry = CACHE.load(url)
+    if entry is None:
+        raise ReplayMiss(f"Not in replay cache: {url}")
+    return entry
+
+
+# === requests (CW.py, CWALL.py, CWSITEMAP.py) ===
+class _Raw:
+    """The parts of urllib3's raw response the fetchers use"""
+
+    def __init__(self, body):
+        self.body = body
+
+    def read(self, amt=None, decode_content=False):
+        return self.body
+
+    def stream(self, amt=REPLAY_CHUNK, decode_content=False):
+        for start in range(0, len(self.body), amt):
+            yield self.body[start:start + amt]
+
+
+class ReplayResponse:
+    """Stand-in for a requests.Response fetched with stream=True"""
+
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status_code = status
+        self.headers = headers
+        self.raw = _Raw(body)
+        charset = _charset(headers)
+        text = (headers.get("Content-Type") or "").startswith("text/")
+        self.encoding = charset or ("ISO-8859-1" if text else None)  # what requests would pick
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def replay_get(url, **kwargs):
+    """requests.get() under the replay layer: recorded, replayed or passed through"""
+    if REPLAY:
+        status, headers, body = _cached(url)
+        delay = _delay()
+        if delay:
+            time.sleep(delay)
+        return ReplayResponse(url, status, headers, body)
+    response = requests.get(url, **kwargs)
+    if not RECORD:
+        return response
+    with response:
+        body = response.raw.read(decode_content=False)
+    CACHE.store(url, response.status_code, response.headers, body)
+    return ReplayResponse(url, response.status_code, _Headers(response.headers), body)
+
+
+# === aiohttp (CWSITEMAPROXYASYNC.fetch_single) ===
+class _Content:
+    def __init__(self, body):
+        self.body = body
+
+    async def iter_chunked(self, n):
+        for start in range(0, len(self.body), n):
+            yield self.body[start:start + n]
+
+    async def read(self):
+        return self.body
+
+
+class AsyncReplayResponse:
+    """Stand-in for an aiohttp.ClientResponse used as `async with`"""
+
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.charset = _charset(headers)
+        self.content = _Content(body)
+
+    async def read(self):
+        return self.content.body
+
+    def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _AsyncReplayGet:
+    def __init__(self, session, url, kwargs):
+        self.session, self.url, self.kwargs = session, url, kwargs
+
+    async def __aenter__(self):
+        if REPLAY:
+            status, headers, body = _cached(self.url)
+            delay = _delay()
+            if delay:
+                await asyncio.sleep(delay)
+        else:
+            async with self.session.get(self.url, **self.kwargs) as response:
+                status, headers, body = response.status, _Headers(response.headers), await response.read()
+            if self.session.auto_decompress:  # body already decoded: do not record the encoding
+                headers = _Headers({k: v for k, v in headers.items() if k != "content-encoding"})
+            CACHE.store(self.url, status, headers, body)
+        if self.session.auto_decompress and headers.get("Content-Encoding"):
+            body = decode_body(body, headers.get("Content-Encoding"))
+        return AsyncReplayResponse(self.url, status, headers, body)
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def replay_session_get(session, url, **kwargs):
+    """session.get() under the replay layer; use as `async with replay_session_get(...) as response`"""
+    if not (RECORD or REPLAY):
+        return session.get(url, **kwargs)
+    return _AsyncReplayGet(session, url, kwargs)
+
+
+# === httpx (CWHTTP2.fetch_single_h2) ===
+class AsyncReplayStream:
+    """Stand-in for a streamed httpx.Response used as `async with`"""
+
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status_code = status
+        self.headers = headers
+        self.encoding = _charset(headers)
+        self.body = body
+
+    async def aiter_raw(self, chunk_size=REPLAY_CHUNK):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _AsyncReplayStream:
+    def __init__(self, client, method, url, kwargs):
+        self.client, self.method, self.url, self.kwargs = client, method, url, kwargs
+
+    async def __aenter__(self):
+        if REPLAY:
+            status, headers, body = _cached(self.url)
+            delay = _delay()
+            if delay:
+                await asyncio.sleep(delay)
+        else:
+            async with self.client.stream(self.method, self.url, **self.kwargs) as response:
+                status, headers = response.status_code, _Headers(response.headers)
+                body = b"".join([chunk async for chunk in response.aiter_raw()])
+            CACHE.store(self.url, status, headers, body)
+        return AsyncReplayStream(self.url, status, headers, body)
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def replay_client_stream(client, method, url, **kwargs):
+    """client.stream() under the replay layer; use as `async with replay_client_stream(...) as response`"""
+    if not (RECORD or REPLAY):
+        return client.stream(method, url, **kwargs)
+    return _AsyncReplayStream(client, method, url, kwargs)
+
+
+def main():
+    if not os.path.exists(REPLAY_DB):
+        print(f"❌ {REPLAY_DB} not found! Record a run with --record first.")
+        sys.exit(1)
+    stats = CACHE.stats()
+    print(f"📼 {REPLAY_DB}: {stats['responses']} responses, {stats['body_bytes'] / 1024 / 1024:.1f} MB of bodies")
+    for status, count in sorted(stats["statuses"].items()):
+        print(f"   HTTP {status:<5} {count}")
+
+
+if __name__ == "__main__":
+    main()
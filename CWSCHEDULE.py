@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+CW fetch scheduler
+- Level 1 keeps the sitemap metadata: URL lists are url,priority,changefreq,lastmod
+- Every URL gets a score from its sitemap priority, staleness (not fetched yet,
+  change frequency, recent lastmod), legal form (-zrt > -kft > -bt) and how
+  often it has failed since its last success (RETRY_STATE.csv)
+- RETRY_STATE.csv is an append-only log: "url,1" per failed attempt, "url,0"
+  when a URL that had failed is fetched; schedule() first compacts it with
+  CWSORT to the URLs that still have failures, so only those are loaded
+- Ordering streams from disk through CWSORT: RUN_SIZE chunks are scored and
+  sorted into run files, and the runs are merged with a heap (heapq.merge),
+  so memory stays flat for multi-million URL lists
+- Level 2 shards the scheduled list; shards keep its order, so every fetcher
+  gets the most valuable pages first
+
+Usage:
+  python CWSCHEDULE.py [FILTERED_URL_LIST.csv] [SCHEDULED_URL_LIST.csv]
+"""
+
+import os
+import re
+import csv
+import time
+from datetime import datetime, timezone
+from CWPROFILE import cli_args, profile_stage, timer
+from CWSEEN import FETCHED, SeenSet
+from CWSORT import RUN_SIZE, iter_csv, sorted_rows
+from CWURL import url_slug
+
+# === CONSTANTS ===
+FILTERED_URL_LIST = "FILTERED_URL_LIST.csv"
+SCHEDULED_URL_LIST = "SCHEDULED_URL_LIST.csv"
+RETRY_STATE = "RETRY_STATE.csv"
+URL_COLUMNS = ("url", "priority", "changefreq", "lastmod")
+MAX_ATTEMPTS = 5  # URLs that failed this often are scheduled last
+SCORE_CEILING = 1_000_000  # above any score; sort keys count down from it
+
+# Score = sum of weight * component (components are 0..1, retries count attempts)
+WEIGHTS = {
+    "priority": 1.0,
+    "staleness": 1.0,
+    "legal_form": 0.5,
+    "retry": 0.3,
+}
+DEFAULT_PRIORITY = 0.5
+LEGAL_FORM_SCORE = (("-zrt", 1.0), ("-kft", 0.6), ("-bt", 0.3))
+CHANGEFREQ_DAYS = {"always": 1 / 24, "hourly": 1 / 24, "daily": 1, "weekly": 7, "monthly": 30,
+                   "yearly": 365, "never": 3650}
+RECENT_DAYS = 7  # lastmod within this many days counts as a fresh change
+
+# Sitemap <url> entries
+_RE_URL = re.compile(r'<url>(.*?)</url>', re.IGNORECASE | re.DOTALL)
+_RE_LOC = re.compile(r'<loc>\s*(https?://[^<\s]+)\s*</loc>', re.IGNORECASE)
+_RE_FIELDS = {name: re.compile(rf'<{name}>\s*([^<]*?)\s*</{name}>', re.IGNORECASE)
+              for name in URL_COLUMNS[1:]}
+
+
+# === SITEMAP METADATA ===
+def sitemap_entries(xml):
+    """[url, priority, changefreq, lastmod] rows of a sitemap; plain <loc> list for sitemap indexes"""
+    rows = []
+    for block in _RE_URL.findall(xml):
+        loc = _RE_LOC.search(block)
+        if not loc:
+            continue
+        row = [loc.group(1)]
+        for name in URL_COLUMNS[1:]:
+            m = _RE_FIELDS[name].search(block)
+            row.append(m.group(1) if m else "")
+        rows.append(row)
+    if not rows:
+        rows = [[url, "", "", ""] for url in _RE_LOC.findall(xml)]
+    return rows
+
+
+def _lastmod_age_days(lastmod, now):
+    if not lastmod:
+        return None
+    try:
+        stamp = datetime.fromisoformat(lastmod.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return max(0.0, (now - stamp.timestamp()) / 86400)
+
+
+# === RETRY STATE ===
+_failing = {}  # path -> URLs with failures since their last success, as this process knows them
+
+
+def _attempts(row):
+    return int(row[1]) if len(row) > 1 and row[1].strip() else 1
+
+
+def load_retries(path=RETRY_STATE):
+    """url -> failed attempts since its last success"""
+    retries = {}
+    if os.path.exists(path):
+        for row in iter_csv(path):
+            attempts = _attempts(row)
+            if attempts:
+                retries[row[0]] = retries.get(row[0], 0) + attempts
+            else:
+                retries.pop(row[0], None)
+    return retries
+
+
+def compact_retries(path=RETRY_STATE, run_size=RUN_SIZE):
+    """Rewrite the log as one row per URL that still has failures (external sort by URL,
+    log order kept within a URL); returns the number of rows kept"""
+    if not os.path.exists(path):
+        return 0
+    kept = 0
+    tmp = path + ".tmp"
+    with timer("compact_retries"), open(tmp, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        current, attempts = None, 0
+        for url, row in sorted_rows(iter_csv(path), lambda row: row[0], run_size):
+            if url != current:
+                if attempts:
+                    writer.writerow([current, attempts])
+                    kept += 1
+                current, attempts = url, 0
+            step = _attempts(row)
+            attempts = attempts + step if step else 0
+        if attempts:
+            writer.writerow([current, attempts])
+            kept += 1
+    os.replace(tmp, path)
+    _failing.pop(path, None)
+    return kept
+
+
+def _failing_urls(path):
+    urls = _failing.get(path)
+    if urls is None:
+        urls = _failing[path] = set(load_retries(path))
+    return urls
+
+
+def _append(path, rows):
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+def record_failures(urls, path=RETRY_STATE):
+    """Append one failed attempt for each url"""
+    if not urls:
+        return
+    _append(path, ([url, 1] for url in urls))
+    _failing_urls(path).update(urls)
+
+
+def record_successes(urls, path=RETRY_STATE):
+    """Reset the count of urls that had failed before (others are not written)"""
+    failing = _failing_urls(path)
+    cleared = [url for url in urls if url in failing]
+    if not cleared:
+        return
+    _append(path, ([url, 0] for url in cleared))
+    failing.difference_update(cleared)
+
+
+# === SCORING ===
+class Scorer:
+    def __init__(self, fetched=None, retries=None, weights=None, now=None):
+        self.fetched = fetched
+        self.retries = retries or {}
+        self.weights = weights or WEIGHTS
+        self.now = now or time.time()
+
+    def staleness(self, url, changefreq, lastmod):
+        if self.fetched is None or url not in self.fetched:
+            return 1.0
+        # Already saved: worth refetching when it changes often or changed recently
+        days = CHANGEFREQ_DAYS.get(changefreq.lower(), 30)
+        stale = min(1.0, 1 / days) * 0.5
+        age = _lastmod_age_days(lastmod, self.now)
+        if age is not None and age <= RECENT_DAYS:
+            stale += 0.5
+        return stale
+
+    def score(self, row):
+        url = row[0]
+        priority, changefreq, lastmod = (list(row[1:4]) + ["", "", ""])[:3]
+        try:
+            priority = min(1.0, max(0.0, float(priority)))
+        except ValueError:
+            priority = DEFAULT_PRIORITY
+        slug = (url_slug(url) or "").lower()  # the legal form ends the slug (CWURL, like the filter)
+        form = next((s for suffix, s in LEGAL_FORM_SCORE if slug.endswith(suffix)), 0.0)
+        attempts = self.retries.get(url, 0)
+        if attempts >= MAX_ATTEMPTS:
+            return -1000.0 - attempts
+        w = self.weights
+        return (w["priority"] * priority + w["staleness"] * self.staleness(url, changefreq, lastmod)
+                + w["legal_form"] * form - w["retry"] * attempts)
+
+
+# === STREAMING SORT ===
+def sort_key(score):
+    """Best score first as a fixed-width string key for CWSORT"""
+    return f"{SCORE_CEILING - score:016.6f}"
+
+
+def schedule(source=FILTERED_URL_LIST, target=SCHEDULED_URL_LIST, scorer=None, run_size=RUN_SIZE):
+    """Write source ordered by score to target; returns the number of URLs"""
+    if not os.path.exists(source):
+        print(f"❌ {source} not found!")
+        return 0
+
+    own_fetched = scorer is None
+    if scorer is None:
+        compact_retries()
+        scorer = Scorer(SeenSet(FETCHED), load_retries())
+    total = 0
+    try:
+        tmp = target + ".tmp"
+        with timer("schedule"), open(tmp, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            for _, row in sorted_rows(iter_csv(source), lambda row: sort_key(scorer.score(row)), run_size):
+                writer.writerow(row)
+                total += 1
+        os.replace(tmp, target)
+    finally:
+        if own_fetched:
+            scorer.fetched.close()
+
+    print(f"✅ {total} URLs scheduled -> {target}")
+    return total
+
+
+def main():
+    args = cli_args()
+    source = args[0] if args else FILTERED_URL_LIST
+    target = args[1] if len(args) > 1 else SCHEDULED_URL_LIST
+    profile_stage("schedule", schedule, source, target)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+CW persistent seen-set
+- Memory-mapped Bloom filter (<name>.bloom) with a fixed size chosen from the
+  expected capacity and false-positive rate; O(1) add / test
+- Exact fallback for positives, kept on disk: every key is appended to
+  <name>.keys (unbuffered, before its Bloom bits are set, so other processes
+  sharing the set find it); <name>.sorted holds the log's keys sorted up to an
+  offset and is searched by bisect over a read-only mmap; only the newer tail
+  of the log (at most TAIL_KEYS keys) is held in memory
+- A positive missing from both re-reads the log past the last loaded offset,
+  so keys added by another process are seen; a full tail is merged into a new
+  sorted file
+- Keys: packed company code for company URLs, 56-bit blake2b of the URL otherwise
+
+Two sets are used by the pipeline:
+  SEEN    - URLs harvested from sitemaps (Level 1 only passes new ones on)
+  FETCHED - pages already saved (filter and fetch stages skip them)
+"""
+
+import os
+import math
+import mmap
+import array
+import bisect
+import heapq
+import hashlib
+from CWFRONTIER import code_to_int
+from CWURL import company_key
+
+# === CONSTANTS ===
+SEEN = "SEEN_URLS"
+FETCHED = "FETCHED_URLS"
+CAPACITY = 10_000_000  # expected number of keys
+FP_RATE = 0.001
+EXACT_CHECK = True
+TAIL_KEYS = 200_000  # newest log keys held in memory before they are merged into <name>.sorted
+READ_KEYS = 65_536  # keys read from the log per step
+BLOOM_MAGIC = b"CWBL"
+_HEADER = 32  # magic, bits, hashes, count, capacity
+_OTHER_KEY = 0xFF << 56
+
+
+def url_key(url):
+    """64-bit key: packed company code, or tagged 56-bit hash for other URLs"""
+    key = company_key(url)
+    packed = code_to_int(key[1]) if key else None
+    if packed is not None:
+        return packed
+    digest = hashlib.blake2b(url.encode("utf-8"), digest_size=7).digest()
+    return _OTHER_KEY | int.from_bytes(digest, "little")
+
+
+class BloomFilter:
+    """Bloom filter over a memory-mapped file"""
+
+    def __init__(self, path, capacity=CAPACITY, fp_rate=FP_RATE):
+        self.path = path
+        if not os.path.exists(path):
+            bits = max(64, int(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+            bits = (bits + 7) // 8 * 8
+            hashes = max(1, round(bits / capacity * math.log(2)))
+            with open(path, "wb") as f:
+                f.write(BLOOM_MAGIC + bits.to_bytes(8, "little") + hashes.to_bytes(4, "little"))
+                f.write(bytes(8) + capacity.to_bytes(8, "little"))
+                f.truncate(_HEADER + bits // 8)
+        self._file = open(path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        if self._mm[:4] != BLOOM_MAGIC:
+            raise ValueError(f"Not a bloom filter file: {path}")
+        self.bits = int.from_bytes(self._mm[4:12], "little")
+        self.hashes = int.from_bytes(self._mm[12:16], "little")
+        self.capacity = int.from_bytes(self._mm[24:32], "little")
+
+    @property
+    def count(self):
+        return int.from_bytes(self._mm[16:24], "little")
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.to_bytes(8, "little"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        bits = self.bits
+        return [(h1 + i * h2) % bits + _HEADER * 8 for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        mm = self._mm
+        for pos in self._positions(key):
+            if not mm[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def add(self, key):
+        """Set the key's bits; returns True if at least one bit was new"""
+        mm = self._mm
+        new = False
+        for pos in self._positions(key):
+            byte = mm[pos >> 3]
+            bit = 1 << (pos & 7)
+            if not byte & bit:
+                mm[pos >> 3] = byte | bit
+                new = True
+        if new:
+            mm[16:24] = (self.count + 1).to_bytes(8, "little")
+        return new
+
+    def estimated_fp_rate(self):
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+    def close(self):
+        self._mm.flush()
+        self._mm.close()
+        self._file.close()
+
+
+class KeyIndex:
+    """Exact key lookups on disk: sorted key file covering the log up to an offset,
+    plus the log's newer tail in memory"""
+
+    def __init__(self, log_path, sorted_path, tail_keys=TAIL_KEYS):
+        self.log_path = log_path
+        self.sorted_path = sorted_path
+        self.tail_keys = tail_keys
+        self.tail = set()
+        self.offset = 0  # log bytes covered by the sorted file + tail
+        self._file = self._mm = self._view = self.keys = None
+        self._stamp = None
+        self._open_sorted()
+
+    def _close_sorted(self):
+        if self._mm is not None:
+            self.keys.release()
+            self._view.release()
+            self._mm.close()
+            self._file.close()
+        self._file = self._mm = self._view = None
+        self.keys = ()
+
+    def _open_sorted(self):
+        """(Re)map the sorted file; the tail starts over at the offset it covers"""
+        self._close_sorted()
+        self.tail = set()
+        self.offset = 0
+        self._stamp = None
+        if os.path.exists(self.sorted_path):
+            self._file = open(self.sorted_path, "rb")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mm)
+            self.keys = self._view[8:].cast("Q")
+            self.offset = int.from_bytes(self._mm[:8], "little")
+            self._stamp = os.stat(self.sorted_path).st_mtime_ns
+
+    def _known(self, key):
+        if key in self.tail:
+            return True
+        keys = self.keys
+        i = bisect.bisect_left(keys, key)
+        return i < len(keys) and keys[i] == key
+
+    def __contains__(self, key):
+        if self._known(key):
+            return True
+        self.refresh()
+        return self._known(key)
+
+    def add(self, key):
+        """Hold a key this process just appended to the log; a full tail is merged to disk"""
+        self.tail.add(key)
+        if len(self.tail) >= self.tail_keys:
+            self.refresh()  # moves the offset past the keys appended here, so the merge covers them
+            if len(self.tail) >= self.tail_keys:
+                self.compact()
+
+    def refresh(self):
+        """Load log keys written since the last look (by any process)"""
+        if os.path.exists(self.sorted_path) and os.stat(self.sorted_path).st_mtime_ns != self._stamp:
+            self._open_sorted()  # another process merged a newer tail
+        with open(self.log_path, "rb") as f:
+            f.seek(self.offset)
+            while True:
+                data = f.read(8 * READ_KEYS)
+                data = data[:len(data) // 8 * 8]  # a key being appended right now is read next time
+                if not data:
+                    break
+                self.tail.update(array.array("Q", data))
+                self.offset += len(data)
+                if len(self.tail) >= self.tail_keys:
+                    self.compact()
+
+    def compact(self):
+        """Merge the tail into a new sorted file; the tail is kept if the file cannot be replaced"""
+        tmp = f"{self.sorted_path}.{os.getpid()}.tmp"
+        merged = heapq.merge(self.keys, sorted(self.tail))
+        with open(tmp, "wb") as f:
+            f.write(self.offset.to_bytes(8, "little"))
+            chunk, last = array.array("Q"), None
+            for key in merged:
+                if key != last:
+                    chunk.append(key)
+                    last = key
+                    if len(chunk) >= READ_KEYS:
+                        chunk.tofile(f)
+                        chunk = array.array("Q")
+            chunk.tofile(f)
+        offset = self.offset
+        self._close_sorted()
+        try:
+            os.replace(tmp, self.sorted_path)
+        except OSError:  # mapped by another process (Windows): try again at the next full tail
+            os.remove(tmp)
+            tail = self.tail
+            self._open_sorted()
+            self.tail, self.offset = tail, offset
+            return
+        self._open_sorted()
+
+    def close(self):
+        self._close_sorted()
+
+
+class SeenSet:
+    """Bloom filter plus an append-only exact key log for confirming positives"""
+
+    def __init__(self, name, folder=".", capacity=CAPACITY, fp_rate=FP_RATE, exact=EXACT_CHECK):
+        self.name = name
+        self.bloom = BloomFilter(os.path.join(folder, name + ".bloom"), capacity, fp_rate)
+        self.keys_path = os.path.join(folder, name + ".keys")
+        self.sorted_path = os.path.join(folder, name + ".sorted")
+        self.exact = exact
+        self._index = None
+        self._keys_file = open(self.keys_path, "ab", buffering=0)  # visible to other processes at once
+        self.false_positives = 0
+
+    def _exact_index(self):
+        if self._index is None:
+            self._index = KeyIndex(self.keys_path, self.sorted_path)
+        return self._index
+
+    def _contains_key(self, key):
+        if key not in self.bloom:
+            return False
+        if not self.exact:
+            return True
+        if key in self._exact_index():
+            return True
+        self.false_positives += 1
+        return False
+
+    def __contains__(self, url):
+        return self._contains_key(url_key(url))
+
+    def add(self, url):
+        """Record url; returns True if it was not seen before"""
+        key = url_key(url)
+        if self._contains_key(key):
+            return False
+        self._keys_file.write(key.to_bytes(8, "little"))  # log first: a Bloom hit always finds the key
+        self.bloom.add(key)
+        if self._index is not None:
+            self._index.add(key)
+        return True
+
+    def close(self):
+        if self.bloom.count > self.bloom.capacity:
+            print(f"⚠️  {self.name}: {self.bloom.count} keys over capacity {self.bloom.capacity}, "
+                  f"false-positive rate now ~{self.bloom.estimated_fp_rate():.4f}")
+        if self._index is not None:
+            self._index.close()
+        self._keys_file.close()
+        self.bloom.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
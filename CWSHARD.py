@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+CW shard planner
+- Assigns every URL of the scheduled list (CWSCHEDULE) to URL_LIST{N}.csv by a
+  stable hash of its company code (jump consistent hash), so changing the list
+  never reshuffles shards; each shard keeps the scheduled order
+- Rebalancing to a new shard count moves only ~1/N of the URLs, and moves their
+  saved pages between Companies_{N} folders accordingly
+- Worker plan: groups shards by remaining (not yet fetched) work so parallel
+  workers finish at the same time
+
+Usage:
+  python CWSHARD.py plan                 # (re)write shards with the saved shard count
+  python CWSHARD.py rebalance <N>        # switch to N shards, move saved pages
+  python CWSHARD.py workers <W>          # WORKER_PLAN.csv for W workers
+"""
+
+import os
+import csv
+import sys
+import json
+import hashlib
+from CWPROFILE import cli_args
+from CWLAYOUT import page_path
+from CWURL import url_code
+from CWSCHEDULE import SCHEDULED_URL_LIST
+
+# === CONSTANTS ===
+cwd = os.getcwd()
+SHARD_PLAN = "SHARD_PLAN.json"
+WORKER_PLAN = "WORKER_PLAN.csv"
+BATCH_SIZE = 10000  # target URLs per shard when no plan exists yet
+
+
+# === HASHING ===
+def company_code(url):
+    """Hashids code = last path segment of a company URL"""
+    return url_code(url)
+
+
+def stable_hash(code):
+    return int.from_bytes(hashlib.blake2b(code.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def jump_hash(key, buckets):
+    """Jump consistent hash (Lamping & Veach): 64-bit key -> bucket in [0, buckets)"""
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+def shard_for(url, shards):
+    """1-based shard number of a URL"""
+    return jump_hash(stable_hash(company_code(url)), shards) + 1
+
+
+# === PATHS ===
+def shard_list(number):
+    return f"URL_LIST{number}.csv"
+
+
+def shard_folder(number):
+    return os.path.join(cwd, "Companies_" + str(number))
+
+
+def iter_urls(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if row and row[0].strip():
+                yield row[0].strip()
+
+
+# === PLAN ===
+def load_shard_count():
+    if not os.path.exists(SHARD_PLAN):
+        return None
+    with open(SHARD_PLAN, "r", encoding="utf-8") as f:
+        return json.load(f)["shards"]
+
+
+def save_shard_count(shards):
+    with open(SHARD_PLAN, "w", encoding="utf-8") as f:
+        json.dump({"shards": shards}, f)
+
+
+def plan_shards(shards=None, source=SCHEDULED_URL_LIST):
+    """Stream source into URL_LIST1..N.csv by stable hash; returns the shard count"""
+    if not os.path.exists(source):
+        print(f"❌ {source} not found! Run Level 2 (schedule) first.")
+        return 0
+
+    shards = shards or load_shard_count()
+    if not shards:
+        total = sum(1 for _ in iter_urls(source))
+        if total == 0:
+            print("❌ No URLs found in filtered list!")
+            return 0
+        shards = (total + BATCH_SIZE - 1) // BATCH_SIZE
+    save_shard_count(shards)
+
+    print(f"📦 Planning {shards} hash shards from {source}...")
+    counts = [0] * (shards + 1)
+    files = [open(shard_list(n), "w", encoding="utf-8", newline="") for n in range(1, shards + 1)]
+    try:
+        writers = [None] + [csv.writer(f) for f in files]
+        for url in iter_urls(source):
+            number = shard_for(url, shards)
+            writers[number].writerow([url])
+            counts[number] += 1
+    finally:
+        for f in files:
+            f.close()
+
+    for number in range(1, shards + 1):
+        print(f"✅ {shard_list(number)}: {counts[number]} URLs")
+    print(f"🎉 Shard plan complete: {sum(counts)} URLs in {shards} shards")
+    return shards
+
+
+def rebalance(new_shards, source=SCHEDULED_URL_LIST):
+    """Switch to new_shards; saved pages of moved URLs follow them to their new Companies_{N}.
+    The shards are rebuilt from the scheduled list, so they keep the score order"""
+    old_shards = load_shard_count()
+    if not old_shards:
+        print("❌ No shard plan yet, run 'plan' first.")
+        return
+    if not os.path.exists(source):
+        print(f"❌ {source} not found! Run Level 2 (schedule) first.")
+        return
+
+    moved = pages_moved = 0
+    for url in iter_urls(source):
+        old, new = shard_for(url, old_shards), shard_for(url, new_shards)
+        if old == new:
+            continue
+        moved += 1
+        src = page_path(shard_folder(old), url)
+        if os.path.isfile(src):
+            dst = page_path(shard_folder(new), url)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            os.replace(src, dst)
+            pages_moved += 1
+
+    for number in range(new_shards + 1, old_shards + 1):
+        if os.path.exists(shard_list(number)):
+            os.remove(shard_list(number))
+    plan_shards(new_shards, source)
+    print(f"🔀 Rebalanced {old_shards} -> {new_shards} shards: {moved} URLs moved, {pages_moved} saved pages moved")
+
+
+# === WORKER PLAN ===
+def remaining_work(number):
+    """URLs of a shard without a saved page yet"""
+    if not os.path.exists(shard_list(number)):
+        return 0
+    folder = shard_folder(number)
+    if not os.path.isdir(folder):
+        return sum(1 for _ in iter_urls(shard_list(number)))
+    return sum(1 for url in iter_urls(shard_list(number)) if not os.path.isfile(page_path(folder, url)))
+
+
+def assign_workers(workers):
+    """Longest-remaining-first: give each shard to the least loaded worker"""
+    shards = load_shard_count()
+    if not shards:
+        print("❌ No shard plan yet, run 'plan' first.")
+        return []
+
+    remaining = sorted(((remaining_work(n), n) for n in range(1, shards + 1)), reverse=True)
+    loads = [[0, w + 1, []] for w in range(workers)]
+    for work, number in remaining:
+        if work == 0:
+            continue
+        target = min(loads)
+        target[0] += work
+        target[2].append(number)
+
+    with open(WORKER_PLAN, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["worker", "remaining", "shards"])
+        for work, worker, numbers in loads:
+            writer.writerow([worker, work, " ".join(map(str, numbers))])
+            print(f"👷 Worker {worker}: {work} URLs remaining in shards {numbers}")
+    return loads
+
+
+def main():
+    args = cli_args()
+    command = args[0] if args else "plan"
+    if command == "plan":
+        shards = int(args[1]) if len(args) > 1 else None
+        if shards and load_shard_count() not in (None, shards):
+            print(f"❌ Plan already has {load_shard_count()} shards, use 'rebalance {shards}' to move pages too.")
+            sys.exit(1)
+        plan_shards(shards)
+    elif command == "rebalance" and len(args) > 1:
+        rebalance(int(args[1]))
+    elif command == "workers" and len(args) > 1:
+        assign_workers(int(args[1]))
+    else:
+        print(__doc__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
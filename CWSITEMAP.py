@@ -1,9 +1,18 @@
 import os
 import csv
-import re
 import requests
 from urllib.parse import urljoin
+from CWLAYOUT import page_path
+from CWURL import is_wanted_url
 import time
+from CWPROFILE import profile_stage, timer
+from CWSEEN import SEEN, SeenSet, url_key
+from CWENCODING import ACCEPT_ENCODING, read_requests_body
+from CWBANDWIDTH import METER
+from CWSCHEDULE import sitemap_entries
+from CWDIFF import HARVEST, HARVEST_FAILED
+from CWSORT import iter_csv, unique_rows
+from CWREPLAY import replay_get
 
 # === CONSTANTS ===
 cwd = os.getcwd()
@@ -42,6 +51,10 @@ def get_next_proxy():
     proxy_usage += 1
     return {"http": f"http://{proxy}", "https": f"http://{proxy}"}
 
+def all_proxies():
+    """Every loaded proxy as a requests proxies dict (reroute candidates)"""
+    return [{"http": f"http://{p}", "https": f"http://{p}"} for p in proxies_list]
+
 def reset_proxy_counter():
     global proxy_usage
     proxy_usage = 0
@@ -49,44 +62,31 @@ def reset_proxy_counter():
 # === FETCH FUNCTIONS ===
 def fetch(url, use_proxy=False, timeout=10):
     headers = {
-        'Accept-Encoding': 'gzip',
+        'Accept-Encoding': ACCEPT_ENCODING,
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
     }
     #print(proxy)
+    proxy = None
+    compressed_size = 0
     try:
         if use_proxy and PROXED:
-            proxy = get_next_proxy()
+            proxy = METER.admit(get_next_proxy(), all_proxies())
             print(proxy)
             print(url)
-            if proxy:
-
-                response = requests.get(url, headers=headers, proxies=proxy, timeout=timeout, stream=True)
-                #print(len(response.content))
-                # --- 1️⃣ Check if compressed ---
-                #encoding = response.headers.get("Content-Encoding")
-                #if encoding:
-                #    print(f"Response is compressed with: {encoding}")
-                #else:
-                #    print("Response is not compressed.")
-
-                # --- 2️⃣ Measure compressed size ---
-                # The 'raw' stream contains the compressed data
-                raw_bytes = response.raw.read()
-                compressed_size = len(raw_bytes)
-                print(f"Compressed size: {compressed_size} bytes")
-
-                #print(response.headers['Content-length'])
-                #print(response.headers)
-                #print(len(response.content))
-            else:
-                response = requests.get(url, headers=headers, timeout=timeout)
         else:
-            response = requests.get(url, headers=headers, timeout=timeout)
+            proxy = METER.admit(None)
+        # stream=True keeps the compressed body: we decode it ourselves
+        response = replay_get(url, headers=headers, proxies=proxy, timeout=timeout, stream=True)
         response.raise_for_status()
-        return response.text
+        body, compressed_size = read_requests_body(response)
+        if proxy:
+            print(f"Compressed size: {compressed_size} bytes ({response.headers.get('Content-Encoding', 'identity')})")
+        return body.decode(response.encoding or "utf-8", errors="replace")
     except Exception as e:
         print(f"Fetch failed for {url}: {e}")
         return None
+    finally:
+        METER.record(proxy, compressed_size)
 
 def fetch_with_proxy_retry(url, max_retries=5):
     for _ in range(max_retries):
@@ -103,34 +103,61 @@ def level_1():
         print(f"{SITEMAP_LIST} not found. Level 1 skipped.")
         return
 
-    url_list = []
+    new_count = known = harvested = 0
+    failed = []
     with open(SITEMAP_LIST, "r", encoding="utf-8") as f:
         reader = csv.reader(f)
         sitemap_urls = [row[0].strip() for row in reader if row]
 
     print(f"Level 1: Fetching {len(sitemap_urls)} sitemap URLs...")
 
-    for idx, sitemap_url in enumerate(sitemap_urls, 1):
-        print(f"  [{idx}] Fetching sitemap: {sitemap_url}")
-        html = fetch_with_proxy_retry(sitemap_url) if PROXED else fetch(sitemap_url)
-        if not html:
-            continue
-
-        # Extract <loc> URLs using simple regex
-        locs = re.findall(r'<loc>(https?://[^<]+)</loc>', html, re.IGNORECASE)
-        url_list.extend(locs)
-
-        # Reset proxy counter every PROXI_COUNT requests
-        if PROXED and proxy_usage >= PROXI_COUNT:
-            reset_proxy_counter()
-            print("  Proxy rotation reset.")
-
-    # Save to URL_LIST.csv
-    with open(URL_LIST, "a", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f)
-        for url in url_list:
-            writer.writerow([url])
-    print(f"Level 1 complete. {len(url_list)} URLs saved to {URL_LIST}")
+    with SeenSet(SEEN) as seen, \
+            open(HARVEST, "w", encoding="utf-8", newline="") as harvest_file, \
+            open(URL_LIST, "a", encoding="utf-8", newline="") as url_file:
+        harvest = csv.writer(harvest_file)  # full harvest for CWDIFF
+        writer = csv.writer(url_file)
+        for idx, sitemap_url in enumerate(sitemap_urls, 1):
+            print(f"  [{idx}] Fetching sitemap: {sitemap_url}")
+            with timer("fetch"):
+                html = fetch_with_proxy_retry(sitemap_url) if PROXED else fetch(sitemap_url)
+            if not html:
+                failed.append([sitemap_url])  # CWDIFF must not read its URLs as removed
+                continue
+
+            # Extract <url> entries (loc + priority/changefreq/lastmod) using simple regex
+            with timer("extract"):
+                entries = sitemap_entries(html)
+            harvest.writerows(entries)
+            harvested += len(entries)
+            # Only URLs not harvested by an earlier run go downstream, each once even when the
+            # sitemap repeats it. They are written to URL_LIST.csv before being marked seen,
+            # so an interrupted run loses none of them
+            new_entries, batch_keys = [], set()
+            for row in entries:
+                key = url_key(row[0])
+                if key not in batch_keys and row[0] not in seen:
+                    batch_keys.add(key)
+                    new_entries.append(row)
+            writer.writerows(new_entries)
+            url_file.flush()
+            for row in new_entries:
+                seen.add(row[0])
+            new_count += len(new_entries)
+            known += len(entries) - len(new_entries)
+
+            # Reset proxy counter every PROXI_COUNT requests
+            if PROXED and proxy_usage >= PROXI_COUNT:
+                reset_proxy_counter()
+                print("  Proxy rotation reset.")
+
+    if failed:
+        with open(HARVEST_FAILED, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows(failed)
+        print(f"⚠️  {len(failed)} sitemaps failed -> {HARVEST_FAILED} (the harvest is incomplete)")
+    elif os.path.exists(HARVEST_FAILED):
+        os.remove(HARVEST_FAILED)
+    print(f"Level 1 complete. {new_count} new URLs saved to {URL_LIST} ({known} already seen, "
+          f"{harvested} harvested -> {HARVEST})")
 
 # === LEVEL 2: Filter URL_LIST → Save to FILTERED_URL_LIST.csv ===
 def level_2():
@@ -138,28 +165,21 @@ def level_2():
         print(f"{URL_LIST} not found. Level 2 skipped.")
         return
 
-    filtered = []
-    with open(URL_LIST, "r", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        urls = [row[0].strip() for row in reader if row]
+    print(f"Level 2: Filtering {URL_LIST} (external sort + dedup, see CWSORT)...")
 
-    print(f"Level 2: Filtering {len(urls)} URLs...")
-
-    pattern_include = re.compile(r'-kft|-bt|-zrt', re.IGNORECASE)
-    #pattern_exclude = re.compile(r'-v-a|-f-a', re.IGNORECASE)
-    pattern_exclude = re.compile(r'-xxxxxxxxxxxv-a', re.IGNORECASE)
-    for url in urls:
-        if pattern_include.search(url) and not pattern_exclude.search(url):
-            filtered.append(url)
-
-    # Save to FILTERED_URL_LIST.csv
-    with open(FILTERED_URL_LIST, "a", encoding="utf-8", newline="") as f:
+    kept = 0
+    # URL_LIST.csv only ever grows, so the filtered list is rebuilt from its unique rows
+    # (sitemap metadata columns kept for CWSCHEDULE)
+    with timer("filter"), open(FILTERED_URL_LIST, "w", encoding="utf-8", newline="") as f:
         writer = csv.writer(f)
-        for url in filtered:
-            writer.writerow([url])
-    print(f"Level 2 complete. {len(filtered)} URLs saved to {FILTERED_URL_LIST}")
-
-# === LEVEL 3: Fetch filtered URLs → Save HTML to DATAFOLDER as 1.html, 2.html... ===
+        for row in unique_rows(iter_csv(URL_LIST)):
+            url = row[0]
+            if is_wanted_url(url):  # same company type filter as every engine (CWURL)
+                writer.writerow(row)
+                kept += 1
+    print(f"Level 2 complete. {kept} URLs saved to {FILTERED_URL_LIST}")
+
+# === LEVEL 3: Fetch filtered URLs → Save HTML to DATAFOLDER/ab/cd/<name>_<code>.html (CWLAYOUT) ===
 def level_3():
     if not os.path.exists(FILTERED_URL_LIST):
         print(f"{FILTERED_URL_LIST} not found. Level 3 skipped.")
@@ -172,15 +192,17 @@ def level_3():
     print(f"Level 3: Fetching content for {len(urls)} URLs...")
 
     for idx, url in enumerate(urls, 1):
-        filename = os.path.join(DATAFOLDER, f"{idx}.html")
+        filename = page_path(DATAFOLDER, url)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
         if os.path.exists(filename):
             print(f"  [{idx}] Already exists: {filename}")
             continue
 
         print(f"  [{idx}] Fetching: {url}")
-        html = fetch_with_proxy_retry(url) if PROXED else fetch(url)
+        with timer("fetch"):
+            html = fetch_with_proxy_retry(url) if PROXED else fetch(url)
         if html:
-            with open(filename, "w", encoding="utf-8") as f:
+            with timer("save"), open(filename, "w", encoding="utf-8") as f:
                 f.write(html)
             print(f"    Saved: {filename}")
         else:
@@ -203,8 +225,8 @@ if __name__ == "__main__":
     print("=== Web Scraper with Proxy Support ===\n")
 
     # Run levels one by one (can be commented out individually)
-    level_1()
-    #level_2()
-    #level_3()
+    profile_stage("sitemap_level_1", level_1)
+    #profile_stage("sitemap_level_2", level_2)
+    #profile_stage("sitemap_level_3", level_3)
 
     print("\nAll levels completed.")
\ No newline at end of file
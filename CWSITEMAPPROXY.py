@@ -1,8 +1,12 @@
 import os
 import csv
 import re
-import requests
 from urllib.parse import urljoin
+from CWLAYOUT import page_path
+from CWURL import is_wanted_url
+from CWENCODING import read_requests_body
+from CWBANDWIDTH import METER
+from CWREPLAY import replay_get
 import time
 
 # === CONSTANTS ===
@@ -47,6 +51,18 @@ def reset_proxy_counter():
     proxy_usage = 0
 
 # === FETCH FUNCTIONS ===
+def _get(url, headers, proxy=None, timeout=10):
+    """Metered GET (CWBANDWIDTH) through proxy, None = direct; returns the page text"""
+    proxy = METER.admit(proxy)
+    wire_size = 0
+    try:
+        response = replay_get(url, headers=headers, proxies=proxy, timeout=timeout, stream=True)
+        response.raise_for_status()
+        body, wire_size = read_requests_body(response)
+        return body.decode(response.encoding or "utf-8", errors="replace")
+    finally:
+        METER.record(proxy, wire_size)
+
 def fetch(url, use_proxy=False, timeout=10):
     headers = {
         'Accept-Encoding': 'gzip',
@@ -64,7 +80,7 @@ def fetch(url, use_proxy=False, timeout=10):
             print(url)
             if proxy:
 
-                response = requests.get(url, headers=headers, proxies=proxy, timeout=timeout, stream=True)
+                return _get(url, headers, proxy, timeout)
                 #print(len(response.content))
                 # --- 1️⃣ Check if compressed ---
                 #encoding = response.headers.get("Content-Encoding")
@@ -83,11 +99,9 @@ def fetch(url, use_proxy=False, timeout=10):
                 #print(response.headers)
                 #print(len(response.content))
             else:
-                response = requests.get(url, headers=headers, timeout=timeout)
+                return _get(url, headers, timeout=timeout)
         else:
-            response = requests.get(url, headers=headers, timeout=timeout)
-        response.raise_for_status()
-        return response.text
+            return _get(url, headers, timeout=timeout)
     except Exception as e:
         print(f"Fetch failed for {url}: {e}")
         return None
@@ -102,7 +116,7 @@ def fetch_with_proxy_retry(url, proxy,timeout=10):
     print(proxy)
     for _ in range(max_retries):
         #html = fetch(url, use_proxy=True, timeout=10)
-        html = requests.get(url, headers=headers, proxies=proxy, timeout=timeout)
+        html = _get(url, headers, proxy, timeout)
 
         if html is not None:
             return html
@@ -133,7 +147,7 @@ def level_1():
         #print(html.text)
         # Extract <loc> URLs using simple regex
 
-        locs = re.findall(r'<loc>(https?://[^<]+)</loc>', html.text, re.IGNORECASE)
+        locs = re.findall(r'<loc>(https?://[^<]+)</loc>', html, re.IGNORECASE)
         url_list.extend(locs)
         print(f"    Found {len(locs)} URLs in sitemap.")
         print(locs)
@@ -156,19 +170,14 @@ def level_2():
         print(f"{URL_LIST} not found. Level 2 skipped.")
         return
 
-    filtered = []
     with open(URL_LIST, "r", encoding="utf-8") as f:
         reader = csv.reader(f)
         urls = [row[0].strip() for row in reader if row]
 
     print(f"Level 2: Filtering {len(urls)} URLs...")
 
-    pattern_include = re.compile(r'-kft|-bt|-zrt', re.IGNORECASE)
-    #pattern_exclude = re.compile(r'-v-a|-f-a', re.IGNORECASE)
-    pattern_exclude = re.compile(r'-xxxxxxxxxxxv-a', re.IGNORECASE)
-    for url in urls:
-        if pattern_include.search(url) and not pattern_exclude.search(url):
-            filtered.append(url)
+    # Same company type filter as every engine (CWURL, matched on the slug)
+    filtered = [url for url in urls if is_wanted_url(url)]
 
     # Save to FILTERED_URL_LIST.csv
     with open(FILTERED_URL_LIST, "a", encoding="utf-8", newline="") as f:
@@ -177,7 +186,7 @@ def level_2():
             writer.writerow([url])
     print(f"Level 2 complete. {len(filtered)} URLs saved to {FILTERED_URL_LIST}")
 
-# === LEVEL 3: Fetch filtered URLs → Save HTML to DATAFOLDER as 1.html, 2.html... ===
+# === LEVEL 3: Fetch filtered URLs → Save HTML to DATAFOLDER/ab/cd/<name>_<code>.html (CWLAYOUT) ===
 def level_3():
     if not os.path.exists(FILTERED_URL_LIST):
         print(f"{FILTERED_URL_LIST} not found. Level 3 skipped.")
@@ -190,7 +199,8 @@ def level_3():
     print(f"Level 3: Fetching content for {len(urls)} URLs...")
 
     for idx, url in enumerate(urls, 1):
-        filename = os.path.join(DATAFOLDER, f"{idx}.html")
+        filename = page_path(DATAFOLDER, url)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
         if os.path.exists(filename):
             print(f"  [{idx}] Already exists: {filename}")
             continue
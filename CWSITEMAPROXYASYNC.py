@@ -1,190 +1,431 @@
 import os
-import re
 import csv
 import aiohttp
 import asyncio
 import aiofiles
-from urllib.parse import urlparse
+import time
+from collections import deque
 from typing import List
+from CWPROFILE import profile_stage, timer
+from CWSHARD import plan_shards
+from CWSCHEDULE import SCHEDULED_URL_LIST, record_failures, record_successes, schedule
+from CWVALIDATE import STREAM_CHUNK, HeadCheck, validate_page
+from CWENCODING import ACCEPT_ENCODING, make_decoder
+from CWFRONTIER import load_frontier
+from CWSEEN import FETCHED, SeenSet
+from CWBANDWIDTH import METER
+from CWPROXYPOOL import POOL, worker_base
+from CWLAYOUT import page_path
+from CWURL import is_wanted_url, url_slug
+from CWSORT import iter_csv, unique_rows
+from CWREPLAY import replay_session_get
+from CWTRACE import TRACE, TRACER, trace_config
+from CWOFFLOAD import OFFLOAD
 
 # === CONSTANTS ===
 cwd = os.getcwd()
 URL_LIST = "URL_LIST.csv"
 FILTERED_URL_LIST = "FILTERED_URL_LIST.csv"
-PROXY = "36fda789ac44aa4cc19e:b966e984e5922790@gw.dataimpulse.com:10012"
+PROXY = "36fda789ac44aa4cc19e:b966e984e5922790@gw.dataimpulse.com:10012"  # single endpoint (HTTP/2 engine)
+USE_PROXY_POOL = True  # rotate over sticky gateway ports (CWPROXYPOOL), one lane per port
 DATAFOLDER = os.path.join(cwd, "Companies")
-CONCURRENT_WORKERS = 10
+CONCURRENT_WORKERS = 10  # requests in flight when going direct (USE_PROXY_POOL = False)
+PROXY_LANES = 10  # proxies used at once; each has its own connector, pool and breaker
+PER_PROXY_CONCURRENCY = 4  # requests in flight per proxy
 TIMEOUT = 30
 BATCH_SIZE = 10000  # URLs per sub-list
+OFFLOAD_CPU = True  # decode + validate bodies in a process pool (CWOFFLOAD), not on the event loop
+
+# Circuit breaker: pause when too many responses are blocked
+BREAKER_WINDOW = 50  # recent responses considered
+BREAKER_MIN_SAMPLES = 20
+BREAKER_THRESHOLD = 0.3  # blocked share that trips the breaker
+BREAKER_COOLDOWN = 60  # seconds before the first probe
+BREAKER_MAX_COOLDOWN = 15 * 60
+BLOCK_STATUSES = (403, 429)
 
 # === PROXY SETUP ===
 proxy_url = f"http://{PROXY}"
 
 
+# === CIRCUIT BREAKER ===
+class CircuitBreaker:
+    """Opens when the blocked share of recent responses crosses the threshold,
+    then lets a single probe through after the cooldown before resuming"""
+
+    def __init__(self, name="all", window=BREAKER_WINDOW, threshold=BREAKER_THRESHOLD,
+                 min_samples=BREAKER_MIN_SAMPLES, cooldown=BREAKER_COOLDOWN):
+        self.name = name
+        self.results = deque(maxlen=window)
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.open_until = 0.0
+        self.probing = False
+        self.trips = 0
+
+    async def wait(self):
+        """Block while open; returns True when the caller is the half-open probe"""
+        while self.state != "closed":
+            now = time.monotonic()
+            if now >= self.open_until and not self.probing:
+                self.state = "half-open"
+                self.probing = True
+                print(f"🔎 Circuit {self.name}: probing")
+                return True
+            await asyncio.sleep(max(self.open_until - now, 0.5))
+        return False
+
+    def record(self, blocked, probe=False):
+        """blocked: True/False for a verdict, None for a neutral failure (timeout, network)"""
+        if probe:
+            self.probing = False
+            if blocked is None:  # no verdict: stay half-open, the next waiter probes again
+                return
+            if blocked is False:
+                self.state = "closed"
+                self.cooldown = self.base_cooldown
+                self.results.clear()
+                print(f"✅ Circuit {self.name}: closed, resuming")
+            else:
+                self._trip(min(self.cooldown * 2, BREAKER_MAX_COOLDOWN))
+            return
+        if blocked is None or self.state != "closed":
+            return
+        self.results.append(blocked)
+        if len(self.results) >= self.min_samples:
+            rate = sum(self.results) / len(self.results)
+            if rate >= self.threshold:
+                print(f"🛑 Circuit {self.name}: {rate:.0%} of last {len(self.results)} responses blocked")
+                self._trip(self.cooldown)
+
+    def _trip(self, cooldown):
+        self.state = "open"
+        self.cooldown = cooldown
+        self.open_until = time.monotonic() + cooldown
+        self.trips += 1
+        print(f"⏸️  Circuit {self.name}: pausing {cooldown}s")
+
+
+BREAKER = CircuitBreaker()
+
+
 # === URL PARSING ===
 def parse_url_tree(url):
     """Extract URL tree components from companywall.hu URLs"""
-    parsed = urlparse(url)
-    path_parts = parsed.path.strip('/').split('/')
+    return url_slug(url)  # e.g., "horizontplast-kft"; works for encoded and plain 'vállalat'
+
 
-    if len(path_parts) >= 3 and path_parts[0] == 'vállalat':
-        company_part = path_parts[1]  # e.g., "horizontplast-kft"
-        return company_part
-    return None
+def html_path(url, folder=None):
+    """Target file for a company page: DATAFOLDER/ab/cd/<company-name>_<code>.html (CWLAYOUT)"""
+    return page_path(folder or DATAFOLDER, url)
 
 
 # === LEVEL 1 - FILTER URLS ===
-def filter_urls():
-    """Level 1: Filter URLs based on company type patterns"""
-    if not os.path.exists(URL_LIST):
-        print(f"❌ {URL_LIST} not found!")
+def filter_urls(source=URL_LIST, target=FILTERED_URL_LIST):
+    """Level 1: Filter URLs based on company type patterns (source: URL_LIST or a CWDIFF delta,
+    which goes to its own target so FILTERED_URL_LIST keeps the full list)"""
+    if not os.path.exists(source):
+        print(f"❌ {source} not found!")
         return
 
-    filtered = []
-    with open(URL_LIST, "r", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        urls = [row[0].strip() for row in reader if row]
-
-    print(f"Level 2: Filtering {len(urls)} URLs...")
+    print(f"Level 1: Filtering {source} (external sort + dedup, see CWSORT)...")
 
-    pattern_include = re.compile(r'-kft|-bt|-zrt', re.IGNORECASE)
-    #pattern_include = re.compile(r'horizon', re.IGNORECASE)
+    counts = {"rows": 0}
 
-    # pattern_exclude = re.compile(r'-v-a|-f-a', re.IGNORECASE)
-    pattern_exclude = re.compile(r'-xxxxxxxxxxxv-a', re.IGNORECASE)
-    for url in urls:
-        if pattern_include.search(url) and not pattern_exclude.search(url):
-            filtered.append(url)
+    def counted(rows):
+        for row in rows:
+            counts["rows"] += 1
+            yield row
 
-    # Save to FILTERED_URL_LIST.csv
-    with open(FILTERED_URL_LIST, "w", encoding="utf-8", newline="") as f:
+    unique = kept = already_fetched = 0
+    tmp = target + ".tmp"
+    with timer("filter"), SeenSet(FETCHED) as fetched, open(tmp, "w", encoding="utf-8", newline="") as f:
+        # Sitemap metadata columns are kept for CWSCHEDULE
         writer = csv.writer(f)
-        for url in filtered:
-            writer.writerow([url])
-#    print(f"Level 2 complete. {len(filtered)} URLs saved to {FILTERED_URL_LIST}")
-
-    print(f"✅ Level 1 complete: {len(filtered)} URLs filtered -> {FILTERED_URL_LIST}")
+        for row in unique_rows(counted(iter_csv(source))):
+            unique += 1
+            url = row[0]
+            if not is_wanted_url(url):
+                continue
+            writer.writerow(row)
+            kept += 1
+            already_fetched += url in fetched
+    os.replace(tmp, target)
 
+    print(f"✅ Level 1 complete: {kept} URLs filtered -> {target} "
+          f"({counts['rows'] - unique} duplicates dropped, {already_fetched} already fetched)")
 
 
 # === LEVEL 2 - CREATE SUB LISTS ===
 def create_sub_lists():
-    """Level 2: Divide filtered URLs into 10,000 URL parts"""
-    if not os.path.exists(FILTERED_URL_LIST):
-        print(f"❌ {FILTERED_URL_LIST} not found! Run Level 1 first.")
+    """Level 2: Order filtered URLs by score (see CWSCHEDULE), then divide them into
+    stable hash shards (see CWSHARD); each shard keeps the scheduled order"""
+    if not schedule(FILTERED_URL_LIST, SCHEDULED_URL_LIST):
         return 0
+    return plan_shards(source=SCHEDULED_URL_LIST)
 
-    # Read filtered URLs
-    with open(FILTERED_URL_LIST, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        urls = [row[0] for row in reader if row]
 
-    total_urls = len(urls)
-    if total_urls == 0:
-        print("❌ No URLs found in filtered list!")
-        return 0
+# === LEVEL 3 - ASYNC CONTENT FETCHING ===
+def new_session(connector, **kwargs):
+    """ClientSession that keeps bodies compressed: fetch_single() decodes them itself.
+    Under --trace it carries the CWTRACE phase hooks"""
+    if TRACE:
+        kwargs.setdefault("trace_configs", [trace_config()])
+    return aiohttp.ClientSession(connector=connector, auto_decompress=False, **kwargs)
+
+
+async def fetch_single(session: aiohttp.ClientSession, url: str, semaphore: asyncio.Semaphore,
+                       breaker: CircuitBreaker = None, proxy: str = None, worker: int = None):
+    """Fetch single URL with semaphore control; validates the page, feeds the circuit breaker
+    and accounts the wire bytes to the proxy. With a worker slot and no explicit proxy the
+    request goes through that slot's sticky gateway port (CWPROXYPOOL).
+    With OFFLOAD_CPU only the head is decoded here; the body is decoded and validated in the
+    CWOFFLOAD process pool after the semaphore slot is given back"""
+    breaker = breaker or BREAKER
+    pooled = proxy is None and worker is not None and USE_PROXY_POOL
+    probe = await breaker.wait()  # before the slot: an open breaker holds no fetch slot
+    holding = False
+    trace = None
+    blocked = None
+    healthy = None  # proxy verdict for CWPROXYPOOL: True only for a valid page
+    wire_size = 0
+    try:
+        await semaphore.acquire()
+        holding = True
+        if pooled:  # looked up after the wait: the slot may have been re-pinned meanwhile
+            proxy = POOL.for_worker(worker)
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Accept-Encoding': ACCEPT_ENCODING
+        }
 
-    # Calculate number of sub-lists needed
-    num_sublists = (total_urls + BATCH_SIZE - 1) // BATCH_SIZE  # Ceiling division
+        proxy = await METER.admit_async(proxy)
+        trace = TRACER.begin(url, proxy)
+        with timer("fetch"):
+            async with replay_session_get(session, url, headers=headers, proxy=proxy,
+                                          timeout=aiohttp.ClientTimeout(total=TIMEOUT),
+                                          trace_request_ctx=trace) as response:
+                if response.status != 200:
+                    blocked = response.status in BLOCK_STATUSES
+                    if blocked or response.status >= 500:
+                        healthy = False  # a 404 says nothing about the proxy
+                    return url, None, f"HTTP {response.status}"
+                charset = response.charset or "utf-8"
+                encoding = None if session.auto_decompress else response.headers.get("Content-Encoding")
+                decoder = make_decoder(encoding)
+                head = HeadCheck(url)
+                parts = []  # wire chunks with OFFLOAD_CPU, decoded chunks otherwise
+                async for chunk in response.content.iter_chunked(STREAM_CHUNK):
+                    wire_size += len(chunk)
+                    if OFFLOAD_CPU:
+                        parts.append(chunk)
+                        if head.done:
+                            continue
+                        data = decoder.decompress(chunk)
+                    else:
+                        data = decoder.decompress(chunk)
+                        parts.append(data)
+                    if head.feed(data):
+                        response.close()  # drop the connection, skip the rest of the body
+                        break
+                else:
+                    if not OFFLOAD_CPU:
+                        parts.append(decoder.flush())
+        semaphore.release()  # the download is done: CPU work does not hold a fetch slot
+        holding = False
+        if trace is not None:
+            trace.mark("body_end")
+        if head.reason:
+            blocked = True
+            healthy = False
+            return url, None, f"Invalid page: {head.reason}"
+
+        body = b"".join(parts)
+        with timer("validate"), TRACER.phase(url, "validate"):
+            if OFFLOAD_CPU:
+                reason, html = await OFFLOAD.check(url, body, encoding, charset, wire_size)
+            else:
+                reason, _ = validate_page(url, body, wire_size, encoding)
+                html = None if reason else body.decode(charset, errors="replace")
+        blocked = reason is not None
+        healthy = not blocked
+        if reason:
+            return url, None, f"Invalid page: {reason}"
+        return url, html, None
+    except asyncio.TimeoutError:
+        healthy = False
+        return url, None, "Timeout"
+    except Exception as e:
+        healthy = False
+        return url, None, str(e)
+    finally:
+        if holding:
+            semaphore.release()
+        if trace is not None:
+            trace.wire_bytes = wire_size
+        breaker.record(blocked, probe)
+        await METER.record_async(proxy, wire_size)
+        if pooled and healthy is not None:
+            POOL.report(worker, healthy)
+
+
+# === PROXY LANES ===
+class LaneSlots(asyncio.Semaphore):
+    """Fetch slots of a lane; inflight counts requests holding or waiting for one. It drops
+    when fetch_single() gives the slot back, not when a CWOFFLOAD verdict arrives"""
+
+    def __init__(self, value):
+        super().__init__(value)
+        self.inflight = 0
+
+    async def acquire(self):
+        self.inflight += 1
+        try:
+            return await super().acquire()
+        except BaseException:
+            self.inflight -= 1
+            raise
 
-    print(f"📊 Total URLs: {total_urls}")
-    print(f"📦 Creating {num_sublists} sub-lists with {BATCH_SIZE} URLs each...")
+    def release(self):
+        self.inflight -= 1
+        super().release()
 
-    # Create sub-lists
-    sublist_count = 0
-    for i in range(0, total_urls, BATCH_SIZE):
-        sublist_count += 1
-        batch = urls[i:i + BATCH_SIZE]
-        sublist_filename = f"URL_LIST{sublist_count}.csv"
 
-        with open(sublist_filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            for url in batch:
-                writer.writerow([url])
+class ProxyLane:
+    """One proxy with its own connector (connection pool), concurrency limit and circuit
+    breaker, so a blocked or slow exit IP only holds up its own requests"""
 
-        print(f"✅ Created {sublist_filename} with {len(batch)} URLs")
+    def __init__(self, worker, concurrency=PER_PROXY_CONCURRENCY, pooled=USE_PROXY_POOL):
+        self.worker = worker if pooled else None  # CWPROXYPOOL worker slot -> sticky gateway port
+        self.concurrency = concurrency
+        self.connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency)
+        self.session = new_session(self.connector)
+        self.semaphore = LaneSlots(concurrency)
+        self.breaker = CircuitBreaker(name=f"lane {worker}")
 
-    print(f"🎉 Level 2 complete: Created {sublist_count} sub-lists")
-    return sublist_count
+    @property
+    def inflight(self):
+        return self.semaphore.inflight
 
+    async def fetch(self, url):
+        return await fetch_single(self.session, url, self.semaphore, self.breaker, worker=self.worker)
 
-# === LEVEL 3 - ASYNC CONTENT FETCHING ===
-async def fetch_single(session: aiohttp.ClientSession, url: str, semaphore: asyncio.Semaphore):
-    """Fetch single URL with semaphore control"""
-    async with semaphore:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Accept-Encoding': 'gzip'
-        }
+    async def close(self):
+        await self.session.close()
 
-        try:
-            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=TIMEOUT)) as response:
-                if response.status == 200:
-                    html_content = await response.text()
-                    return url, html_content, None
-                else:
-                    return url, None, f"HTTP {response.status}"
-        except asyncio.TimeoutError:
-            return url, None, "Timeout"
-        except Exception as e:
-            return url, None, str(e)
 
+class LanePool:
+    """Spreads requests over PROXY_LANES proxies: the least busy lane whose breaker is
+    closed gets the next URL, so throughput grows with the number of proxies"""
+
+    def __init__(self, lanes=None, concurrency=None, identity=0):
+        """identity (shard number, CWCOORD worker name) picks this process's block of
+        CWPROXYPOOL worker ids, so parallel processes use different gateway ports"""
+        if USE_PROXY_POOL:
+            count, concurrency = lanes or PROXY_LANES, concurrency or PER_PROXY_CONCURRENCY
+        else:  # direct: one exit IP, one lane
+            count, concurrency = 1, concurrency or CONCURRENT_WORKERS
+        base = worker_base(identity, count)
+        self.lanes = [ProxyLane(worker, concurrency) for worker in range(base, base + count)]
+
+    @property
+    def capacity(self):
+        return sum(lane.concurrency for lane in self.lanes)
+
+    def pick(self):
+        closed = [lane for lane in self.lanes if lane.breaker.state == "closed"]
+        return min(closed or self.lanes, key=lambda lane: lane.inflight)
+
+    async def fetch(self, url):
+        return await self.pick().fetch(url)
+
+    async def close(self):
+        await asyncio.gather(*(lane.close() for lane in self.lanes))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
 
-async def save_html_content(url_tree: str, html_content: str):
-    """Save HTML content to file asynchronously"""
+
+async def save_html_content(url: str, html_content: str, replace: bool = False, folder: str = None):
+    """Save HTML content to file asynchronously; replace=True overwrites a saved page,
+    folder replaces DATAFOLDER (e.g. a Companies_{N} shard folder)"""
     try:
-        folder_code = url_tree[:2].upper()
-        filename = f"{url_tree}.html"
-        folder_path = os.path.join(DATAFOLDER, folder_code)
+        file_path = html_path(url, folder)
 
         # Create folder if needed
-        os.makedirs(folder_path, exist_ok=True)
-        file_path = os.path.join(folder_path, filename)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
         # Skip if already exists
-        if os.path.exists(file_path):
+        if not replace and os.path.exists(file_path):
             return "exists"
 
-        async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
-            await f.write(html_content)
+        with timer("save"):
+            async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
+                await f.write(html_content)
         return "saved"
     except Exception as e:
         return f"error: {str(e)}"
 
 
-async def process_url_batch(session: aiohttp.ClientSession, batch: List[str], semaphore: asyncio.Semaphore,
-                            batch_num: int):
-    """Process a batch of URLs concurrently"""
+async def store_result(result, fetched: SeenSet = None, replace: bool = False, folder: str = None):
+    """Save a fetch_single() result; returns "saved", "exists" or an error string"""
+    url, html_content, error = result
+    if not parse_url_tree(url):
+        save_result = "error: unparsable url"
+    elif not html_content:
+        save_result = f"error: {error}"
+    else:
+        with TRACER.phase(url, "write"):
+            save_result = await save_html_content(url, html_content, replace, folder)
+        if fetched is not None and save_result in ("saved", "exists"):
+            fetched.add(url)
+    TRACER.finish(url, save_result)
+    return save_result
+
+
+async def process_url_batch(lanes: LanePool, batch: List[str], batch_num: int, fetched: SeenSet = None,
+                            refetch: bool = False, folder: str = None):
+    """Process a batch of URLs concurrently over the proxy lanes; URLs in the fetched set are
+    not requested again unless refetch=True, which also replaces their saved pages"""
     tasks = []
+    exists_count = 0
     for url in batch:
-        task = fetch_single(session, url, semaphore)
+        if fetched is not None and not refetch and url in fetched:
+            exists_count += 1
+            continue
+        task = lanes.fetch(url)
         tasks.append(task)
 
-    print(f"🔄 Processing batch {batch_num} with {len(batch)} URLs...")
+    print(f"🔄 Processing batch {batch_num} with {len(tasks)} URLs ({exists_count} already fetched)...")
     results = await asyncio.gather(*tasks, return_exceptions=True)
 
     success_count = 0
     error_count = 0
-    exists_count = 0
+    failed, succeeded = [], []
 
     for result in results:
         if isinstance(result, Exception):
             error_count += 1
             continue
 
-        url, html_content, error = result
-        url_tree = parse_url_tree(url)
-
-        if html_content and url_tree:
-            save_result = await save_html_content(url_tree, html_content)
-            if save_result == "saved":
-                success_count += 1
-            elif save_result == "exists":
-                exists_count += 1
-            else:
-                error_count += 1
+        save_result = await store_result(result, fetched, refetch, folder)
+        if save_result == "saved":
+            success_count += 1
+            succeeded.append(result[0])
+        elif save_result == "exists":
+            exists_count += 1
+            succeeded.append(result[0])
         else:
             error_count += 1
+            failed.append(result[0])
+    record_failures(failed)  # the scheduler moves repeatedly failing URLs back
+    record_successes(succeeded)  # ... until they are fetched again
 
     print(f"✅ Batch {batch_num}: {success_count} saved, {exists_count} existed, {error_count} errors")
     return success_count, exists_count, error_count
@@ -198,28 +439,33 @@ async def fetch_sublist_async(sublist_number: int):
         print(f"❌ {sublist_filename} not found!")
         return 0, 0, 0
 
-    # Read URLs from sub-list
-    with open(sublist_filename, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        urls = [row[0] for row in reader if row]
+    # Read URLs from sub-list (compact frontier, cached next to the csv)
+    urls = load_frontier(sublist_filename)
 
     print(f"📥 Starting async fetch for {sublist_filename} ({len(urls)} URLs)...")
+    total_success, total_exists, total_errors = await fetch_urls_async(urls, identity=sublist_number)
+
+    print(f"🎉 {sublist_filename} completed: {total_success} saved, {total_exists} existed, {total_errors} errors")
+    return total_success, total_exists, total_errors
 
-    connector = aiohttp.TCPConnector(limit=CONCURRENT_WORKERS, limit_per_host=CONCURRENT_WORKERS)
-    semaphore = asyncio.Semaphore(CONCURRENT_WORKERS)
 
+async def fetch_urls_async(urls: List[str], refetch: bool = False, identity=0, folder: str = None):
+    """Fetch and save a list of URLs (or a Frontier); returns (saved, existed, errors).
+    refetch=True ignores the fetched set and replaces saved pages (CWVERIFY quarantine, CWDIFF
+    lastmod changes); identity is the process's shard number or worker name (its proxy
+    lanes, see LanePool); folder saves somewhere else than DATAFOLDER"""
     total_success = 0
     total_exists = 0
     total_errors = 0
 
-    async with aiohttp.ClientSession(connector=connector) as session:
+    async with LanePool(identity=identity) as lanes, SeenSet(FETCHED) as fetched:
         # Process in smaller batches to avoid memory issues
         processing_batch_size = 500
         batch_num = 1
 
         for i in range(0, len(urls), processing_batch_size):
             batch = urls[i:i + processing_batch_size]
-            success, exists, errors = await process_url_batch(session, batch, semaphore, batch_num)
+            success, exists, errors = await process_url_batch(lanes, batch, batch_num, fetched, refetch, folder)
             total_success += success
             total_exists += exists
             total_errors += errors
@@ -228,7 +474,6 @@ async def fetch_sublist_async(sublist_number: int):
             # Small delay between batches
             await asyncio.sleep(1)
 
-    print(f"🎉 {sublist_filename} completed: {total_success} saved, {total_exists} existed, {total_errors} errors")
     return total_success, total_exists, total_errors
 
 
@@ -262,7 +507,8 @@ def run_async_fetch():
             if os.name == 'nt':
                 asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
-            success, exists, errors = asyncio.run(fetch_sublist_async(sublist_num))
+            success, exists, errors = profile_stage(f"async_fetch_{sublist_num}", asyncio.run,
+                                                    fetch_sublist_async(sublist_num))
             print(f"\n📊 Sub-list {sublist_num} Summary: {success} saved, {exists} existed, {errors} errors")
 
         except ValueError:
@@ -285,7 +531,8 @@ def run_async_fetch():
                 if os.name == 'nt':
                     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
-                success, exists, errors = asyncio.run(fetch_sublist_async(i))
+                success, exists, errors = profile_stage(f"async_fetch_{i}", asyncio.run,
+                                                        fetch_sublist_async(i))
                 total_success += success
                 total_exists += exists
                 total_errors += errors
@@ -305,14 +552,17 @@ def main():
     """Main function with 3-level execution"""
     print("🚀 CWSITEMAPROXY - 3-Level Web Scraping Tool")
     print("=" * 50)
-    print(f"⚡ Concurrent workers: {CONCURRENT_WORKERS}")
+    if USE_PROXY_POOL:
+        print(f"⚡ Proxy lanes: {PROXY_LANES} x {PER_PROXY_CONCURRENCY} concurrent requests")
+    else:
+        print(f"⚡ Concurrent workers: {CONCURRENT_WORKERS} (direct)")
     print(f"📦 Batch size: {BATCH_SIZE} URLs per sub-list")
     print("=" * 50)
 
     while True:
         print("\nSelect operation:")
         print("1. Level 1 - Filter URLs")
-        print("2. Level 2 - Divide into 10,000 URL parts")
+        print("2. Level 2 - Divide into ~10,000 URL hash shards")
         print("3. Level 3 - Fetch Content (Async)")
         print("4. Exit")
 
@@ -320,14 +570,14 @@ def main():
 
         if choice == '1':
             print("\n🎯 Running Level 1 - URL Filtering...")
-            filtered_count = filter_urls()
+            filtered_count = profile_stage("async_filter_urls", filter_urls)
             if filtered_count:
                 estimated_sublists = (filtered_count + BATCH_SIZE - 1) // BATCH_SIZE
                 print(f"📈 Estimated sub-lists: {estimated_sublists}")
 
         elif choice == '2':
             print("\n🎯 Running Level 2 - Creating Sub-lists...")
-            sublist_count = create_sub_lists()
+            sublist_count = profile_stage("async_create_sub_lists", create_sub_lists)
             if sublist_count:
                 print(f"📈 Ready for Level 3: {sublist_count} sub-lists created")
 
@@ -1,9 +1,11 @@
 import os
-import re
 import csv
-import requests
 import sys
-from urllib.parse import urlparse
+from CWLAYOUT import page_path
+from CWURL import is_wanted_url, url_slug
+from CWENCODING import read_requests_body
+from CWBANDWIDTH import METER
+from CWREPLAY import replay_get
 
 # === CONSTANTS ===
 print(sys.argv)
@@ -28,26 +30,24 @@ def fetch(url):
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
         'Accept-Encoding': 'gzip'
     }
+    proxy = METER.admit(proxy_dict)
+    wire_size = 0
     try:
-        response = requests.get(url, headers=headers, proxies=proxy_dict, timeout=30)
+        response = replay_get(url, headers=headers, proxies=proxy, timeout=30, stream=True)
         response.raise_for_status()
-        return response.text
+        body, wire_size = read_requests_body(response)
+        return body.decode(response.encoding or "utf-8", errors="replace")
     except Exception as e:
         print(f"Error fetching {url}: {e}")
         return None
+    finally:
+        METER.record(proxy, wire_size)
 
 
 # === URL PARSING ===
 def parse_url_tree(url):
     """Extract URL tree components from companywall.hu URLs"""
-    parsed = urlparse(url)
-    path_parts = parsed.path.strip('/').split('/')
-    #print(path_parts)
-    if len(path_parts) >= 2 :
-        company_part = path_parts[1]  # e.g., "horizontplast-kft"
-        #print(company_part)
-        return company_part
-    return None
+    return url_slug(url)  # e.g., "horizontplast-kft"
 
 
 def filter_urls():
@@ -56,21 +56,14 @@ def filter_urls():
         print(f"❌ {URL_LIST} not found!")
         return
 
-    filtered = []
     with open(URL_LIST, "r", encoding="utf-8") as f:
         reader = csv.reader(f)
         urls = [row[0].strip() for row in reader if row]
 
     print(f"Level 2: Filtering {len(urls)} URLs...")
 
-    pattern_include = re.compile(r'-kft|-bt|-zrt', re.IGNORECASE)
-    #pattern_include = re.compile(r'horizon', re.IGNORECASE)
-
-    # pattern_exclude = re.compile(r'-v-a|-f-a', re.IGNORECASE)
-    pattern_exclude = re.compile(r'-xxxxxxxxxxxv-a', re.IGNORECASE)
-    for url in urls:
-        if pattern_include.search(url) and not pattern_exclude.search(url):
-            filtered.append(url)
+    # Same company type filter as every engine (CWURL, matched on the slug)
+    filtered = [url for url in urls if is_wanted_url(url)]
 
     # Save to FILTERED_URL_LIST.csv
     with open(FILTERED_URL_LIST, "a", encoding="utf-8", newline="") as f:
@@ -103,14 +96,12 @@ def fetch_content():
         if not url_tree:
             continue
 
-        # Generate filename and folder
-        folder_code = url_tree[:2].upper()
-        filename = f"{url_tree}.html"
-        folder_path = os.path.join(DATAFOLDER, folder_code)
+        # Generate filename and folder (hashed layout, see CWLAYOUT)
+        file_path = page_path(DATAFOLDER, url)
+        filename = os.path.basename(file_path)
 
         # Create folder if needed
-        os.makedirs(folder_path, exist_ok=True)
-        file_path = os.path.join(folder_path, filename)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
         # Skip if already exists
         if os.path.exists(file_path):
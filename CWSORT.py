@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+CW external sort
+- Rows are cut into RUN_SIZE chunks, each chunk is sorted in memory and
+  spilled to a run file, and the runs are merged with a heap (heapq.merge)
+- Memory stays at one chunk however long the input is
+- Run files carry the sort key as their first column, so keys are computed
+  once per row
+- unique_rows() drops repeated keys while merging (first occurrence wins);
+  the default key is the company code, so spelling variants of one company
+  URL count as duplicates
+- Used before filtering (filter_urls, level_2) and by CWSCHEDULE / CWDIFF
+
+Usage:
+  python CWSORT.py unique URL_LIST.csv [TARGET]   # dedupe (in place without TARGET)
+  python CWSORT.py sort URL_LIST.csv [TARGET]     # sort by company key, keep duplicates
+"""
+
+import os
+import csv
+import sys
+import heapq
+import tempfile
+from CWPROFILE import cli_args, profile_stage, timer
+from CWURL import company_key, normalize_url
+
+# === CONSTANTS ===
+RUN_SIZE = 500_000  # rows sorted in memory at a time
+TEMP_FOLDER = "."  # run files go next to the data, not to a small /tmp
+
+
+def _spill(chunk, folder, number):
+    chunk.sort(key=lambda item: item[0])
+    path = os.path.join(folder, f"run{number:04d}.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        for key, row in chunk:
+            writer.writerow([key] + row)
+    return path
+
+
+def _read_run(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            yield row[0], row[1:]
+
+
+def sorted_rows(rows, key, run_size=RUN_SIZE, folder=TEMP_FOLDER):
+    """Yield (key, row) for rows (lists of str) in key order; key(row) must return a str"""
+    with tempfile.TemporaryDirectory(prefix="cwsort_", dir=folder) as tmp:
+        runs, chunk = [], []
+        for row in rows:
+            chunk.append((key(row), row))
+            if len(chunk) >= run_size:
+                runs.append(_spill(chunk, tmp, len(runs)))
+                chunk = []
+        if len(runs) == 0:  # fits in memory: no run files at all
+            chunk.sort(key=lambda item: item[0])
+            yield from chunk
+            return
+        if chunk:
+            runs.append(_spill(chunk, tmp, len(runs)))
+        del chunk
+        yield from heapq.merge(*(_read_run(p) for p in runs), key=lambda item: item[0])
+
+
+def url_key(row):
+    """Company code for company URLs (same page whatever the spelling), URL otherwise"""
+    key = company_key(row[0])
+    return "c:" + key[1] if key else "u:" + normalize_url(row[0])
+
+
+def unique_rows(rows, key=url_key, run_size=RUN_SIZE, folder=TEMP_FOLDER):
+    """Rows in key order with repeated keys dropped"""
+    last = None
+    for k, row in sorted_rows(rows, key, run_size, folder):
+        if k != last:
+            last = k
+            yield row
+
+
+def iter_csv(path):
+    """Non-empty rows of a CSV file, first column stripped"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if row and row[0].strip():
+                row[0] = row[0].strip()
+                yield row
+
+
+def sort_file(source, target=None, unique=True, key=url_key, run_size=RUN_SIZE):
+    """Sort (and dedupe) a CSV by key in bounded memory; in place without target. Returns (rows in, rows out)"""
+    target = target or source
+    counted = [0]
+
+    def counting(rows):
+        for row in rows:
+            counted[0] += 1
+            yield row
+
+    rows = counting(iter_csv(source))
+    merged = unique_rows(rows, key, run_size) if unique else (row for _, row in sorted_rows(rows, key, run_size))
+    written = 0
+    tmp = target + ".tmp"
+    with timer("sort"), open(tmp, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        for row in merged:
+            writer.writerow(row)
+            written += 1
+    os.replace(tmp, target)
+    print(f"✅ {source}: {counted[0]} rows -> {written} {'unique ' if unique else ''}rows in {target}")
+    return counted[0], written
+
+
+def main():
+    args = cli_args()
+    if len(args) < 2 or args[0] not in ("sort", "unique"):
+        print(__doc__)
+        sys.exit(1)
+    if not os.path.exists(args[1]):
+        print(f"❌ {args[1]} not found!")
+        sys.exit(1)
+    profile_stage(f"{args[0]}_file", sort_file, args[1], args[2] if len(args) > 2 else None, args[0] == "unique")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+CW request tracing
+- `--trace` samples TRACE_SAMPLE of the requests and appends one JSON line per
+  request to TRACE.jsonl: url, proxy (host:port), status, wire bytes and phase
+  timings in ms:
+    queued    waiting for a free connection in the proxy lane's pool
+    dns       resolving the proxy / site host
+    connect   TCP + proxy CONNECT + TLS (aiohttp reports them as one step)
+    ttfb      request sent -> response headers (proxy + site server time)
+    download  response headers -> last body byte (or early close)
+    validate  head / size / canonical checks
+    write     saving the page
+- Async engine: aiohttp TraceConfig hooks (new_session adds them under --trace);
+  reused connections have no dns/connect
+- Sync fetchers (CW.py, CWALL.py): requests has no hooks, so ttfb covers
+  dns + connect + server time; entries carry "sync": true
+- The summary shows per proxy where the time goes (mean / p95 per phase)
+
+Usage:
+  python CWSITEMAPROXYASYNC.py --trace       # any fetcher: record traces
+  python CWTRACE.py [TRACE.jsonl]            # per-proxy summary
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import random
+import threading
+from contextlib import nullcontext
+from CWPROFILE import cli_args
+from CWBANDWIDTH import proxy_label
+
+# === CONSTANTS ===
+TRACE = "--trace" in sys.argv
+TRACE_FILE = "TRACE.jsonl"
+TRACE_SAMPLE = 0.05  # share of requests traced
+FLUSH_EVERY = 100  # traces buffered before writing
+PHASES = ("queued", "dns", "connect", "ttfb", "download", "validate", "write")
+_NULL_PHASE = nullcontext()
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class _Phase:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        phases = self.trace.phases
+        phases[self.name] = phases.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class RequestTrace:
+    """Marks (perf_counter) and measured phases of one request"""
+
+    def __init__(self, url, proxy=None, sync=False):
+        self.url = url
+        self.proxy = proxy_label(proxy)
+        self.sync = sync
+        self.marks = {"start": time.perf_counter()}
+        self.phases = {}
+        self.status = None
+        self.wire_bytes = 0
+        self.reused = False
+
+    def mark(self, name):
+        self.marks.setdefault(name, time.perf_counter())
+
+    def phase(self, name):
+        """Context manager adding its duration to a phase (validate, write)"""
+        return _Phase(self, name)
+
+    def _span(self, start, end):
+        m = self.marks
+        return m[end] - m[start] if start in m and end in m else None
+
+    def record(self, outcome):
+        m = self.marks
+        dns = self._span("dns_start", "dns_end")
+        connect = self._span("connect_start", "connect_end")
+        if connect is not None and dns is not None and m["dns_start"] >= m["connect_start"]:
+            connect = max(0.0, connect - dns)  # aiohttp resolves inside connection create
+        sent = next((m[k] for k in ("sent", "connect_end", "queued_end", "start") if k in m))
+        entry = {
+            "ts": round(time.time(), 3),
+            "url": self.url,
+            "proxy": self.proxy,
+            "status": self.status,
+            "outcome": outcome,
+            "wire_bytes": self.wire_bytes,
+            "reused": self.reused,
+            "queued": self._span("queued_start", "queued_end"),
+            "dns": dns,
+            "connect": connect,
+            "ttfb": m["headers"] - sent if "headers" in m else None,
+            "download": self._span("headers", "body_end"),
+            "validate": self.phases.get("validate"),
+            "write": self.phases.get("write"),
+            "total": time.perf_counter() - m["start"],
+        }
+        for key in PHASES + ("total",):
+            if entry[key] is not None:
+                entry[key] = _ms(entry[key])
+        if self.sync:
+            entry["sync"] = True
+        return entry
+
+
+class Tracer:
+    """Samples requests, keeps their traces by URL until finished, buffers JSONL lines"""
+
+    def __init__(self, path=TRACE_FILE, sample=TRACE_SAMPLE, enabled=TRACE):
+        self.path = path
+        self.sample = sample
+        self.enabled = enabled
+        self.active = {}
+        self.buffer = []
+        self.written = 0
+        self._lock = threading.Lock()
+
+    def begin(self, url, proxy=None, sync=False):
+        """RequestTrace for a sampled request, None otherwise"""
+        if not self.enabled or random.random() >= self.sample:
+            return None
+        trace = RequestTrace(url, proxy, sync)
+        self.active[url] = trace
+        return trace
+
+    def get(self, url):
+        return self.active.get(url) if self.enabled else None
+
+    def phase(self, url, name):
+        trace = self.get(url)
+        return trace.phase(name) if trace is not None else _NULL_PHASE
+
+    def finish(self, url, outcome):
+        """Close the trace of url (saved / exists / error text) and queue its line"""
+        if not self.enabled:
+            return
+        trace = self.active.pop(url, None)
+        if trace is None:
+            return
+        with self._lock:
+            self.buffer.append(json.dumps(trace.record(outcome), ensure_ascii=False))
+            if len(self.buffer) >= FLUSH_EVERY:
+                self._flush()
+
+    def _flush(self):
+        if self.buffer:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(self.buffer) + "\n")
+            self.written += len(self.buffer)
+            self.buffer = []
+
+    def close(self):
+        with self._lock:
+            self._flush()
+        if self.enabled:
+            print(f"⏱️  {self.written} request traces -> {self.path}")
+
+
+TRACER = Tracer()
+atexit.register(TRACER.close)
+
+
+# === AIOHTTP HOOKS ===
+def _hook(mark):
+    async def on_event(session, ctx, params):
+        trace = ctx.trace_request_ctx
+        if trace is not None:
+            trace.mark(mark)
+    return on_event
+
+
+async def _on_reuse(session, ctx, params):
+    if ctx.trace_request_ctx is not None:
+        ctx.trace_request_ctx.reused = True
+
+
+async def _on_request_end(session, ctx, params):
+    trace = ctx.trace_request_ctx
+    if trace is not None:
+        trace.mark("headers")
+        trace.status = params.response.status
+
+
+def trace_config():
+    """aiohttp.TraceConfig filling the RequestTrace passed as trace_request_ctx"""
+    import aiohttp  # only the async engine needs it
+    config = aiohttp.TraceConfig()
+    config.on_connection_queued_start.append(_hook("queued_start"))
+    config.on_connection_queued_end.append(_hook("queued_end"))
+    config.on_dns_resolvehost_start.append(_hook("dns_start"))
+    config.on_dns_resolvehost_end.append(_hook("dns_end"))
+    config.on_connection_create_start.append(_hook("connect_start"))
+    config.on_connection_create_end.append(_hook("connect_end"))
+    config.on_connection_reuseconn.append(_on_reuse)
+    config.on_request_headers_sent.append(_hook("sent"))
+    config.on_request_end.append(_on_request_end)
+    return config
+
+
+# === SUMMARY ===
+def _pct(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def summarize(path=TRACE_FILE):
+    """proxy -> {"requests", "errors", phase: (mean ms, p95 ms)} from a trace file"""
+    per_proxy = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            stats = per_proxy.setdefault(entry["proxy"], {"requests": 0, "errors": 0,
+                                                          "values": {p: [] for p in PHASES + ("total",)}})
+            stats["requests"] += 1
+            stats["errors"] += entry["outcome"] not in ("saved", "exists")
+            for phase in PHASES + ("total",):
+                if entry.get(phase) is not None:
+                    stats["values"][phase].append(entry[phase])
+    summary = {}
+    for proxy, stats in per_proxy.items():
+        row = {"requests": stats["requests"], "errors": stats["errors"]}
+        for phase, values in stats.pop("values").items():
+            values.sort()
+            row[phase] = (sum(values) / len(values) if values else 0.0, _pct(values, 0.95))
+        summary[proxy] = row
+    return summary
+
+
+def report(path=TRACE_FILE):
+    summary = summarize(path)
+    print(f"⏱️  Where the time goes per proxy ({path})")
+    for proxy, row in sorted(summary.items(), key=lambda kv: -kv[1]["total"][0]):
+        total = row["total"][0] or 1.0
+        print(f"\n📡 {proxy}: {row['requests']} requests, {row['errors']} errors, "
+              f"{row['total'][0]:.1f} ms mean / {row['total'][1]:.1f} ms p95")
+        print(f"   {'phase':<10} {'mean ms':>10} {'p95 ms':>10} {'share':>7}")
+        for phase in PHASES:
+            mean, p95 = row[phase]
+            print(f"   {phase:<10} {mean:>10.1f} {p95:>10.1f} {mean / total:>7.0%}")
+    return summary
+
+
+def main():
+    args = cli_args()
+    path = args[0] if args else TRACE_FILE
+    if not os.path.exists(path):
+        print(f"❌ {path} not found! Run a fetcher with --trace first.")
+        sys.exit(1)
+    report(path)
+
+
+if __name__ == "__main__":
+    main()
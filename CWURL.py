@@ -0,0 +1,104 @@
+"""
+CW URL normalization
+- One regex turns a company URL into its key: (slug, code)
+    https://www.companywall.hu/v%C3%A1llalat/horizontplast-kft/MMGJWPVR
+    -> ("horizontplast-kft", "MMGJWPVR")
+  The section may be percent-encoded or not, the host with or without www,
+  trailing slash, query and fragment are ignored
+- Fast path: a plain slug is returned as-is, unquote() only runs when the
+  slug contains '%'; no urlparse per URL
+- company_keys() maps a whole list in one pass; filtering (is_wanted_url, the
+  one company type filter of every engine), dedup, file names, sharding and the
+  canonical check all go through here, so they agree
+"""
+
+import re
+from urllib.parse import quote, unquote
+
+# === CONSTANTS ===
+HOST = "www.companywall.hu"
+SECTION = "v%C3%A1llalat"  # "vállalat", as it appears in sitemap URLs
+CANONICAL_PREFIX = f"https://{HOST}/{SECTION}/"
+
+# Company type filter, matched against the slug
+PATTERN_INCLUDE = re.compile(r'-kft|-bt|-zrt', re.IGNORECASE)
+#PATTERN_INCLUDE = re.compile(r'horizon', re.IGNORECASE)
+# PATTERN_EXCLUDE = re.compile(r'-v-a|-f-a', re.IGNORECASE)
+PATTERN_EXCLUDE = re.compile(r'-xxxxxxxxxxxv-a', re.IGNORECASE)
+
+_RE_COMPANY = re.compile(
+    r"(https?://(?:www\.)?companywall\.hu/(?:v%C3%A1llalat|vállalat)/)"  # prefix
+    r"([^/?#]+)/([^/?#]+)"  # slug, code
+    r"(/?(?:[?#].*)?)$",  # ignorable rest
+    re.IGNORECASE)
+
+
+def _slug(raw):
+    return (unquote(raw) if "%" in raw else raw).lower()
+
+
+def split_company(url):
+    """(prefix, raw slug, code, rest) for a company URL, else None"""
+    m = _RE_COMPANY.match(url)
+    return m.groups() if m else None
+
+
+def company_key(url):
+    """(slug, code) of a company URL, None for anything else"""
+    m = _RE_COMPANY.match(url)
+    if m is None:
+        return None
+    return _slug(m.group(2)), m.group(3)
+
+
+def company_keys(urls):
+    """company_key() for many URLs in one pass"""
+    match = _RE_COMPANY.match
+    keys = []
+    append = keys.append
+    for url in urls:
+        m = match(url)
+        append((_slug(m.group(2)), m.group(3)) if m else None)
+    return keys
+
+
+def url_slug(url):
+    """Company slug ("horizontplast-kft"), None for non-company URLs"""
+    key = company_key(url)
+    return key[0] if key else None
+
+
+def is_wanted_url(url):
+    """Company type filter on the slug: include -kft/-bt/-zrt, drop excluded forms"""
+    slug = url_slug(url)
+    return bool(slug) and bool(PATTERN_INCLUDE.search(slug)) and not PATTERN_EXCLUDE.search(slug)
+
+
+def url_code(url):
+    """Company code; last path segment for non-company URLs"""
+    key = company_key(url)
+    return key[1] if key else url.split("?", 1)[0].split("#", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+
+
+def normalize_url(url):
+    """Canonical spelling of a company URL; other URLs only lose a trailing slash"""
+    key = company_key(url)
+    if key is None:
+        return url.strip().rstrip("/")
+    return f"{CANONICAL_PREFIX}{quote(key[0])}/{key[1]}"
+
+
+def same_page(a, b):
+    """True when two URLs point at the same company page (or are equal once normalized)"""
+    key_a, key_b = company_key(a.strip()), company_key(b.strip())
+    if key_a is not None and key_b is not None:
+        return key_a == key_b
+    return normalize_url(a) == normalize_url(b)
+
+
+def page_name(url):
+    """File name of a saved page: <slug>_<code>.html"""
+    key = company_key(url)
+    if key is None:
+        return unquote(url_code(url)).replace(" ", "_") + ".html"
+    return f"{key[0]}_{key[1]}.html".replace(" ", "_")
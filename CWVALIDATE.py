@@ -0,0 +1,121 @@
+"""
+CW page validation
+- The checks CWALL.py applies to every fetched company page:
+  gzip size limit, captcha title (RegisterOpenUser), canonical link == URL
+- validate_page() runs them all and returns a reason code for the first failure
+- The size check uses the wire size when the page arrived compressed
+  (gzip/br/zstd), so pages are not gzipped a second time
+- HeadCheck validates title and canonical while a page is still streaming,
+  as soon as </head> has arrived, so blocked pages can be dropped early
+"""
+
+import re
+import gzip
+from CWENCODING import GZIP_SIZE_RATIO, codings_of
+from CWURL import same_page
+
+# === CONSTANTS ===
+SIZELIMIT = 30*1024  # bytes (gzip-compressed)
+CAPTCHA_TITLE = "RegisterOpenUser"
+STREAM_CHUNK = 16 * 1024  # bytes read per step by streaming fetchers
+MAX_HEAD_BYTES = 256 * 1024  # validate even if </head> has not shown up by then
+
+# Failure reasons
+SIZE_ERROR = "size"
+CAPTCHA_ERROR = "captcha"
+NO_CANONICAL = "no_canonical"
+URL_ERROR = "canonical_mismatch"
+BLOCK_REASONS = (SIZE_ERROR, CAPTCHA_ERROR, NO_CANONICAL, URL_ERROR)
+
+# Simple regex patterns
+_RE_TITLE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_RE_HEAD_END = re.compile(rb"</head\s*>", re.IGNORECASE)
+_RE_CANON = re.compile(r'<link\s+[^>]*rel=["\']canonical["\'][^>]*href=["\']([^"\']+)["\']', re.IGNORECASE)
+
+
+def _decode(html_bytes):
+    try:
+        return html_bytes.decode("utf-8", errors="ignore")
+    except Exception:
+        return html_bytes.decode("latin1", errors="ignore")
+
+
+def compressed_size(data_bytes):
+    """Return gzip-compressed size of bytes."""
+    gz = gzip.compress(data_bytes)
+    return len(gz)
+
+
+def gzip_equivalent_size(html_bytes, wire_size=None, content_encoding=None):
+    """Gzip size of the page; derived from the wire size when it came compressed"""
+    codings = codings_of(content_encoding)
+    if wire_size is not None and len(codings) == 1 and codings[0] in GZIP_SIZE_RATIO:
+        return int(wire_size / GZIP_SIZE_RATIO[codings[0]])
+    return compressed_size(html_bytes)
+
+
+def extract_title(html_bytes):
+    m = _RE_TITLE.search(_decode(html_bytes))
+    return m.group(1).strip() if m else ""
+
+
+def extract_canonical(html_bytes):
+    m = _RE_CANON.search(_decode(html_bytes))
+    return m.group(1).strip() if m else None
+
+
+def canonical_matches(canonical, url):
+    # Same company key (slug, code), whatever the encoding / trailing slash
+    return same_page(canonical, url)
+
+
+def validate_head(url, html_bytes):
+    """Title and canonical checks; returns (reason or None, details)"""
+    html = _decode(html_bytes)
+    m = _RE_TITLE.search(html)
+    title = m.group(1).strip() if m else ""
+    if title == CAPTCHA_TITLE:
+        return CAPTCHA_ERROR, {"title": title}
+
+    m = _RE_CANON.search(html)
+    canonical = m.group(1).strip() if m else None
+    details = {"title": title, "canonical": canonical}
+    if canonical is None:
+        return NO_CANONICAL, details
+    if not canonical_matches(canonical, url):
+        return URL_ERROR, details
+    return None, details
+
+
+def validate_page(url, html_bytes, wire_size=None, content_encoding=None):
+    """Run every check; returns (None, details) when valid or (reason, details)"""
+    size_gz = gzip_equivalent_size(html_bytes, wire_size, content_encoding)
+    if size_gz > SIZELIMIT:
+        return SIZE_ERROR, {"size_gz": size_gz}
+
+    reason, details = validate_head(url, html_bytes)
+    details["size_gz"] = size_gz
+    return reason, details
+
+
+class HeadCheck:
+    """Feed decoded chunks; validates title and canonical once </head> is complete"""
+
+    def __init__(self, url):
+        self.url = url
+        self.buffer = bytearray()
+        self.done = False
+        self.reason = None
+
+    def feed(self, data):
+        """Returns the failure reason when the completed head is invalid, else None"""
+        if self.done:
+            return None
+        start = max(0, len(self.buffer) - 8)
+        self.buffer += data
+        if not _RE_HEAD_END.search(self.buffer, start) and len(self.buffer) < MAX_HEAD_BYTES:
+            return None
+        self.done = True
+        self.reason, _ = validate_head(self.url, bytes(self.buffer))
+        self.buffer = None
+        return self.reason
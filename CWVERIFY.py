@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+CW corpus verifier
+- Re-checks every saved page with the fetch-time rules (CWVALIDATE):
+  captcha title, canonical link == the page's own company, gzip size limit
+- Older fetchers saved pages unchecked, and every exists-check treats a
+  saved page as done; bad pages are listed in REFETCH_LIST.csv
+  (url, path, reason, quarantined path, folder) and, with --quarantine, moved
+  to Quarantine/<folder name>/...
+- Pages named by slug only get their URL from their canonical link when it
+  names the same slug; the rest cannot be refetched and are reported
+- refetch saves every page back into the folder it came from
+- Runs in a process pool over batches of files; the size check first tries
+  a cheap zlib level 1 compression and only gzips fully near the limit
+
+Usage:
+  python CWVERIFY.py [FOLDER ...] [--quarantine]   # default: Companies*
+  python CWVERIFY.py refetch                       # fetch REFETCH_LIST.csv again
+"""
+
+import os
+import csv
+import sys
+import zlib
+import asyncio
+from multiprocessing import Pool
+from urllib.parse import quote
+from CWPROFILE import cli_args, profile_stage, timer
+from CWLAYOUT import PAGE_SUFFIX, iter_pages
+from CWURL import CANONICAL_PREFIX, company_key, url_slug
+from CWVALIDATE import (CAPTCHA_ERROR, CAPTCHA_TITLE, NO_CANONICAL, SIZE_ERROR, SIZELIMIT, URL_ERROR,
+                        compressed_size, extract_canonical, extract_title)
+
+# === CONSTANTS ===
+cwd = os.getcwd()
+REFETCH_LIST = "REFETCH_LIST.csv"
+QUARANTINE_FOLDER = os.path.join(cwd, "Quarantine")
+QUARANTINE = "--quarantine" in sys.argv
+VERIFY_BATCH = 1000  # files per task
+PROCESSES = os.cpu_count() or 4
+READ_ERROR = "unreadable"
+
+
+def expected_key(path):
+    """(slug, code) the page should be about, from its file name; code None for name-only pages"""
+    stem = os.path.basename(path)[:-len(PAGE_SUFFIX)]
+    if "_" in stem:
+        slug, code = stem.rsplit("_", 1)
+        return slug.lower(), code
+    return stem.lower(), None
+
+
+def expected_url(key):
+    slug, code = key
+    return f"{CANONICAL_PREFIX}{quote(slug)}/{code}" if code else ""
+
+
+def size_ok(html_bytes):
+    """gzip size within SIZELIMIT; level-1 zlib is a quick upper bound"""
+    if len(html_bytes) <= SIZELIMIT:
+        return True
+    if len(zlib.compress(html_bytes, 1)) + 18 <= SIZELIMIT:
+        return True
+    return compressed_size(html_bytes) <= SIZELIMIT
+
+
+def verify_page(path):
+    """Failure reason for a saved page, None when it passes"""
+    try:
+        with open(path, "rb") as f:
+            html = f.read()
+    except OSError:
+        return READ_ERROR
+    if extract_title(html) == CAPTCHA_TITLE:
+        return CAPTCHA_ERROR
+    canonical = extract_canonical(html)
+    if canonical is None:
+        return NO_CANONICAL
+    slug, code = expected_key(path)
+    key = company_key(canonical)
+    if code is None:
+        if url_slug(canonical) != slug:
+            return URL_ERROR
+    elif key != (slug, code):
+        return URL_ERROR
+    if not size_ok(html):
+        return SIZE_ERROR
+    return None
+
+
+def page_url(path):
+    """URL to refetch a saved page from; name-only pages use their canonical link when it
+    names the same slug, "" when nothing identifies the company"""
+    key = expected_key(path)
+    if key[1] is not None:
+        return expected_url(key)
+    try:
+        with open(path, "rb") as f:
+            canonical = extract_canonical(f.read())
+    except OSError:
+        return ""
+    key = company_key(canonical) if canonical else None
+    return expected_url(key) if key and key[0] == expected_key(path)[0] else ""
+
+
+def quarantine_path(folder, path):
+    """Quarantine/<folder name>/<path inside folder>, whatever folder is relative to cwd"""
+    return os.path.join(QUARANTINE_FOLDER, os.path.basename(os.path.normpath(folder)), os.path.relpath(path, folder))
+
+
+def _verify_batch(task):
+    folder, paths, quarantine = task
+    bad = []
+    for path in paths:
+        reason = verify_page(path)
+        if reason is None:
+            continue
+        url = page_url(path)
+        target = ""
+        if quarantine:
+            target = quarantine_path(folder, path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+        bad.append((url, path, reason, target, folder))
+    return len(paths), bad
+
+
+def _batches(folders, quarantine):
+    for folder in folders:
+        batch = []
+        for path in iter_pages(folder):
+            batch.append(path)
+            if len(batch) >= VERIFY_BATCH:
+                yield folder, batch, quarantine
+                batch = []
+        if batch:
+            yield folder, batch, quarantine
+
+
+def default_folders():
+    return sorted(os.path.join(cwd, name) for name in os.listdir(cwd)
+                  if name.startswith("Companies") and os.path.isdir(os.path.join(cwd, name)))
+
+
+def verify(folders=None, quarantine=QUARANTINE, processes=PROCESSES):
+    """Scan folders; writes REFETCH_LIST.csv and returns (checked, bad)"""
+    folders = folders or default_folders()
+    print(f"🔍 Verifying {', '.join(folders) or 'nothing'} with {processes} processes"
+          f"{' (quarantining bad pages)' if quarantine else ''}...")
+    checked = 0
+    reasons = {}
+    with timer("verify"), Pool(processes) as pool, \
+            open(REFETCH_LIST, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        for done, (count, bad) in enumerate(pool.imap_unordered(_verify_batch, _batches(folders, quarantine)), 1):
+            checked += count
+            for url, path, reason, target, folder in bad:
+                writer.writerow([url, path, reason, target, folder])
+                reasons[reason] = reasons.get(reason, 0) + 1
+            if done % 100 == 0:
+                print(f"  ... {checked} pages checked, {sum(reasons.values())} bad")
+
+    total_bad = sum(reasons.values())
+    print(f"✅ {checked} pages checked, {total_bad} bad -> {REFETCH_LIST}")
+    for reason, count in sorted(reasons.items(), key=lambda item: -item[1]):
+        print(f"   {reason:<20} {count}")
+    return checked, total_bad
+
+
+def refetch():
+    """Fetch the quarantined pages of REFETCH_LIST.csv again with the async engine,
+    each into the folder it came from"""
+    from CWSITEMAPROXYASYNC import fetch_urls_async
+    if not os.path.exists(REFETCH_LIST):
+        print(f"❌ {REFETCH_LIST} not found! Run the verifier first.")
+        return
+    with open(REFETCH_LIST, "r", encoding="utf-8") as f:
+        rows = [row for row in csv.reader(f) if len(row) > 1]
+    by_folder = {}
+    in_place = unknown = 0
+    for row in rows:
+        if not row[0]:
+            unknown += 1
+        elif len(row) < 4 or not row[3]:
+            in_place += 1
+        else:
+            folder = row[4] if len(row) > 4 and row[4] else None
+            by_folder.setdefault(folder, []).append(row[0])
+    if in_place:
+        print(f"⚠️  {in_place} bad pages are still in place (verify with --quarantine first), not refetched")
+    if unknown:
+        print(f"⚠️  {unknown} bad pages have no company code in their name or canonical link, "
+              f"not refetched (see {REFETCH_LIST})")
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    totals = [0, 0, 0]
+    for folder, urls in by_folder.items():
+        print(f"📥 Refetching {len(urls)} pages into {folder or 'the default folder'}")
+        counts = profile_stage("refetch", asyncio.run, fetch_urls_async(urls, refetch=True, folder=folder))
+        totals = [t + c for t, c in zip(totals, counts)]
+    print(f"🎉 Refetch: {totals[0]} saved, {totals[1]} existed, {totals[2]} errors")
+
+
+def main():
+    args = cli_args()
+    if args and args[0] == "refetch":
+        refetch()
+    else:
+        profile_stage("verify", verify, args or None)
+
+
+if __name__ == "__main__":
+    main()